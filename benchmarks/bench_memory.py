@@ -0,0 +1,114 @@
+"""
+股票量化交易回测系统 - 精简模式内存基准测试
+分别在独立进程中以默认模式和精简模式（lean）执行日K回测，对比峰值常驻内存（RSS）
+
+用法（在项目根目录下执行）:
+    python -m benchmarks.bench_memory --bars 7500 15000 30000
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import make_daily_bars
+
+
+def peak_rss_bytes():
+    """
+    获取当前进程的峰值常驻内存
+
+    返回:
+        int: 峰值内存字节数
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 返回字节，Linux 返回KB
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _measure(n_bars, lean, queue):
+    """在子进程中执行一次回测并回报峰值内存和耗时"""
+    from src.core.backtest import run_daily_backtest
+
+    stock_data = make_daily_bars(n_bars)
+    baseline = peak_rss_bytes()
+    began = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = run_daily_backtest(
+            stock_code='600000', stock_data=stock_data, use_cache=False, lean=lean,
+            start_date=datetime.combine(stock_data.index[0].date(), datetime.min.time()),
+            end_date=datetime.combine(stock_data.index[-1].date(), datetime.min.time()),
+            use_sma_crossover=True, fast_maperiod=5, slow_maperiod=30,
+            use_take_profit=False, take_profit=1.2, take_profit_size=1000,
+            use_stop_loss=False, stop_loss=0.9, stop_loss_size=1000,
+            start_cash=100_000_000,
+        )
+    queue.put({
+        'elapsed': time.perf_counter() - began,
+        'baseline_rss': baseline,
+        'peak_rss': peak_rss_bytes(),
+        'final_value': result.final_value,
+    })
+
+
+def measure(n_bars, lean):
+    """
+    在全新的进程中测量一次回测，避免不同模式之间互相影响峰值内存
+
+    参数:
+        n_bars: K线数量
+        lean: 是否使用精简模式
+
+    返回:
+        dict: 耗时、基线内存和峰值内存
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(n_bars, lean, queue))
+    process.start()
+    stats = queue.get()
+    process.join()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比默认模式与精简模式的峰值内存")
+    parser.add_argument('--bars', type=int, nargs='+', default=[7500, 30000], help="K线数量，可指定多个")
+    args = parser.parse_args(argv)
+
+    print(f"{'K线数':>8} {'模式':>6} {'耗时(s)':>8} {'回测增量RSS(MB)':>16} {'峰值RSS(MB)':>12}")
+    for n_bars in args.bars:
+        values = []
+        for lean in (False, True):
+            stats = measure(n_bars, lean)
+            values.append(stats['final_value'])
+            delta = (stats['peak_rss'] - stats['baseline_rss']) / 2 ** 20
+            print(f"{n_bars:>8} {'lean' if lean else 'default':>6} {stats['elapsed']:>8.2f} "
+                  f"{delta:>16.1f} {stats['peak_rss'] / 2 ** 20:>12.1f}")
+        if values[0] != values[1]:
+            print(f"警告：两种模式的最终资产不一致 {values}")
+
+
+if __name__ == '__main__':
+    main()
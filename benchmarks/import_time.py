@@ -0,0 +1,77 @@
+"""
+股票量化交易回测系统 - 导入耗时报告
+在新的解释器中以 -X importtime 导入指定模块（默认图形界面入口 src.main），
+按累计耗时列出最慢的模块，超过预算时退出码为1，便于发现重新出现在启动路径上的重量级依赖
+
+用法（在项目根目录下执行）:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module src.cli --top 30 --budget 0.8
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+def measure(module):
+    """
+    在子进程中导入模块并解析 -X importtime 输出
+
+    参数:
+        module: 要导入的模块名
+
+    返回:
+        dict: {'total': 总导入耗时（秒）, 'modules': [(模块名, 累计耗时秒, 自身耗时秒, 嵌套层级), ...]}
+              模块按导入完成的先后排列
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr.strip()[-2000:]}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        # 格式: "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(cumulative_us) / 1e6, int(self_us) / 1e6, depth))
+    # 顶层模块（层级0）的累计耗时之和即总导入耗时
+    total = sum(cumulative for _, cumulative, _, depth in modules if depth == 0)
+    return {'total': total, 'modules': modules}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.import_time', description="按模块列出累计导入耗时")
+    parser.add_argument('--module', default='src.main', help="要导入的模块，默认为图形界面入口 src.main")
+    parser.add_argument('--top', type=int, default=20, help="列出累计耗时最长的模块数")
+    parser.add_argument('--budget', type=float, default=None, help="总导入耗时预算（秒），超过时退出码为1")
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出全部模块")
+    args = parser.parse_args(argv)
+
+    report = measure(args.module)
+    if args.json:
+        print(json.dumps({
+            'module': args.module,
+            'total': report['total'],
+            'modules': [{'name': name, 'cumulative': cumulative, 'self': own, 'depth': depth}
+                        for name, cumulative, own, depth in report['modules']],
+        }, ensure_ascii=False, indent=2))
+    else:
+        slowest = sorted(report['modules'], key=lambda item: item[1], reverse=True)[:args.top]
+        print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+        for name, cumulative, own, depth in slowest:
+            print(f"{cumulative * 1000:>10.1f} {own * 1000:>10.1f}  {'  ' * depth}{name}")
+        print(f"导入 {args.module} 共 {report['total'] * 1000:.1f} ms，{len(report['modules'])} 个模块")
+
+    if args.budget is not None and report['total'] > args.budget:
+        print(f"导入耗时 {report['total']:.2f} 秒，超过预算 {args.budget:.2f} 秒", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+股票量化交易回测系统 - 基准测试套件
+使用合成行情（不依赖网络）分阶段测量数据转换、日K/分时回测和K线图渲染的吞吐量（K线/秒）、
+单次调用延迟分位数和峰值内存，结果保存为JSON，便于对比两次运行
+
+用法（在项目根目录下执行）:
+    python -m benchmarks.suite run --bars 1000 100000 --symbols 1 50 -o before.json
+    python -m benchmarks.suite compare before.json after.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic import make_daily_bars, make_raw_minute_frame, make_ticks_bars
+
+# 工作日索引能表示的K线数量上限，更长的日K序列改用分钟索引
+_MAX_BUSINESS_DAYS = 50_000
+# 分时回测每个交易日的K线数
+_TICKS_PER_DAY = 241
+
+_BACKTEST_PARAMS = dict(
+    use_sma_crossover=True, fast_maperiod=5, slow_maperiod=30,
+    use_take_profit=True, take_profit=1.1, take_profit_size=100,
+    use_stop_loss=True, stop_loss=0.95, stop_loss_size=100,
+    start_cash=100_000_000,
+)
+_TICKS_PARAMS = dict(
+    price_period=5, volume_period=5, stop_by_profit=True, profit_rate=1.01, profit_size=100,
+    stop_by_loss=True, loss_rate=0.99, loss_size=100, buy_size=100, sell_size=100,
+    start_cash=1_000_000,
+)
+
+
+def _daily_frame(n_bars, seed):
+    freq = 'B' if n_bars <= _MAX_BUSINESS_DAYS else 'min'
+    return make_daily_bars(n_bars, seed=seed, freq=freq)
+
+
+def _history_units(n_bars, seed):
+    """日K清洗：输入为akshare日K接口原始格式（中文列名、字符串日期）"""
+    bars = _daily_frame(n_bars, seed)
+    raw = bars[['date', 'open', 'close', 'high', 'low', 'volume']].reset_index(drop=True)
+    raw.columns = ['日期', '开盘', '收盘', '最高', '最低', '成交量']
+    raw['日期'] = raw['日期'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    yield raw, n_bars
+
+
+def _history_call(raw):
+    from src.core.data import clean_ohlcv_frame
+    clean_ohlcv_frame(raw)
+
+
+def _ticks_transform_units(n_bars, seed):
+    yield make_raw_minute_frame(n_bars, seed=seed), n_bars
+
+
+def _ticks_transform_call(raw):
+    from src.core.data import transform_ticks_data
+    transform_ticks_data(raw)
+
+
+def _daily_units(n_bars, seed):
+    yield _daily_frame(n_bars, seed), n_bars
+
+
+def _daily_call(stock_data, lean=False):
+    from src.core.backtest import run_daily_backtest
+    run_daily_backtest('600000', stock_data=stock_data, use_cache=False, lean=lean, **_BACKTEST_PARAMS)
+
+
+def _ticks_units(n_bars, seed):
+    """分时回测每次调用只处理一个交易日，按K线数折算为若干个交易日"""
+    n_days = max(1, -(-n_bars // _TICKS_PER_DAY))
+    for day in range(n_days):
+        stock_data = make_ticks_bars(seed=seed * 1_000_003 + day)
+        yield stock_data, len(stock_data)
+
+
+def _ticks_call(stock_data):
+    from src.core.backtest import run_ticks_backtest
+    run_ticks_backtest('600000', stock_data=stock_data, date=datetime(2024, 1, 2), use_cache=False,
+                       **_TICKS_PARAMS)
+
+
+def _render_units(n_bars, seed):
+    yield _daily_frame(n_bars, seed), n_bars
+
+
+def _render_call(stock_data):
+    from src.utils.render_util import RenderUtil
+    RenderUtil().draw_k_line(stock_data, show=False)
+
+
+def _chart_units(n_bars, seed):
+    """回测结果图：由合成行情直接构造结果对象（资金曲线取收盘价的倍数），不执行回测"""
+    from src.core.result import BacktestResult
+    bars = _daily_frame(n_bars, seed)
+    result = BacktestResult(
+        kind='daily', stock_code='600000', start=bars.index[0].to_pydatetime(),
+        end=bars.index[-1].to_pydatetime(), start_cash=100_000.0, final_value=100_000.0,
+        params=dict(_BACKTEST_PARAMS, sma_buy_size=100, sma_sell_size=100),
+        equity_dates=bars.index.values.astype('datetime64[s]'), equity=bars['close'].to_numpy() * 1000,
+        positions=np.zeros(n_bars), opens=bars['open'].to_numpy(), highs=bars['high'].to_numpy(),
+        lows=bars['low'].to_numpy(), closes=bars['close'].to_numpy(),
+    )
+    yield result, n_bars
+
+
+def _chart_call(result):
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from src.utils.chart_util import draw_chart, prepare_chart
+    figure = Figure(figsize=(10, 4.6), dpi=100)
+    FigureCanvasAgg(figure)
+    draw_chart(figure, prepare_chart(result, 1000))
+    figure.canvas.draw()
+
+
+# 阶段名称 -> (生成输入的函数, 被测函数)；生成输入的耗时不计入结果
+STAGES = {
+    'history_clean': (_history_units, _history_call),
+    'ticks_transform': (_ticks_transform_units, _ticks_transform_call),
+    'daily_backtest': (_daily_units, _daily_call),
+    'daily_backtest_lean': (_daily_units, lambda stock_data: _daily_call(stock_data, lean=True)),
+    'ticks_backtest': (_ticks_units, _ticks_call),
+    'render_k_line': (_render_units, _render_call),
+    'render_result_chart': (_chart_units, _chart_call),
+}
+
+
+def run_stage(stage, n_bars, n_symbols, time_budget=None, measure_memory=True):
+    """
+    对一个阶段执行基准测试
+
+    每只股票使用不同随机种子的合成行情；每次被测函数调用记为一个延迟样本。
+    计时前先执行一次不计时的预热调用，峰值内存在计时之外单独用 tracemalloc 测量一次调用，
+    避免追踪开销影响计时
+
+    参数:
+        stage: 阶段名称
+        n_bars: 每只股票的K线数量
+        n_symbols: 股票数量
+        time_budget: 可选，单个阶段的计时上限（秒），超过后不再测试剩余股票
+        measure_memory: 是否测量峰值内存
+
+    返回:
+        dict: 吞吐量、延迟分位数（毫秒）和峰值内存（MB）
+    """
+    make_units, call = STAGES[stage]
+
+    # 预热：模块导入和首次调用的一次性开销不计入延迟和内存
+    payload, _ = next(make_units(n_bars, 0))
+    call(payload)
+
+    peak_mb = None
+    if measure_memory:
+        payload, _ = next(make_units(n_bars, 0))
+        tracemalloc.start()
+        call(payload)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    del payload
+
+    samples = []
+    total_bars = 0
+    symbols_run = 0
+    elapsed = 0.0
+    for symbol in range(n_symbols):
+        for payload, bars in make_units(n_bars, symbol):
+            began = time.perf_counter()
+            call(payload)
+            spent = time.perf_counter() - began
+            samples.append(spent)
+            elapsed += spent
+            total_bars += bars
+        symbols_run += 1
+        if time_budget is not None and elapsed >= time_budget:
+            break
+
+    latency_ms = np.asarray(samples) * 1000
+    p50, p90, p99 = np.percentile(latency_ms, [50, 90, 99])
+    return {
+        'stage': stage,
+        'n_bars': n_bars,
+        'n_symbols': n_symbols,
+        'symbols_run': symbols_run,
+        'calls': len(samples),
+        'total_bars': total_bars,
+        'elapsed_s': elapsed,
+        'bars_per_s': total_bars / elapsed if elapsed > 0 else float('inf'),
+        'latency_ms': {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': float(latency_ms.max())},
+        'peak_mem_mb': peak_mb,
+    }
+
+
+def environment():
+    """记录运行环境，便于判断两次结果是否可比"""
+    versions = {}
+    for name in ('backtrader', 'pandas', 'numpy', 'plotly', 'matplotlib'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+    }
+
+
+def cmd_run(args):
+    stages = args.stages or list(STAGES)
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        print(f"未知的阶段: {', '.join(unknown)}，可选: {', '.join(STAGES)}", file=sys.stderr)
+        return 2
+
+    report = {'environment': environment(), 'results': []}
+    print(f"{'阶段':<20} {'K线数':>9} {'股票数':>6} {'K线/秒':>12} {'p50(ms)':>10} {'p99(ms)':>10} {'峰值内存(MB)':>12}",
+          file=sys.stderr)
+    for stage in stages:
+        for n_bars in args.bars:
+            for n_symbols in args.symbols:
+                # 策略日志和警告不计入结果，也不干扰输出
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    stats = run_stage(stage, n_bars, n_symbols, args.time_budget, not args.no_memory)
+                report['results'].append(stats)
+                peak = f"{stats['peak_mem_mb']:.1f}" if stats['peak_mem_mb'] is not None else '-'
+                print(f"{stage:<20} {n_bars:>9} {stats['symbols_run']:>6} {stats['bars_per_s']:>12,.0f} "
+                      f"{stats['latency_ms']['p50']:>10.2f} {stats['latency_ms']['p99']:>10.2f} {peak:>12}",
+                      file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            out.write(text)
+    return 0
+
+
+def compare(before, after, threshold=0.1):
+    """
+    对比两次基准测试结果
+
+    参数:
+        before: 基准结果（run 命令输出的字典）
+        after: 新结果
+        threshold: 吞吐量下降超过该比例时视为性能退化
+
+    返回:
+        tuple: (对比行列表, 是否存在性能退化)
+    """
+    def key(stats):
+        return stats['stage'], stats['n_bars'], stats['n_symbols']
+
+    baseline = {key(stats): stats for stats in before['results']}
+    rows = []
+    regressed = False
+    for stats in after['results']:
+        old = baseline.get(key(stats))
+        if old is None:
+            continue
+        change = stats['bars_per_s'] / old['bars_per_s'] - 1
+        slower = change < -threshold
+        regressed = regressed or slower
+        rows.append({
+            'stage': stats['stage'], 'n_bars': stats['n_bars'], 'n_symbols': stats['n_symbols'],
+            'bars_per_s': (old['bars_per_s'], stats['bars_per_s']), 'change': change,
+            'p50_ms': (old['latency_ms']['p50'], stats['latency_ms']['p50']),
+            'peak_mem_mb': (old['peak_mem_mb'], stats['peak_mem_mb']), 'regressed': slower,
+        })
+    return rows, regressed
+
+
+def cmd_compare(args):
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+
+    rows, regressed = compare(before, after, args.threshold)
+    print(f"基准: {before['environment'].get('commit')}  对比: {after['environment'].get('commit')}")
+    print(f"{'阶段':<20} {'K线数':>9} {'股票数':>6} {'K线/秒(前)':>12} {'K线/秒(后)':>12} {'变化':>8} "
+          f"{'p50前(ms)':>10} {'p50后(ms)':>10}")
+    for row in rows:
+        flag = '  <-- 退化' if row['regressed'] else ''
+        print(f"{row['stage']:<20} {row['n_bars']:>9} {row['n_symbols']:>6} {row['bars_per_s'][0]:>12,.0f} "
+              f"{row['bars_per_s'][1]:>12,.0f} {row['change']:>+8.1%} {row['p50_ms'][0]:>10.2f} "
+              f"{row['p50_ms'][1]:>10.2f}{flag}")
+    return 1 if regressed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description="回测系统基准测试套件")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="执行基准测试")
+    run_parser.add_argument('--stages', nargs='+', help=f"要测试的阶段，默认全部: {', '.join(STAGES)}")
+    run_parser.add_argument('--bars', type=int, nargs='+', default=[1000, 10000],
+                            help="每只股票的K线数量（1千至1千万），可指定多个")
+    run_parser.add_argument('--symbols', type=int, nargs='+', default=[1],
+                            help="股票数量（1至5000），可指定多个")
+    run_parser.add_argument('--time-budget', type=float, default=None,
+                            help="每个阶段每组规模的计时上限（秒），超过后跳过剩余股票")
+    run_parser.add_argument('--no-memory', action='store_true', help="不测量峰值内存")
+    run_parser.add_argument('-o', '--output', default='-', help="JSON结果输出文件，默认为标准输出")
+    run_parser.set_defaults(func=cmd_run)
+
+    compare_parser = subparsers.add_parser('compare', help="对比两次基准测试结果")
+    compare_parser.add_argument('before', help="基准结果文件")
+    compare_parser.add_argument('after', help="新结果文件")
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help="吞吐量下降超过该比例视为退化，默认0.1")
+    compare_parser.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
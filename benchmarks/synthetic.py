@@ -0,0 +1,100 @@
+"""
+股票量化交易回测系统 - 合成行情数据生成
+为基准测试生成与数据模块输出格式一致的OHLCV数据，不依赖网络
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def _reflect(walk, bound):
+    """把随机游走（对数价格）在 [-bound, bound] 区间内来回反射，千万级长度的序列也不会溢出"""
+    period = 4 * bound
+    return bound - np.abs(np.mod(walk + bound, period) - 2 * bound)
+
+
+def make_daily_bars(n_bars, seed=0, start="1995-01-03", freq="B"):
+    """
+    生成日K线数据（几何布朗运动收盘价，默认为工作日索引）
+
+    参数:
+        n_bars: K线数量
+        seed: 随机种子
+        start: 起始日期
+        freq: 索引频率，工作日索引最多约6万根（pandas时间上限），更长的序列使用 "min"
+
+    返回:
+        DataFrame: 与 get_single_stock_history_data 格式一致的数据框
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n_bars, freq=freq)
+    close = 100.0 * np.exp(_reflect(np.cumsum(rng.normal(0.0002, 0.02, n_bars)), 3.0))
+    open_ = close * (1 + rng.normal(0, 0.005, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, n_bars)))
+    volume = rng.integers(10_000, 1_000_000, n_bars).astype(np.float64)
+    return pd.DataFrame(
+        {'date': index, 'open': open_, 'close': close, 'high': high, 'low': low, 'volume': volume},
+        index=index,
+    )
+
+
+def make_ticks_bars(seed=0):
+    """
+    生成一个交易日的分钟K线（9:30-11:29、13:00-15:00），日期已按 min2date 规则映射为虚拟日期
+
+    参数:
+        seed: 随机种子
+
+    返回:
+        DataFrame: 与 get_single_stock_ticks_data_transfer 格式一致的数据框
+    """
+    rng = np.random.default_rng(seed)
+    minutes = list(range(0, 120)) + list(range(210, 331))
+    n_bars = len(minutes)
+    base_date = datetime(1970, 1, 1)
+    index = pd.DatetimeIndex([base_date + timedelta(days=m) for m in minutes])
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0, 0.002, n_bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * 1.001
+    low = np.minimum(open_, close) * 0.999
+    volume = rng.integers(100, 10_000, n_bars).astype(np.float64)
+    return pd.DataFrame(
+        {'date': index, 'open': open_, 'close': close, 'high': high, 'low': low, 'volume': volume},
+        index=index,
+    )
+
+
+# 一个交易日内的分钟偏移（相对9:30）：上午 9:30-11:29，下午 13:00-15:00
+_SESSION_MINUTES = np.r_[np.arange(0, 120), np.arange(210, 331)]
+
+
+def make_raw_minute_frame(n_bars, seed=0, start="2024-01-02"):
+    """
+    生成akshare分钟K线接口原始格式的数据（中文列名、字符串时间），按交易时段连续排列多个交易日
+
+    参数:
+        n_bars: K线数量
+        seed: 随机种子
+        start: 第一个交易日
+
+    返回:
+        DataFrame: 包含 时间、开盘、收盘、最高、最低、成交量 列的数据框
+    """
+    rng = np.random.default_rng(seed)
+    n_days = -(-n_bars // len(_SESSION_MINUTES))
+    days = pd.bdate_range(start, periods=n_days).values.astype('datetime64[m]')
+    open_time = np.timedelta64(9 * 60 + 30, 'm')
+    times = (days[:, None] + open_time + _SESSION_MINUTES[None, :].astype('timedelta64[m]')).ravel()[:n_bars]
+    close = 10.0 * np.exp(_reflect(np.cumsum(rng.normal(0, 0.002, n_bars)), 3.0))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        '时间': np.char.replace(np.datetime_as_string(times, unit='s'), 'T', ' ').astype(object),
+        '开盘': open_,
+        '收盘': close,
+        '最高': np.maximum(open_, close) * 1.001,
+        '最低': np.minimum(open_, close) * 0.999,
+        '成交量': rng.integers(100, 10_000, n_bars).astype(np.float64),
+    })
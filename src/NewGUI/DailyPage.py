@@ -3,15 +3,16 @@ import customtkinter as ctk
 
 from datetime import datetime, timedelta
 
-import matplotlib.pyplot as plt
-
 import threading
 
-from ..core.backtest import run_daily_backtest
-from ..utils.fast_use_util import update_date_range_ctk
 
-plt.rcParams['font.family'] = 'SimHei'
-plt.rcParams['axes.unicode_minus'] = False
+from ..core.jobs import get_job_manager
+from ..core.timing import log_timings, phase, phase_timer
+from ..utils.chart_util import prepare_chart
+from .ResultChart import ResultChart
+from ..utils.fast_use_util import get_date_range_text, get_market_text
+from .SymbolCompleter import SymbolCompleter
+from ..utils.ui_bus import ui_bus
 
 class NewDailyPage(ctk.CTkFrame):
     def __init__(self, master, **kwargs):
@@ -19,7 +20,11 @@ class NewDailyPage(ctk.CTkFrame):
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
         
-        self.last_backtest_engine = None
+        self.last_result = None
+        # 本页面提交、尚未结束的后台任务编号，进度条显示最后提交的任务
+        self.job_ids = []
+        # 最后一次请求获取数据时间范围的股票代码
+        self._date_range_code = None
         self.create_daily_content()
     
     def create_daily_content(self):
@@ -68,6 +73,8 @@ class NewDailyPage(ctk.CTkFrame):
         self.stock_code_entry.grid(row=1, column=1, padx=(0, 20), pady=10, sticky="ew")
         self.stock_code_entry.insert(0, "")
         self.stock_code_entry.bind("<KeyRelease>", self.update_date_range)
+        # 按代码、名称或拼音首字母在本地代码表中补全，不访问网络
+        self.code_completer = SymbolCompleter(self.stock_code_entry, on_select=lambda code: self.update_date_range())
         
 
         self.market_label = ctk.CTkLabel(
@@ -213,8 +220,20 @@ class NewDailyPage(ctk.CTkFrame):
             height=50,
             command=self.run_backtest
         )
-        self.start_button.pack(pady=20)
-        
+        self.start_button.pack(pady=(20, 10))
+
+        self.cancel_button = ctk.CTkButton(
+            control_frame,
+            text="取消回测",
+            font=ctk.CTkFont(size=14),
+            fg_color="gray",
+            state="disabled",
+            command=self.cancel_backtest
+        )
+        self.cancel_button.pack(pady=(0, 10))
+
+        self.status_label = ctk.CTkLabel(control_frame, text="", font=ctk.CTkFont(size=12), text_color="gray")
+        self.status_label.pack()
 
         self.progress_bar = ctk.CTkProgressBar(control_frame)
         self.progress_bar.pack(pady=(0, 20), padx=40, fill="x")
@@ -242,100 +261,136 @@ class NewDailyPage(ctk.CTkFrame):
         )
         self.result_text.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="ew")
         self.result_text.insert("0.0", "等待回测开始...")
+
+        self.result_chart = ResultChart(results_frame)
+        self.result_chart.grid(row=2, column=0, padx=20, pady=(0, 20), sticky="ew")
     
     def update_date_range(self, event=None):
 
         try:
             stock_code = self.stock_code_entry.get().strip()
             if len(stock_code) == 6 and stock_code.isdigit():
-                update_date_range_ctk(stock_code,self.date_label)
-                if stock_code.startswith('0') or stock_code.startswith('3'):
-                    self.market_label.configure(text="市场：深圳交易所")
-                elif stock_code.startswith('6'):
-                    self.market_label.configure(text="市场：上海交易所")
-                else:
-                    self.market_label.configure(text="市场：未知市场")
+                # 获取行情耗时较长，在后台线程中获取，结果经界面更新总线显示
+                if stock_code != self._date_range_code:
+                    self._date_range_code = stock_code
+                    self.date_label.configure(text="数据时间范围：获取中...")
+                    threading.Thread(target=self._fetch_date_range, args=(stock_code,), daemon=True).start()
+                self.market_label.configure(text=get_market_text(stock_code))
             else:
                 self.market_label.configure(text="市场：请输入正确代码")
         except Exception as e:
             print(f"更新日期范围时出错: {e}")
     
-    def run_backtest(self):
+    def _fetch_date_range(self, stock_code):
+        try:
+            text = get_date_range_text(stock_code)
+        except Exception as e:
+            print(f"更新日期范围时出错: {e}")
+            text = "数据时间范围：未获取"
+        ui_bus.post(self._show_date_range, stock_code, text, key=(id(self), 'date_range'))
 
-        self.start_button.configure(state="disabled", text="回测中...")
-        self.progress_bar.set(0.1)
-        
-        thread = threading.Thread(target=self._run_backtest_thread)
-        thread.daemon = True
-        thread.start()
-    
-    def _run_backtest_thread(self):
+    def _show_date_range(self, stock_code, text):
+        # 连续输入多个代码时，只显示最后输入的代码的结果
+        if stock_code == self._date_range_code:
+            self.date_label.configure(text=text)
 
+    def run_backtest(self):
+        # 在界面线程中读取参数，回测提交到后台进程池执行，可以连续提交多个
         try:
             stock_code = self.stock_code_entry.get().strip()
-            start_date_str = self.start_date_entry.get().strip()
-            end_date_str = self.end_date_entry.get().strip()
-            start_cash = float(self.start_cash_entry.get().strip())
-            fast_ma = int(self.fast_ma_entry.get().strip())
-            slow_ma = int(self.slow_ma_entry.get().strip())
-            take_profit = float(self.take_profit_entry.get().strip())
-            take_profit_size = int(self.take_profit_size.get().strip())
-            stop_loss = float(self.stop_loss_entry.get().strip())
-            stop_loss_size = int(self.take_profit_size.get().strip())
-
-            use_sma = self.use_sma_var.get()
-            use_tp = self.use_tp_var.get()
-            use_sl = self.use_sl_var.get()
-            self.progress_bar.set(0.3)
-            try:
-                start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-                end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-            except ValueError:
-                print("日期格式错误", "请使用YYYY-MM-DD格式输入日期")
-                return
-            result, backtest_engine = run_daily_backtest(
+            start_date = datetime.strptime(self.start_date_entry.get().strip(), "%Y-%m-%d")
+            end_date = datetime.strptime(self.end_date_entry.get().strip(), "%Y-%m-%d")
+            params = dict(
                 stock_code=stock_code,
                 start_date=start_date,
                 end_date=end_date,
-                start_cash=start_cash,
-                fast_maperiod=fast_ma,
-                slow_maperiod=slow_ma,
-                take_profit=take_profit,
-                stop_loss=stop_loss,
-                use_sma_crossover=use_sma,
-                use_take_profit=use_tp,
-                use_stop_loss=use_sl,
-                stop_loss_size= stop_loss_size,
-                take_profit_size= take_profit_size,
+                start_cash=float(self.start_cash_entry.get().strip()),
+                fast_maperiod=int(self.fast_ma_entry.get().strip()),
+                slow_maperiod=int(self.slow_ma_entry.get().strip()),
+                take_profit=float(self.take_profit_entry.get().strip()),
+                stop_loss=float(self.stop_loss_entry.get().strip()),
+                use_sma_crossover=self.use_sma_var.get(),
+                use_take_profit=self.use_tp_var.get(),
+                use_stop_loss=self.use_sl_var.get(),
+                stop_loss_size=int(self.take_profit_size.get().strip()),
+                take_profit_size=int(self.take_profit_size.get().strip()),
             )
-            
-            if result and backtest_engine:
-                self.progress_bar.set(0.8)
-                self.last_backtest_engine = backtest_engine
-
-                self.result_text.delete("0.0", "end")
-                self.result_text.insert("0.0", result)
-
-                self.progress_bar.set(1.0)
-
-                strategy_instance = backtest_engine.runstrats[0][0]
-                backtest_engine.plot(
-                    style='candlestick',
-                    iplot=False,
-                    barup='red',
-                    bardown='green',
-                    title=f'{stock_code} 回测结果\n{start_date.strftime("%Y-%m-%d")}',
-                    grid=True,
-                    figsize=(14, 7),
-                )
-            
-        except Exception as e:
-            error_msg = f"回测过程中发生错误：\n{str(e)}"
+        except ValueError as e:
             self.result_text.delete("0.0", "end")
-            self.result_text.insert("0.0", error_msg)
-        
-        finally:
-
-            self.start_button.configure(state="normal", text="🚀 开始回测")
-
-            self.after_idle(lambda: self.progress_bar.set(0))
\ No newline at end of file
+            self.result_text.insert("0.0", f"参数格式错误（日期请使用YYYY-MM-DD格式）：\n{str(e)}")
+            return
+
+        job_id = get_job_manager().submit('daily', params, on_progress=self._on_job_progress,
+                                          on_done=self._on_job_done)
+        self.job_ids.append(job_id)
+        self._set_progress(0)
+        self._update_status()
+
+    def cancel_backtest(self):
+        manager = get_job_manager()
+        for job_id in self.job_ids:
+            manager.cancel(job_id)
+
+    def _update_status(self):
+        count = len(self.job_ids)
+        ui_bus.post(self._show_status, count, key=(id(self), 'status'))
+
+    def _show_status(self, count):
+        self.status_label.configure(text=f"进行中的回测: {count} 个" if count else "")
+        self.cancel_button.configure(state="normal" if count else "disabled")
+
+    def _set_progress(self, value):
+        # 进度经界面更新总线合并，每帧最多重绘一次进度条
+        ui_bus.post(self.progress_bar.set, value, key=(id(self), 'progress'))
+
+    def _on_job_progress(self, job):
+        if self.job_ids and job.job_id == self.job_ids[-1] and job.fraction is not None:
+            self._set_progress(job.fraction)
+
+    def _on_job_done(self, job):
+        self.job_ids.remove(job.job_id)
+        self._update_status()
+        if not self.job_ids:
+            self._set_progress(0)
+
+        if job.state != 'done' or job.result is None:
+            if job.state == 'cancelled':
+                message = "回测已取消"
+            elif job.state == 'error':
+                message = f"回测过程中发生错误：\n{job.error}"
+            else:
+                message = "未找到对应股票数据，请检查代码格式（A股6位数字代码）"
+            self.result_text.delete("0.0", "end")
+            self.result_text.insert("0.0", message)
+            return
+
+        result = job.result
+        self.last_result = result
+        # 记录报告展示和绘图的耗时，与后台进程中的回测各阶段耗时合并
+        with phase_timer() as timer:
+            with phase('render'):
+                self.result_text.delete("0.0", "end")
+                self.result_text.insert("0.0", result.render_report())
+        if timer is not None:
+            result.timings = dict(result.timings, **timer.timings)
+        # 降采样耗时与K线数量相关，在后台线程中生成绘图数据，界面线程只负责绘制
+        threading.Thread(target=self._prepare_chart, args=(result, self.result_chart.width_px),
+                         daemon=True).start()
+
+    def _prepare_chart(self, result, width_px):
+        with phase_timer() as timer:
+            with phase('chart_data'):
+                data = prepare_chart(result, width_px)
+        timings = timer.timings if timer is not None else {}
+        ui_bus.post(self._show_chart, result, data, timings, key=(id(self), 'chart'))
+
+    def _show_chart(self, result, data, timings):
+        # 绘图数据生成期间已有新的回测结果时不再绘制旧结果
+        if result is not self.last_result:
+            return
+        with phase_timer() as timer:
+            with phase('plot'):
+                self.result_chart.show(data)
+        if timer is not None:
+            result.timings = dict(result.timings, **timings, **timer.timings)
+            log_timings('daily', result.stock_code, result.timings)
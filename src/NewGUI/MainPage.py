@@ -1,33 +1,111 @@
-import customtkinter as ctk
-from src.NewGUI.HomePage import NewHomePage
-from src.NewGUI.DailyPage import NewDailyPage
+import importlib
+import threading
 
-from src.NewGUI.TickPage import NewTickPage
+import customtkinter as ctk
+from src.core.jobs import get_job_manager
+from src.utils.ui_bus import ui_bus
 
 
 class MainPage(ctk.CTkFrame):
+    # 页面名 -> (模块, 类名)；页面模块依赖 matplotlib 和 backtrader，第一次显示或预热时才导入，
+    # 启动时只导入并创建首页
+    PAGE_CLASSES = {
+        'HomePage': ('src.NewGUI.HomePage', 'NewHomePage'),
+        'TickPage': ('src.NewGUI.TickPage', 'NewTickPage'),
+        'DailyPage': ('src.NewGUI.DailyPage', 'NewDailyPage'),
+        'WatchlistPage': ('src.NewGUI.WatchlistPage', 'NewWatchlistPage'),
+    }
+    JOB_POLL_INTERVAL = 100
+
     def __init__(self, master, **kwargs):
         super().__init__(master,**kwargs)
         self.grid(row=0, column=1, sticky='nsew')
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
-        self.home_page = NewHomePage(self)
-
-        self.tick_page = NewTickPage(self)
-
-        self.daily_page = NewDailyPage(self)
+        self.pages = {}
         self.current_page = None
+        self._watchlist_thread = None
         self.show_page('HomePage')
+        # 后台线程的界面更新统一由主循环执行
+        ui_bus.attach(self)
+        self.after(self.JOB_POLL_INTERVAL, self._poll_jobs)
+
+    def get_page(self, page_name):
+        page = self.pages.get(page_name)
+        if page is None and page_name in self.PAGE_CLASSES:
+            module_name, class_name = self.PAGE_CLASSES[page_name]
+            page_class = getattr(importlib.import_module(module_name), class_name)
+            page = page_class(self)
+            self.pages[page_name] = page
+        return page
+
+    def prewarm(self):
+        """
+        首页显示后预热：先在后台线程导入其余页面模块（导入耗时约1秒，不占用界面线程）并加载股票代码表，
+        导入完成后在空闲时间启动回测进程池，再逐个创建其余页面，
+        每个空闲回调只做一件事，不阻塞用户操作；全部完成后在后台预热自选股的行情缓存
+        """
+        names = [name for name in self.PAGE_CLASSES if name not in self.pages]
+
+        def run_next(steps):
+            if steps:
+                steps.pop(0)()
+                self.after(50, lambda: self.after_idle(run_next, steps))
+            else:
+                self.start_watchlist_prewarm()
+
+        def import_pages():
+            for name in names:
+                try:
+                    importlib.import_module(self.PAGE_CLASSES[name][0])
+                except Exception as e:
+                    print(f"预加载页面 {name} 失败: {e}")
+            # 进程池在导入结束后的空闲时间创建；工作进程由 forkserver 启动，不会复制后台线程持有的锁
+            steps = [get_job_manager] + [lambda name=name: self.get_page(name) for name in names]
+            ui_bus.post(self.after_idle, run_next, steps)
+
+        threading.Thread(target=import_pages, daemon=True).start()
+        threading.Thread(target=self._load_symbols, daemon=True).start()
+
+    @staticmethod
+    def _load_symbols():
+        # 加载本地股票代码表供代码补全使用，不存在或超过一天时在后台重新获取
+        from src.core.symbols import ensure_symbol_master
+        ensure_symbol_master()
+
+    def start_watchlist_prewarm(self):
+        """
+        在后台线程中预热自选股的本地行情缓存（按限速逐只获取），进度通过界面消息总线通知自选股页面
+
+        返回:
+            bool: 是否启动了新的预热，已有预热在进行时返回False
+        """
+        if self._watchlist_thread is not None and self._watchlist_thread.is_alive():
+            return False
+        self._watchlist_thread = threading.Thread(target=self._prewarm_watchlist, daemon=True)
+        self._watchlist_thread.start()
+        return True
+
+    def _prewarm_watchlist(self):
+        from src.core.watchlist import load_watchlist, prewarm_watchlist
+        symbols = load_watchlist()
+        for done, _ in enumerate(prewarm_watchlist(symbols), start=1):
+            ui_bus.post(self._on_prewarm_progress, done, len(symbols), key='watchlist_prewarm')
+
+    def _on_prewarm_progress(self, done, total):
+        page = self.pages.get('WatchlistPage')
+        if page is not None:
+            page.on_prewarm_progress(done, total)
+
+    def _poll_jobs(self):
+        manager = get_job_manager(create=False)
+        if manager is not None:
+            manager.poll()
+        self.after(self.JOB_POLL_INTERVAL, self._poll_jobs)
 
     def show_page(self, page_name):
-        new_page = None
-        if page_name == 'HomePage':
-            new_page = self.home_page
-        elif page_name == 'TickPage':
-            new_page = self.tick_page
-        elif page_name == 'DailyPage':
-            new_page = self.daily_page
-        
+        new_page = self.get_page(page_name)
+
         if new_page == self.current_page:
             return
 
@@ -42,5 +120,3 @@ class MainPage(ctk.CTkFrame):
 
         if new_page:
             new_page.focus_set()
-
-
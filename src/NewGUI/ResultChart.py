@@ -0,0 +1,37 @@
+import customtkinter as ctk
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from src.utils.chart_util import draw_chart
+
+
+class ResultChart(ctk.CTkFrame):
+    """
+    嵌入页面的回测结果图
+
+    不使用 pyplot 和独立窗口；绘图数据由 prepare_chart 按画布宽度降采样生成，
+    show 只在界面线程中调用，绘制耗时与K线数量无关
+    """
+
+    def __init__(self, master, height=460, **kwargs):
+        super().__init__(master, height=height, **kwargs)
+        self.figure = Figure(figsize=(10, height / 100), dpi=100)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.width_px = 1000
+        self.canvas.get_tk_widget().bind("<Configure>", self._on_resize)
+
+    def _on_resize(self, event):
+        # 记录画布宽度，降采样按该宽度进行
+        self.width_px = max(event.width, 100)
+
+    def show(self, data):
+        """绘制 prepare_chart 生成的绘图数据，必须在界面线程中调用"""
+        if data is None:
+            return
+        draw_chart(self.figure, data)
+        self.canvas.draw_idle()
+
+    def clear(self):
+        self.figure.clear()
+        self.canvas.draw_idle()
@@ -0,0 +1,100 @@
+import tkinter as tk
+
+from src.core.symbols import get_symbol_master
+
+
+class SymbolCompleter:
+    """
+    股票代码输入框的自动补全
+
+    每次按键在本地股票代码表中按代码、名称或拼音首字母前缀查找，在输入框下方弹出候选列表，
+    不访问网络；方向键下移到列表，回车或单击选中后把代码填入输入框
+
+    参数:
+        entry: CTkEntry 输入框
+        on_select: 可选，选中后的回调 on_select(股票代码)
+        limit: 最多显示的候选数量
+    """
+
+    def __init__(self, entry, on_select=None, limit=8):
+        self.entry = entry
+        self.on_select = on_select
+        self.limit = limit
+        self._popup = None
+        self._listbox = None
+        self._codes = []
+        entry.bind("<KeyRelease>", self._on_key_release)
+        entry.bind("<Down>", self._focus_list)
+        entry.bind("<Escape>", lambda event: self.hide())
+        entry.bind("<FocusOut>", lambda event: entry.after(150, self._hide_if_unfocused))
+
+    def _on_key_release(self, event):
+        if event.keysym in ("Down", "Up", "Return", "Escape", "Tab"):
+            return
+        text = self.entry.get().strip()
+        master = get_symbol_master()
+        # 已输入完整代码时不再提示
+        if not text or (text.isdigit() and len(text) == 6 and text in master):
+            self.hide()
+            return
+        found = master.search(text, self.limit)
+        if not found:
+            self.hide()
+            return
+        self._show(found)
+
+    def _show(self, found):
+        if self._popup is None:
+            self._popup = tk.Toplevel(self.entry)
+            self._popup.overrideredirect(True)
+            self._listbox = tk.Listbox(self._popup, activestyle="dotbox", exportselection=False)
+            self._listbox.pack(fill="both", expand=True)
+            self._listbox.bind("<ButtonRelease-1>", self._choose)
+            self._listbox.bind("<Return>", self._choose)
+            self._listbox.bind("<Escape>", lambda event: self.hide())
+            self._listbox.bind("<FocusOut>", lambda event: self.entry.after(150, self._hide_if_unfocused))
+
+        self._codes = [info.code for info in found]
+        self._listbox.delete(0, "end")
+        for info in found:
+            suffix = "（已退市）" if info.status == "退市" else ""
+            self._listbox.insert("end", f"{info.code}  {info.name}  {info.board}{suffix}")
+        self._listbox.configure(height=len(found))
+
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self._popup.geometry(f"{max(self.entry.winfo_width(), 240)}x{self._listbox.winfo_reqheight()}+{x}+{y}")
+        self._popup.deiconify()
+        self._popup.lift()
+
+    def _focus_list(self, event=None):
+        if self._popup is None or not self._popup.winfo_viewable():
+            return
+        self._listbox.focus_set()
+        self._listbox.selection_clear(0, "end")
+        self._listbox.selection_set(0)
+        self._listbox.activate(0)
+
+    def _choose(self, event=None):
+        selection = self._listbox.curselection()
+        if not selection:
+            return
+        code = self._codes[selection[0]]
+        self.entry.delete(0, "end")
+        self.entry.insert(0, code)
+        self.hide()
+        self.entry.focus_set()
+        if self.on_select is not None:
+            self.on_select(code)
+
+    def _hide_if_unfocused(self):
+        try:
+            focus = self.entry.focus_get()
+        except KeyError:
+            focus = None
+        if focus is not self._listbox and focus is not getattr(self.entry, "_entry", None):
+            self.hide()
+
+    def hide(self):
+        if self._popup is not None:
+            self._popup.withdraw()
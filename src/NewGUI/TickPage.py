@@ -1,23 +1,24 @@
 import customtkinter as ctk
 from datetime import datetime
-import matplotlib.pyplot as plt
 import threading
-from src.core.backtest import run_ticks_backtest
-import akshare as ak
-import pandas as pd
+from src.core.jobs import get_job_manager
+from src.core.timing import log_timings, phase, phase_timer
+from src.NewGUI.ResultChart import ResultChart
+from src.NewGUI.SymbolCompleter import SymbolCompleter
+from src.utils.chart_util import prepare_chart
+from src.utils.fast_use_util import get_market_text
+from src.utils.ui_bus import ui_bus
 
 
-plt.rcParams['font.family'] = 'SimHei'
-plt.rcParams['axes.unicode_minus'] = False
-
 class NewTickPage(ctk.CTkFrame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
         
-        self.last_backtest_engine = None
-        
+        self.last_result = None
+        # 本页面提交、尚未结束的后台任务编号，进度条显示最后提交的任务
+        self.job_ids = []
 
         self.create_tick_content()
     
@@ -60,6 +61,8 @@ class NewTickPage(ctk.CTkFrame):
         self.stock_code_entry.grid(row=1, column=1, padx=(0, 20), pady=10, sticky="ew")
         self.stock_code_entry.insert(0, "000001")
         self.stock_code_entry.bind("<KeyRelease>", self.update_date_range)
+        # 按代码、名称或拼音首字母在本地代码表中补全，不访问网络
+        self.code_completer = SymbolCompleter(self.stock_code_entry, on_select=lambda code: self.update_date_range())
 
         self.market_label = ctk.CTkLabel(
             basic_frame, 
@@ -75,21 +78,10 @@ class NewTickPage(ctk.CTkFrame):
         self.trade_date_entry = ctk.CTkEntry(basic_frame, placeholder_text="YYYY-MM-DD")
         self.trade_date_entry.grid(row=3, column=1, padx=(0, 20), pady=10, sticky="ew")
 
-        try:
-            trade_cal = ak.tool_trade_date_hist_sina()
-            today = pd.Timestamp.today().normalize()
-            if 'is_open' in trade_cal.columns:
-                trade_days = pd.to_datetime(trade_cal[trade_cal['is_open']==1]['trade_date'])
-            elif 'flag' in trade_cal.columns:
-                trade_days = pd.to_datetime(trade_cal[trade_cal['flag']=='交易']['trade_date'])
-            else:
-                trade_days = pd.to_datetime(trade_cal['trade_date'])
-            trade_days = trade_days[trade_days <= today]
-            last_trade_day = trade_days.max().strftime("%Y-%m-%d") if not trade_days.empty else today.strftime("%Y-%m-%d")
-        except:
-            last_trade_day = datetime.now().strftime("%Y-%m-%d")
-        
-        self.trade_date_entry.insert(0, last_trade_day)
+        # 交易日历需要联网获取，先填入今天，后台线程获取到最近交易日后再替换（用户已修改时不替换）
+        self._default_trade_date = datetime.now().strftime("%Y-%m-%d")
+        self.trade_date_entry.insert(0, self._default_trade_date)
+        threading.Thread(target=self._fetch_last_trade_day, daemon=True).start()
         
 
         date_note = ctk.CTkLabel(
@@ -201,8 +193,20 @@ class NewTickPage(ctk.CTkFrame):
             height=50,
             command=self.run_backtest
         )
-        self.start_button.pack(pady=20)
-        
+        self.start_button.pack(pady=(20, 10))
+
+        self.cancel_button = ctk.CTkButton(
+            control_frame,
+            text="取消回测",
+            font=ctk.CTkFont(size=14),
+            fg_color="gray",
+            state="disabled",
+            command=self.cancel_backtest
+        )
+        self.cancel_button.pack(pady=(0, 10))
+
+        self.status_label = ctk.CTkLabel(control_frame, text="", font=ctk.CTkFont(size=12), text_color="gray")
+        self.status_label.pack()
 
         self.progress_bar = ctk.CTkProgressBar(control_frame)
         self.progress_bar.pack(pady=(0, 20), padx=40, fill="x")
@@ -230,103 +234,143 @@ class NewTickPage(ctk.CTkFrame):
         )
         self.result_text.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="ew")
         self.result_text.insert("0.0", "等待分时回测开始...")
+
+        self.result_chart = ResultChart(results_frame)
+        self.result_chart.grid(row=2, column=0, padx=20, pady=(0, 20), sticky="ew")
     
+    def _fetch_last_trade_day(self):
+        try:
+            # 在后台线程中导入，akshare 导入耗时不计入页面创建
+            from ..core.data import akshare_session
+            import pandas as pd
+
+            with akshare_session() as ak:
+                trade_cal = ak.tool_trade_date_hist_sina()
+            today = pd.Timestamp.today().normalize()
+            if 'is_open' in trade_cal.columns:
+                trade_days = pd.to_datetime(trade_cal[trade_cal['is_open']==1]['trade_date'])
+            elif 'flag' in trade_cal.columns:
+                trade_days = pd.to_datetime(trade_cal[trade_cal['flag']=='交易']['trade_date'])
+            else:
+                trade_days = pd.to_datetime(trade_cal['trade_date'])
+            trade_days = trade_days[trade_days <= today]
+            last_trade_day = trade_days.max().strftime("%Y-%m-%d") if not trade_days.empty else today.strftime("%Y-%m-%d")
+        except:
+            return
+        ui_bus.post(self._show_last_trade_day, last_trade_day, key=(id(self), 'trade_date'))
+
+    def _show_last_trade_day(self, last_trade_day):
+        if self.trade_date_entry.get().strip() == self._default_trade_date:
+            self.trade_date_entry.delete(0, "end")
+            self.trade_date_entry.insert(0, last_trade_day)
+
     def update_date_range(self, event=None):
 
         try:
             stock_code = self.stock_code_entry.get().strip()
             if len(stock_code) == 6 and stock_code.isdigit():
-                if stock_code.startswith('0') or stock_code.startswith('3'):
-                    self.market_label.configure(text="市场：深圳交易所")
-                elif stock_code.startswith('6'):
-                    self.market_label.configure(text="市场：上海交易所")
-                else:
-                    self.market_label.configure(text="市场：未知市场")
+                self.market_label.configure(text=get_market_text(stock_code))
             else:
                 self.market_label.configure(text="市场：请输入正确代码")
         except Exception as e:
             print(f"更新日期范围时出错: {e}")
     
     def run_backtest(self):
-
-        self.start_button.configure(state="disabled", text="分时回测中...")
-        self.progress_bar.set(0.1)
-        
-        thread = threading.Thread(target=self._run_backtest_thread)
-        thread.daemon = True
-        thread.start()
-    
-    def _run_backtest_thread(self):
-
+        # 在界面线程中读取参数，回测提交到后台进程池执行，可以连续提交多个
         try:
-            stock_code = self.stock_code_entry.get().strip()
-            trade_date_str = self.trade_date_entry.get().strip()
-            start_cash = float(self.start_cash_entry.get().strip())
-            price_period = int(self.price_period_entry.get().strip())
-            volume_period = int(self.volume_period_entry.get().strip())
-            take_profit = float(self.take_profit_entry.get().strip())
-            stop_loss = float(self.stop_loss_entry.get().strip())
-            
-
-            use_tp = self.use_tp_var.get()
-            use_sl = self.use_sl_var.get()
-            use_price_ma = self.use_price_ma_var.get()
-            use_volume_ma = self.use_volume_ma_var.get()
-            
-            self.progress_bar.set(0.3)
-            try:
-                trade_date = datetime.strptime(trade_date_str, "%Y-%m-%d")
-            except ValueError:
-                print("日期格式错误", "请使用YYYY-MM-DD格式输入日期")
-                return
-
-            result, backtest_engine = run_ticks_backtest(
-                stock_code=stock_code,
-                date=trade_date,
-                start_cash=start_cash,
-                price_period=price_period,
-                volume_period=volume_period,
-                profit_rate=take_profit,
-                loss_rate=stop_loss,
-                stop_by_profit=use_tp,
-                stop_by_loss=use_sl,
-                use_price_ma=use_price_ma,
-                use_volume_ma=use_volume_ma,
+            params = dict(
+                stock_code=self.stock_code_entry.get().strip(),
+                date=datetime.strptime(self.trade_date_entry.get().strip(), "%Y-%m-%d"),
+                start_cash=float(self.start_cash_entry.get().strip()),
+                price_period=int(self.price_period_entry.get().strip()),
+                volume_period=int(self.volume_period_entry.get().strip()),
+                profit_rate=float(self.take_profit_entry.get().strip()),
+                loss_rate=float(self.stop_loss_entry.get().strip()),
+                stop_by_profit=self.use_tp_var.get(),
+                stop_by_loss=self.use_sl_var.get(),
+                use_price_ma=self.use_price_ma_var.get(),
+                use_volume_ma=self.use_volume_ma_var.get(),
                 profit_size=1000,
                 loss_size=1000,
                 buy_size=1000,
-                sell_size=1000
+                sell_size=1000,
             )
-            if result and backtest_engine:
-                self.progress_bar.set(0.8)
-                self.last_backtest_engine = backtest_engine
-
-                self.result_text.delete("0.0", "end")
-                self.result_text.insert("0.0", result)
-
-                self.progress_bar.set(1.0)
-
-                strategy_instance = backtest_engine.runstrats[0][0]
-                backtest_engine.plot(
-                    style='candlestick',
-                    iplot=False,
-                    barup='red',
-                    bardown='green',
-                    title=f'{stock_code} 回测结果\n{trade_date.strftime("%Y-%m-%d")}',
-                    grid=True,
-                    figsize=(14, 7),
-                )
-
-
-
-            
-        except Exception as e:
-            error_msg = f"分时回测过程中发生错误：\n{str(e)}"
+        except ValueError as e:
             self.result_text.delete("0.0", "end")
-            self.result_text.insert("0.0", error_msg)
-        
-        finally:
-
-            self.start_button.configure(state="normal", text="🚀 开始分时回测")
-
-            self.after_idle(lambda: self.progress_bar.set(0))
\ No newline at end of file
+            self.result_text.insert("0.0", f"参数格式错误（日期请使用YYYY-MM-DD格式）：\n{str(e)}")
+            return
+
+        job_id = get_job_manager().submit('ticks', params, on_progress=self._on_job_progress,
+                                          on_done=self._on_job_done)
+        self.job_ids.append(job_id)
+        self._set_progress(0)
+        self._update_status()
+
+    def cancel_backtest(self):
+        manager = get_job_manager()
+        for job_id in self.job_ids:
+            manager.cancel(job_id)
+
+    def _update_status(self):
+        count = len(self.job_ids)
+        ui_bus.post(self._show_status, count, key=(id(self), 'status'))
+
+    def _show_status(self, count):
+        self.status_label.configure(text=f"进行中的分时回测: {count} 个" if count else "")
+        self.cancel_button.configure(state="normal" if count else "disabled")
+
+    def _set_progress(self, value):
+        # 进度经界面更新总线合并，每帧最多重绘一次进度条
+        ui_bus.post(self.progress_bar.set, value, key=(id(self), 'progress'))
+
+    def _on_job_progress(self, job):
+        if self.job_ids and job.job_id == self.job_ids[-1] and job.fraction is not None:
+            self._set_progress(job.fraction)
+
+    def _on_job_done(self, job):
+        self.job_ids.remove(job.job_id)
+        self._update_status()
+        if not self.job_ids:
+            self._set_progress(0)
+
+        if job.state != 'done' or job.result is None:
+            if job.state == 'cancelled':
+                message = "分时回测已取消"
+            elif job.state == 'error':
+                message = f"分时回测过程中发生错误：\n{job.error}"
+            else:
+                message = "未找到对应股票数据，请检查代码格式（A股6位数字代码）"
+            self.result_text.delete("0.0", "end")
+            self.result_text.insert("0.0", message)
+            return
+
+        result = job.result
+        self.last_result = result
+        # 记录报告展示和绘图的耗时，与后台进程中的回测各阶段耗时合并
+        with phase_timer() as timer:
+            with phase('render'):
+                self.result_text.delete("0.0", "end")
+                self.result_text.insert("0.0", result.render_report())
+        if timer is not None:
+            result.timings = dict(result.timings, **timer.timings)
+        # 降采样耗时与K线数量相关，在后台线程中生成绘图数据，界面线程只负责绘制
+        threading.Thread(target=self._prepare_chart, args=(result, self.result_chart.width_px),
+                         daemon=True).start()
+
+    def _prepare_chart(self, result, width_px):
+        with phase_timer() as timer:
+            with phase('chart_data'):
+                data = prepare_chart(result, width_px)
+        timings = timer.timings if timer is not None else {}
+        ui_bus.post(self._show_chart, result, data, timings, key=(id(self), 'chart'))
+
+    def _show_chart(self, result, data, timings):
+        # 绘图数据生成期间已有新的回测结果时不再绘制旧结果
+        if result is not self.last_result:
+            return
+        with phase_timer() as timer:
+            with phase('plot'):
+                self.result_chart.show(data)
+        if timer is not None:
+            result.timings = dict(result.timings, **timings, **timer.timings)
+            log_timings('ticks', result.stock_code, result.timings)
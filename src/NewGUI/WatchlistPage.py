@@ -0,0 +1,103 @@
+import customtkinter as ctk
+
+from ..core.symbols import get_symbol_master
+from ..core.watchlist import MAX_SYMBOLS, cache_status, load_watchlist, save_watchlist
+
+
+class NewWatchlistPage(ctk.CTkFrame):
+    """
+    自选股页面：编辑自选股列表，查看每只股票本地行情缓存的新鲜度，
+    启动后的后台预热和"立即预热"都由 MainPage 在后台线程中执行，进度到达时刷新状态表
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.main_page = master
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        self.create_watchlist_content()
+        self.refresh_status()
+
+    def create_watchlist_content(self):
+        title_label = ctk.CTkLabel(
+            self,
+            text="自选股",
+            font=ctk.CTkFont(size=28, weight="bold")
+        )
+        title_label.grid(row=0, column=0, pady=(20, 30))
+
+        content_frame = ctk.CTkFrame(self)
+        content_frame.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="nsew")
+        content_frame.grid_columnconfigure(1, weight=1)
+        content_frame.grid_rowconfigure(1, weight=1)
+
+        ctk.CTkLabel(
+            content_frame,
+            text=f"股票代码（每行一个，最多{MAX_SYMBOLS}只）",
+            font=ctk.CTkFont(size=14)
+        ).grid(row=0, column=0, padx=(20, 10), pady=(15, 5), sticky="w")
+        self.symbols_textbox = ctk.CTkTextbox(content_frame, width=160)
+        self.symbols_textbox.grid(row=1, column=0, padx=(20, 10), pady=5, sticky="nsew")
+        self.symbols_textbox.insert("1.0", "\n".join(load_watchlist()))
+
+        ctk.CTkLabel(
+            content_frame,
+            text="本地缓存状态",
+            font=ctk.CTkFont(size=14)
+        ).grid(row=0, column=1, padx=(10, 20), pady=(15, 5), sticky="w")
+        self.status_textbox = ctk.CTkTextbox(content_frame)
+        self.status_textbox.grid(row=1, column=1, padx=(10, 20), pady=5, sticky="nsew")
+
+        button_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
+        button_frame.grid(row=2, column=0, columnspan=2, padx=20, pady=(10, 5), sticky="ew")
+        ctk.CTkButton(button_frame, text="保存", command=self.save).pack(side="left", padx=(0, 10))
+        ctk.CTkButton(button_frame, text="立即预热", command=self.prewarm).pack(side="left")
+
+        self.message_label = ctk.CTkLabel(content_frame, text="", font=ctk.CTkFont(size=12), text_color="gray")
+        self.message_label.grid(row=3, column=0, columnspan=2, padx=20, pady=(0, 15), sticky="w")
+
+    def save(self):
+        """保存编辑框中的自选股，返回保存的代码列表，格式错误时返回None"""
+        try:
+            symbols = save_watchlist(self.symbols_textbox.get("1.0", "end").split())
+        except (ValueError, OSError) as e:
+            self.message_label.configure(text=f"保存失败: {e}", text_color="red")
+            return None
+        self.symbols_textbox.delete("1.0", "end")
+        self.symbols_textbox.insert("1.0", "\n".join(symbols))
+        self.message_label.configure(text=f"已保存 {len(symbols)} 只自选股", text_color="gray")
+        self.refresh_status()
+        return symbols
+
+    def prewarm(self):
+        if self.save() is None:
+            return
+        if self.main_page.start_watchlist_prewarm():
+            self.message_label.configure(text="正在后台预热行情缓存…", text_color="gray")
+        else:
+            self.message_label.configure(text="预热已在进行中", text_color="gray")
+
+    def on_prewarm_progress(self, done, total):
+        self.refresh_status()
+        text = "行情缓存预热完成" if done == total else f"正在预热行情缓存 {done}/{total}"
+        self.message_label.configure(text=text, text_color="gray")
+
+    def refresh_status(self):
+        """重新检查本地缓存（只读取文件时间，不访问网络）并刷新状态表"""
+        master = get_symbol_master()
+        lines = ["代码\t名称\t日K线\t\t分钟线"]
+        for symbol in load_watchlist():
+            status = cache_status(symbol)
+            info = master.get(symbol)
+            name = info.name if info else ""
+            updated = status['daily_updated']
+            if updated is None:
+                daily = "未缓存"
+            else:
+                daily = f"{updated:%m-%d %H:%M} {'最新' if status['daily_fresh'] else '过期'}"
+            minute = f"{status['session']:%m-%d} {'已缓存' if status['minute_cached'] else '未缓存'}"
+            lines.append(f"{symbol}\t{name}\t{daily}\t{minute}")
+        self.status_textbox.configure(state="normal")
+        self.status_textbox.delete("1.0", "end")
+        self.status_textbox.insert("1.0", "\n".join(lines))
+        self.status_textbox.configure(state="disabled")
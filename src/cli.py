@@ -0,0 +1,388 @@
+"""
+股票量化交易回测系统 - 命令行入口
+无需图形界面即可批量执行回测，适用于脚本、定时任务和无显示器的服务器
+
+用法（在项目根目录下执行）:
+    python -m src.cli run jobs.json --workers 4 --output results.jsonl --checkpoint sweep.db
+    python -m src.cli run jobs.json --serve 0.0.0.0:9950 -o results.jsonl  &  python -m src.cli worker host:9950 -p 4
+    python -m src.cli paper --kind ticks --replay bars.csv --interval 1
+    python -m src.cli store update && python -m src.cli screen --signal golden_cross
+    python -m src.cli symbols update && python -m src.cli symbols search payh
+    python -m src.cli watchlist set 600519 000001 && python -m src.cli watchlist prewarm
+"""
+
+import argparse
+import contextlib
+import functools
+import itertools
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+
+from src.core.batch import DATE_FORMAT, expand_jobs, job_keys, load_job_file, run_jobs, write_results
+from src.core.checkpoint import SweepCheckpoint
+from src.core.distributed import LEASE_TIMEOUT, MAX_ATTEMPTS, run_coordinator, run_worker
+from src.core.http_cache import set_offline
+from src.core.paper import ReplayFileSource, SocketSource, format_histogram, run_paper_trading, serve_replay_file
+from src.core.robustness import run_robustness
+from src.core.screener import SIGNALS, screen_universe
+from src.core.store import update_store
+from src.core.symbols import get_symbol_master, refresh_symbol_master
+from src.core.tradelog import configure_trade_log, trade_log_settings
+from src.core.watchlist import MIN_REQUEST_INTERVAL, cache_status, load_watchlist, prewarm_watchlist, save_watchlist
+
+
+def cmd_run(args):
+    """执行任务文件中的全部回测任务，结果以JSON Lines格式输出"""
+    jobs = expand_jobs(load_job_file(args.job_file))
+    runner = None
+    if args.serve:
+        # 协调节点模式：任务分发给连接到该地址的工作节点（以及 --local-workers 个本机工作节点）
+        # 未指定主机时只监听本机；多主机执行需显式指定监听地址（如 0.0.0.0:9950）
+        host, port = _parse_address(args.serve)
+        runner = functools.partial(run_coordinator, host=host, port=port, lease_timeout=args.lease_timeout,
+                                   max_attempts=args.max_attempts, local_workers=args.local_workers)
+        print(f"共 {len(jobs)} 个回测任务，由工作节点执行", file=sys.stderr)
+    else:
+        print(f"共 {len(jobs)} 个回测任务，并行度 {args.workers}", file=sys.stderr)
+
+    checkpoint = SweepCheckpoint(args.checkpoint) if args.checkpoint else None
+    try:
+        records = run_jobs(jobs, args.workers, args.series, checkpoint, runner)
+        if checkpoint is not None:
+            # 断点中已成功的任务不再执行，其结果先输出，输出文件始终包含全部任务
+            done = list(checkpoint.records_for(job_keys(jobs, args.series)))
+            print(f"断点中已完成 {len(done)} 个任务", file=sys.stderr)
+            records = itertools.chain(done, records)
+        if args.output == "-":
+            ok_count, failed_count = write_results(records, sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8") as out:
+                ok_count, failed_count = write_results(records, out)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    print(f"完成: 成功 {ok_count} 个，失败 {failed_count} 个", file=sys.stderr)
+    return 0 if failed_count == 0 else 1
+
+
+def _parse_address(value, default_host="127.0.0.1"):
+    host, _, port = value.rpartition(":")
+    return host or default_host, int(port)
+
+
+def cmd_worker(args):
+    """工作节点：连接协调节点领取并执行回测任务，可同时启动多个进程"""
+    host, port = _parse_address(args.address)
+    if args.processes <= 1:
+        completed = run_worker(host, port, connect_timeout=args.connect_timeout)
+        print(f"工作节点结束: 完成 {completed} 个任务", file=sys.stderr)
+        return 0
+    initializer = functools.partial(configure_trade_log, **trade_log_settings())
+    with ProcessPoolExecutor(max_workers=args.processes, initializer=initializer) as executor:
+        futures = [executor.submit(run_worker, host, port, connect_timeout=args.connect_timeout)
+                   for _ in range(args.processes)]
+        completed = sum(future.result() for future in futures)
+    print(f"工作节点结束: {args.processes} 个进程共完成 {completed} 个任务", file=sys.stderr)
+    return 0
+
+
+def cmd_checkpoint(args):
+    """查看断点数据库中已完成的结果，扫描进行中也可以查询"""
+    with SweepCheckpoint(args.path) as checkpoint:
+        if args.dump:
+            ok = {"ok": True, "failed": False, "all": None}[args.dump]
+            for record in checkpoint.records(ok=ok):
+                print(json.dumps(record, ensure_ascii=False, default=str))
+        summary = checkpoint.summary()
+    last = datetime.fromtimestamp(summary["last_finished"]).strftime("%Y-%m-%d %H:%M:%S") if summary["last_finished"] else "-"
+    print(f"已完成 {summary['total']} 个任务：成功 {summary['ok']} 个，失败 {summary['failed']} 个，最后完成于 {last}",
+          file=sys.stderr)
+    return 0
+
+
+def _parse_date(value):
+    return datetime.strptime(value, DATE_FORMAT) if value else None
+
+
+def cmd_robust(args):
+    """对一组策略参数执行蒙特卡洛/自助法稳健性检验，输出分布统计"""
+    params = json.loads(args.params)
+    start_cash = params.pop("start_cash", args.start_cash)
+    report = run_robustness(
+        args.kind, args.symbol, params, start_cash,
+        n_paths=args.paths, block_size=args.block_size, max_delay=args.max_delay,
+        workers=args.workers, seed=args.seed,
+        start_date=_parse_date(args.start), end_date=_parse_date(args.end), trade_date=_parse_date(args.date),
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(text)
+    return 0
+
+
+def cmd_paper(args):
+    """从回放文件或TCP行情服务逐根接收K线执行模拟交易，输出交易结果和决策延迟统计"""
+    if args.connect:
+        source = SocketSource(*_parse_address(args.connect))
+    else:
+        source = ReplayFileSource(args.replay, args.interval)
+    params = json.loads(args.params)
+
+    # 策略日志输出到标准错误，标准输出只保留结果
+    sys.stdout.flush()
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        result, latency = run_paper_trading(args.kind, source, params, args.start_cash, args.symbol)
+    finally:
+        sys.stdout = stdout
+
+    print("决策延迟（K线到达 -> 下单决策完成）:", file=sys.stderr)
+    print(format_histogram(latency["total"]), file=sys.stderr)
+    report = {
+        "result": result.to_dict(include_series=args.series) if result is not None else None,
+        "latency_us": latency,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(text)
+    return 0
+
+
+def cmd_feed(args):
+    """把回放文件作为本地TCP行情服务推送，用于模拟实时行情"""
+    serve_replay_file(args.replay, args.host, args.port, args.interval)
+    return 0
+
+
+def cmd_store_update(args):
+    """收盘后更新本地行情库（日K线），供选股等功能离线使用"""
+    ok_count = failed_count = 0
+    for symbol, ok in update_store(args.symbols or None, args.store_dir):
+        if ok:
+            ok_count += 1
+        else:
+            failed_count += 1
+            print(f"更新失败: {symbol}", file=sys.stderr)
+    print(f"完成: 成功 {ok_count} 只，失败 {failed_count} 只", file=sys.stderr)
+    return 0 if failed_count == 0 else 1
+
+
+def cmd_symbols_update(args):
+    """批量获取全部A股代码表（代码、名称、板块、上市日期、状态）保存到本地"""
+    master = refresh_symbol_master()
+    if not master.updated:
+        print("获取股票代码表失败", file=sys.stderr)
+        return 1
+    print(f"完成: 共 {len(master)} 只股票", file=sys.stderr)
+    return 0
+
+
+def cmd_symbols_search(args):
+    """在本地股票代码表中按代码、名称或拼音首字母前缀查找，逐行输出（JSON Lines）"""
+    master = get_symbol_master()
+    if not len(master):
+        print("本地没有股票代码表，请先执行 symbols update", file=sys.stderr)
+        return 1
+    for info in master.search(args.text, args.limit):
+        print(json.dumps(asdict(info), ensure_ascii=False))
+    return 0
+
+
+def cmd_watchlist_set(args):
+    """保存自选股（覆盖原有列表）"""
+    try:
+        symbols = save_watchlist(args.symbols)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"已保存 {len(symbols)} 只自选股", file=sys.stderr)
+    return 0
+
+
+def cmd_watchlist_status(args):
+    """逐行输出自选股本地行情缓存的新鲜度（JSON Lines），只检查本地文件"""
+    for symbol in load_watchlist():
+        print(json.dumps(cache_status(symbol), ensure_ascii=False, default=str))
+    return 0
+
+
+def cmd_watchlist_prewarm(args):
+    """按限速预热自选股的本地行情缓存，逐行输出预热后的新鲜度（JSON Lines）"""
+    incomplete = 0
+    statuses = prewarm_watchlist(min_interval=args.interval)
+    while True:
+        # 获取失败时的提示写入标准错误，标准输出留给结果
+        with contextlib.redirect_stdout(sys.stderr):
+            status = next(statuses, None)
+        if status is None:
+            break
+        if not (status['daily_fresh'] and status['minute_cached']):
+            incomplete += 1
+        print(json.dumps(status, ensure_ascii=False, default=str), flush=True)
+    return 0 if incomplete == 0 else 1
+
+
+def cmd_screen(args):
+    """扫描本地行情库中的全部股票，逐行输出满足条件的结果（JSON Lines）"""
+    rows = screen_universe(
+        signals=args.signal, fast_maperiod=args.fast, slow_maperiod=args.slow, volume_period=args.volume_period,
+        stop_loss=args.stop_loss, take_profit=args.take_profit, near_stop=args.near_stop,
+        near_target=args.near_target, as_of=args.as_of, symbols=args.symbols or None,
+        workers=args.workers, store_dir=args.store_dir,
+    )
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    count = 0
+    try:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"匹配 {count} 只股票", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="股票量化交易回测系统命令行工具")
+    parser.add_argument("--log-level", choices=["debug", "info", "warning", "error", "off"],
+                        help="策略交易日志级别，默认 run/robust 为 off，paper 为 info")
+    parser.add_argument("--log-file", help="交易日志文件（JSON Lines），后台异步写入")
+    parser.add_argument("--offline", action="store_true",
+                        help="离线模式：数据源请求只读取HTTP响应缓存，缓存中没有时立即失败")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="批量执行任务文件中的回测")
+    run_parser.add_argument("job_file", help="JSON格式的任务文件")
+    run_parser.add_argument("-w", "--workers", type=int, default=1, help="并行工作进程数，默认为1")
+    run_parser.add_argument("-o", "--output", default="-", help="结果输出文件，默认为标准输出")
+    run_parser.add_argument("--series", action="store_true", help="结果中包含资金曲线和成交记录")
+    run_parser.add_argument("--checkpoint", help="断点数据库（SQLite）文件，每完成一个任务立即写入，重新执行时跳过已成功的任务")
+    run_parser.set_defaults(func=cmd_run, default_log_level="off")
+
+    run_parser.add_argument("--serve", metavar="HOST:PORT",
+                            help="协调节点模式：在该地址等待工作节点连接并分发任务，不在本机进程池中执行；"
+                                 "只写端口时监听 127.0.0.1，其他主机的工作节点需要显式指定主机（如 0.0.0.0:9950）")
+    run_parser.add_argument("--local-workers", type=int, default=0, help="协调节点模式下同时在本机启动的工作节点数")
+    run_parser.add_argument("--lease-timeout", type=float, default=LEASE_TIMEOUT,
+                            help="工作节点超过该时间（秒）没有心跳时任务重新排队")
+    run_parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="每个任务最多分发的次数")
+
+    worker_parser = subparsers.add_parser("worker", help="工作节点：连接协调节点领取并执行回测任务")
+    worker_parser.add_argument("address", metavar="HOST:PORT", help="协调节点地址")
+    worker_parser.add_argument("-p", "--processes", type=int, default=1, help="本机同时运行的工作进程数")
+    worker_parser.add_argument("--connect-timeout", type=float, default=30.0, help="协调节点未启动时重试连接的时间（秒）")
+    worker_parser.set_defaults(func=cmd_worker, default_log_level="off")
+
+    checkpoint_parser = subparsers.add_parser("checkpoint", help="查看批量回测断点数据库中已完成的结果")
+    checkpoint_parser.add_argument("path", help="断点数据库文件")
+    checkpoint_parser.add_argument("--dump", choices=["ok", "failed", "all"], help="逐行输出对应的结果记录（JSON Lines）")
+    checkpoint_parser.set_defaults(func=cmd_checkpoint, default_log_level="off")
+
+    robust_parser = subparsers.add_parser("robust", help="对一组策略参数执行蒙特卡洛/自助法稳健性检验")
+    robust_parser.add_argument("symbol", help="股票代码")
+    robust_parser.add_argument("--kind", choices=["daily", "ticks"], default="daily", help="回测类型")
+    robust_parser.add_argument("--params", required=True, help="策略参数，JSON字符串")
+    robust_parser.add_argument("--start-cash", type=float, default=100000000, help="初始资金")
+    robust_parser.add_argument("--start", help="日K回测开始日期 YYYY-MM-DD")
+    robust_parser.add_argument("--end", help="日K回测结束日期 YYYY-MM-DD")
+    robust_parser.add_argument("--date", help="分时回测交易日期 YYYY-MM-DD")
+    robust_parser.add_argument("-n", "--paths", type=int, default=1000, help="重采样路径数量")
+    robust_parser.add_argument("--block-size", type=int, default=20, help="自助法块长度（K线数）")
+    robust_parser.add_argument("--max-delay", type=int, default=10, help="最大随机入场延迟（K线数）")
+    robust_parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    robust_parser.add_argument("-w", "--workers", type=int, default=None, help="工作进程数，默认为CPU核数")
+    robust_parser.add_argument("-o", "--output", default="-", help="报告输出文件，默认为标准输出")
+    robust_parser.set_defaults(func=cmd_robust, default_log_level="off")
+
+    paper_parser = subparsers.add_parser("paper", help="接收实时K线执行模拟交易并统计决策延迟")
+    paper_parser.add_argument("--symbol", default="", help="股票代码，仅用于结果展示")
+    paper_parser.add_argument("--kind", choices=["daily", "ticks"], default="ticks", help="策略类型")
+    paper_parser.add_argument("--params", default="{}", help="策略参数，JSON字符串，未给出的使用策略默认值")
+    paper_parser.add_argument("--start-cash", type=float, default=100000, help="初始资金")
+    feed_group = paper_parser.add_mutually_exclusive_group(required=True)
+    feed_group.add_argument("--replay", help="回放文件（CSV 或 JSON Lines）")
+    feed_group.add_argument("--connect", help="TCP行情服务地址 HOST:PORT")
+    paper_parser.add_argument("--interval", type=float, default=0.0, help="回放文件的推送间隔（秒），0为尽快推送")
+    paper_parser.add_argument("--series", action="store_true", help="结果中包含资金曲线和成交记录")
+    paper_parser.add_argument("-o", "--output", default="-", help="结果输出文件，默认为标准输出")
+    paper_parser.set_defaults(func=cmd_paper, default_log_level="info")
+
+    feed_parser = subparsers.add_parser("feed", help="把回放文件作为本地TCP行情服务推送")
+    feed_parser.add_argument("replay", help="回放文件（CSV 或 JSON Lines）")
+    feed_parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    feed_parser.add_argument("--port", type=int, default=9900, help="监听端口")
+    feed_parser.add_argument("--interval", type=float, default=1.0, help="推送间隔（秒）")
+    feed_parser.set_defaults(func=cmd_feed, default_log_level="info")
+
+    store_parser = subparsers.add_parser("store", help="管理本地行情库")
+    store_subparsers = store_parser.add_subparsers(dest="store_command", required=True)
+    update_parser = store_subparsers.add_parser("update", help="获取最新日K线写入本地行情库")
+    update_parser.add_argument("symbols", nargs="*", help="股票代码，默认为全部A股")
+    update_parser.add_argument("--store-dir", help="行情库目录，默认为缓存目录下的 bars/daily")
+    update_parser.set_defaults(func=cmd_store_update, default_log_level="off")
+
+    symbols_parser = subparsers.add_parser("symbols", help="管理本地股票代码表")
+    symbols_subparsers = symbols_parser.add_subparsers(dest="symbols_command", required=True)
+    symbols_update_parser = symbols_subparsers.add_parser("update", help="获取全部A股代码表保存到本地")
+    symbols_update_parser.set_defaults(func=cmd_symbols_update, default_log_level="off")
+    search_parser = symbols_subparsers.add_parser("search", help="按代码、名称或拼音首字母前缀查找股票")
+    search_parser.add_argument("text", help="代码、名称或拼音首字母的开头部分")
+    search_parser.add_argument("--limit", type=int, default=10, help="最多输出的数量")
+    search_parser.set_defaults(func=cmd_symbols_search, default_log_level="off")
+
+    watchlist_parser = subparsers.add_parser("watchlist", help="管理自选股及其本地行情缓存")
+    watchlist_subparsers = watchlist_parser.add_subparsers(dest="watchlist_command", required=True)
+    watchlist_set_parser = watchlist_subparsers.add_parser("set", help="保存自选股（覆盖原有列表）")
+    watchlist_set_parser.add_argument("symbols", nargs="*", help="股票代码")
+    watchlist_set_parser.set_defaults(func=cmd_watchlist_set, default_log_level="off")
+    watchlist_status_parser = watchlist_subparsers.add_parser("status", help="查看自选股本地行情缓存的新鲜度")
+    watchlist_status_parser.set_defaults(func=cmd_watchlist_status, default_log_level="off")
+    prewarm_parser = watchlist_subparsers.add_parser("prewarm", help="获取自选股的日K线和最近一个交易日的分钟线")
+    prewarm_parser.add_argument("--interval", type=float, default=MIN_REQUEST_INTERVAL,
+                                help="相邻两次网络请求的最小间隔（秒）")
+    prewarm_parser.set_defaults(func=cmd_watchlist_prewarm, default_log_level="off")
+
+    screen_parser = subparsers.add_parser("screen", help="基于本地行情库的全市场信号选股")
+    screen_parser.add_argument("--signal", nargs="*", choices=SIGNALS, default=["golden_cross"],
+                               help="最后一根K线上必须出现的信号，可指定多个，默认为金叉")
+    screen_parser.add_argument("--fast", type=int, default=5, help="快速均线周期")
+    screen_parser.add_argument("--slow", type=int, default=30, help="慢速均线周期")
+    screen_parser.add_argument("--volume-period", type=int, default=5, help="成交量均线周期")
+    screen_parser.add_argument("--stop-loss", type=float, default=0.95, help="止损比例")
+    screen_parser.add_argument("--take-profit", type=float, default=1.1, help="止盈比例")
+    screen_parser.add_argument("--near-stop", type=float, help="只保留距止损价不超过该百分比的持仓股票")
+    screen_parser.add_argument("--near-target", type=float, help="只保留距止盈价不超过该百分比的持仓股票")
+    screen_parser.add_argument("--as-of", help="最后一根K线早于该日期（YYYY-MM-DD）的股票不参与匹配")
+    screen_parser.add_argument("--symbols", nargs="*", help="只扫描这些股票，默认为行情库中的全部股票")
+    screen_parser.add_argument("--store-dir", help="行情库目录，默认为缓存目录下的 bars/daily")
+    screen_parser.add_argument("-w", "--workers", type=int, default=None, help="工作进程数，默认为CPU核数")
+    screen_parser.add_argument("-o", "--output", default="-", help="结果输出文件，默认为标准输出")
+    screen_parser.set_defaults(func=cmd_screen, default_log_level="off")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.offline:
+        set_offline(True)
+    # 标准输出留给结果，交易日志只写入日志文件（paper 命令在运行时打印到标准错误）
+    configure_trade_log(level=args.log_level or args.default_log_level, echo=args.func is cmd_paper,
+                        path=args.log_file or False)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
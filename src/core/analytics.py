@@ -0,0 +1,159 @@
+"""
+股票量化交易回测系统 - 绩效分析模块
+回测过程中只记录资金曲线、持仓和收盘价序列以及成交记录，全部绩效指标在回测结束后用数组运算一次算出，
+日K和分时回测共用；增加新指标不会增加回测过程中的任何开销
+"""
+
+import math
+
+import numpy as np
+
+# 年化使用的每年周期数：日K按252个交易日，分时按每天240根分钟K线
+PERIODS_PER_YEAR = {'daily': 252, 'ticks': 252 * 240}
+
+
+def max_drawdown_pct(values):
+    """
+    根据资金曲线计算最大回撤（百分比），计算方式与backtrader的DrawDown分析器一致
+
+    参数:
+        values: 每个周期的账户总资产
+
+    返回:
+        float: 最大回撤百分比，没有数据时为0
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(values)
+    return max(float(np.max(100.0 * (peaks - values) / peaks)), 0.0)
+
+
+def closed_trade_pnls(trades):
+    """
+    按与backtrader的TradeAnalyzer相同的口径切分交易：持仓回到0或方向反转时记为一笔已平仓交易，
+    计算每笔交易扣除手续费后的盈亏；方向反转的成交按数量比例拆分为平仓和开仓两部分
+
+    参数:
+        trades: 成交记录列表，每条包含带符号的成交数量 size、价格 price 和手续费 commission
+
+    返回:
+        list: 每笔已平仓交易的盈亏
+    """
+    pnls = []
+    position = 0
+    cash_flow = 0.0
+    for trade in trades:
+        size, price, commission = trade['size'], trade['price'], trade['commission']
+        new_position = position + size
+        if position != 0 and (new_position == 0 or (new_position > 0) != (position > 0)):
+            closing = -position
+            closing_share = closing / size
+            pnls.append(cash_flow - closing * price - commission * closing_share)
+            cash_flow = -(size - closing) * price - commission * (1 - closing_share)
+        else:
+            cash_flow -= size * price + commission
+        position = new_position
+    return pnls
+
+
+def count_closed_trades(trades):
+    """
+    根据成交记录统计已平仓的交易次数，与backtrader的TradeAnalyzer统计口径一致
+
+    参数:
+        trades: 成交记录列表
+
+    返回:
+        int: 已平仓交易次数
+    """
+    return len(closed_trade_pnls(trades))
+
+
+def period_returns(start_cash, equity):
+    """
+    计算每个周期的收益率，第一个周期相对初始资金
+
+    参数:
+        start_cash: 初始资金
+        equity: 每个周期的账户总资产
+
+    返回:
+        ndarray: 收益率序列
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    previous = np.concatenate(([start_cash], equity[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return equity / previous - 1.0
+
+
+def _finite_or_none(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def compute_metrics(kind, start_cash, equity, positions, closes, equity_dates, trades):
+    """
+    计算全部绩效指标
+
+    参数:
+        kind: 回测类型，"daily" 或 "ticks"，决定年化周期数
+        start_cash: 初始资金
+        equity: 每个周期的账户总资产
+        positions: 每个周期的持仓数量
+        closes: 每个周期的收盘价
+        equity_dates: 资金曲线时间（datetime64）
+        trades: 成交记录列表
+
+    返回:
+        dict: 绩效指标，无法计算的指标为None
+            max_drawdown: 最大回撤（%）
+            trade_count: 已平仓交易次数
+            win_rate: 盈利（含持平）交易占已平仓交易的比例（%）
+            sharpe: 年化夏普比率（无风险利率按0计）
+            sortino: 年化索提诺比率
+            cagr: 年化收益率（%），仅日K回测
+            exposure: 有持仓的周期占比（%）
+            buy_hold_return: 同期买入持有收益率（%）
+            excess_return: 策略收益率减买入持有收益率（百分点）
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    pnls = np.asarray(closed_trade_pnls(trades), dtype=np.float64)
+
+    metrics = {
+        'max_drawdown': max_drawdown_pct(equity),
+        'trade_count': int(pnls.size),
+        'win_rate': float(np.mean(pnls >= 0.0) * 100) if pnls.size else None,
+        'sharpe': None,
+        'sortino': None,
+        'cagr': None,
+        'exposure': float(np.mean(positions != 0) * 100) if positions.size else None,
+        'buy_hold_return': None,
+        'excess_return': None,
+    }
+    if equity.size == 0:
+        return metrics
+
+    returns = period_returns(start_cash, equity)
+    annualize = math.sqrt(PERIODS_PER_YEAR.get(kind, 252))
+    if returns.size > 1:
+        std = returns.std(ddof=1)
+        if std > 0:
+            metrics['sharpe'] = _finite_or_none(returns.mean() / std * annualize)
+        downside = math.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+        if downside > 0:
+            metrics['sortino'] = _finite_or_none(returns.mean() / downside * annualize)
+
+    total_return = equity[-1] / start_cash
+    if kind == 'daily' and len(equity_dates) > 1 and total_return > 0:
+        days = (equity_dates[-1] - equity_dates[0]) / np.timedelta64(1, 'D')
+        if days > 0:
+            metrics['cagr'] = _finite_or_none((total_return ** (365.25 / days) - 1) * 100)
+
+    if closes.size and closes[0] > 0:
+        buy_hold = (closes[-1] / closes[0] - 1) * 100
+        metrics['buy_hold_return'] = _finite_or_none(buy_hold)
+        metrics['excess_return'] = _finite_or_none((total_return - 1) * 100 - buy_hold)
+    return metrics
@@ -0,0 +1,88 @@
+"""
+股票量化交易回测系统 - 分析器模块
+定义回测过程中记录资金曲线和成交记录的轻量分析器，供回测结果对象使用；以及标记阶段计时边界的分析器
+"""
+
+from array import array
+
+import backtrader as bt
+import numpy as np
+
+from src.core.timing import switch_phase
+
+
+class EquityRecorder(bt.Analyzer):
+    """
+    资金曲线记录器
+
+    每个周期记录一次时间、账户总资产、持仓数量和当根K线的开高低收价格，使用紧凑的数组存储，
+    回测结束后转换为numpy数组
+    """
+
+    def start(self):
+        self.nums = array('d')
+        self.values = array('d')
+        self.positions = array('d')
+        self.opens = array('d')
+        self.highs = array('d')
+        self.lows = array('d')
+        self.closes = array('d')
+
+    def next(self):
+        self.nums.append(self.strategy.datetime[0])
+        self.values.append(self.strategy.broker.getvalue())
+        self.positions.append(self.strategy.position.size)
+        data = self.strategy.datas[0]
+        self.opens.append(data.open[0])
+        self.highs.append(data.high[0])
+        self.lows.append(data.low[0])
+        self.closes.append(data.close[0])
+
+    def get_analysis(self):
+        return {
+            'nums': np.frombuffer(self.nums, dtype=np.float64).copy(),
+            'values': np.frombuffer(self.values, dtype=np.float64).copy(),
+            'positions': np.frombuffer(self.positions, dtype=np.float64).copy(),
+            'opens': np.frombuffer(self.opens, dtype=np.float64).copy(),
+            'highs': np.frombuffer(self.highs, dtype=np.float64).copy(),
+            'lows': np.frombuffer(self.lows, dtype=np.float64).copy(),
+            'closes': np.frombuffer(self.closes, dtype=np.float64).copy(),
+        }
+
+
+class FillRecorder(bt.Analyzer):
+    """
+    成交记录器
+
+    只在订单完成时记录成交时间、方向、价格、数量和手续费，不做任何格式化
+    """
+
+    def start(self):
+        self.fills = []
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            self.fills.append((
+                order.executed.dt,
+                'buy' if order.isbuy() else 'sell',
+                order.executed.price,
+                order.executed.size,
+                order.executed.comm,
+            ))
+
+    def get_analysis(self):
+        return self.fills
+
+
+class PhaseMarker(bt.Analyzer):
+    """
+    在回测引擎内部标记阶段边界
+
+    数据预加载完成、策略开始运行时进入 run 阶段，策略结束后进入 analyze 阶段
+    """
+
+    def start(self):
+        switch_phase('run')
+
+    def stop(self):
+        switch_phase('analyze')
@@ -4,20 +4,27 @@
 """
 
 from datetime import datetime, time
-from tkinter import messagebox
 
 import backtrader as bt
 
+from src.core.analytics import compute_metrics
+from src.core.analyzers import EquityRecorder, FillRecorder, PhaseMarker
+from src.core.cache import data_fingerprint, get_result_cache, make_result_key
 from src.core.data import get_single_stock_history_data, \
     get_single_stock_ticks_data_transfer
+from src.core.progress import ProgressReporter, progress_active
+from src.core.result import BacktestResult
 from src.core.strategy import DailyMA, SuperShortLineTrade
-from src.utils.fast_use_util import min2date
+from src.core.timing import phase, switch_phase, timed_backtest, timing_active
+from src.utils.fast_use_util import min2date, num2datetime64
 
 
+@timed_backtest('daily')
 def run_daily_backtest(stock_code, use_take_profit, take_profit, take_profit_size,
                        use_stop_loss, stop_loss, stop_loss_size,
                        use_sma_crossover, fast_maperiod, slow_maperiod,
-                       start_cash, sma_buy_size=None, sma_sell_size=None, start_date=None, end_date=None):
+                       start_cash, sma_buy_size=None, sma_sell_size=None, start_date=None, end_date=None,
+                       keep_engine=False, use_cache=True, lean=False, stock_data=None):
     """
     执行日K线回测
 
@@ -37,144 +44,68 @@ def run_daily_backtest(stock_code, use_take_profit, take_profit, take_profit_siz
         sma_sell_size: 均线卖出笔数
         start_date: 回测起始日期
         end_date: 回测结束日期
+        keep_engine: 是否在结果中保留回测引擎（仅用于绘图），默认不保留
+        use_cache: 是否使用回测结果缓存，相同代码版本、参数和行情数据直接返回缓存结果
+        lean: 是否使用低内存的精简模式，适合长历史和大规模参数扫描，结果不能绘图
+        stock_data: 可选，已获取的行情数据，传入时不再重新获取
 
     返回:
-        tuple: (回测报告字符串, 回测引擎实例)
+        BacktestResult: 回测结果，未找到数据时返回None
+
+    异常:
+        ValueError: 均线参数不合法时抛出，由调用方（GUI或命令行）决定如何展示
     """
     # 获取股票历史数据
-    stock_data = get_single_stock_history_data(stock_code)
+    if stock_data is None:
+        stock_data = get_single_stock_history_data(stock_code)
     if stock_data.empty:
         print("未找到对应股票数据，请检查代码格式（A股6位数字代码）")
-        return None, None
-
-    # 设置默认日期范围
-    if not start_date:
-        start_date = datetime.combine(stock_data.index.min().date(), datetime.min.time())
-    if not end_date:
-        end_date = datetime.combine(stock_data.index.max().date(), datetime.min.time())
-
-    # 验证并调整日期范围
-    data_start = stock_data.index.min().date()
-    data_end = stock_data.index.max().date()
-
-    # 调整开始日期
-    if start_date.date() < data_start:
-        print(f"警告：开始日期早于数据最早日期 ({data_start})，已自动修正")
-        start_date = datetime.combine(data_start, datetime.min.time())
-    elif start_date.date() > data_end:
-        print(f"警告：开始日期晚于数据最新日期 ({data_end})，已自动修正")
-        start_date = datetime.combine(data_end, datetime.min.time())
-
-    # 调整结束日期
-    if end_date.date() > data_end:
-        print(f"警告：结束日期晚于数据最新日期 ({data_end})，已自动修正")
-        end_date = datetime.combine(data_end, datetime.min.time())
-    elif end_date.date() < data_start:
-        print(f"警告：结束日期早于数据最早日期 ({data_start})，已自动修正")
-        end_date = datetime.combine(data_start, datetime.min.time())
-
-    # 确保开始日期早于结束日期
-    if start_date > end_date:
-        print(f"错误：开始日期 {start_date.date()} 晚于结束日期 {end_date.date()}，已自动交换")
-        start_date, end_date = end_date, start_date
-
-    # 验证均线参数
-    if use_sma_crossover:
-        try:
-            fast_ma = int(fast_maperiod)
-            slow_ma = int(slow_maperiod)
-            if not (5 <= fast_ma < slow_ma <= 30):
-                messagebox.showerror("错误", "快线周期应小于慢线周期，且范围在5-30之间")
-                return None, None
-        except ValueError:
-            messagebox.showerror("错误", "均线周期必须为整数")
-            return None, None
+        return None
+
+    start_date, end_date = _normalize_date_range(stock_data, start_date, end_date)
+    _validate_sma_params(use_sma_crossover, fast_maperiod, slow_maperiod)
+
+    params = _daily_params(fast_maperiod, slow_maperiod, use_take_profit, take_profit, take_profit_size,
+                           use_stop_loss, stop_loss, stop_loss_size, use_sma_crossover,
+                           sma_buy_size, sma_sell_size)
+
+    # 查询结果缓存，需要回测引擎（用于绘图）时必须重新执行
+    cache_key = None
+    if use_cache:
+        with phase('cache'):
+            cache_key = make_result_key('daily', stock_code,
+                                        dict(params, start=start_date, end=end_date, start_cash=start_cash),
+                                        data_fingerprint(stock_data))
+            if not keep_engine:
+                cached = get_result_cache().get(cache_key)
+                if cached is not None:
+                    return cached
 
     # 创建回测引擎
-    back_test_engine = bt.Cerebro()
+    switch_phase('ingest')
+    back_test_engine = _create_engine(lean, keep_engine)
     data = bt.feeds.PandasData(dataname=stock_data, fromdate=start_date, todate=end_date)
     back_test_engine.adddata(data)
 
     # 添加交易策略
-    back_test_engine.addstrategy(
-        DailyMA,
-        start_date=start_date,
-        end_date=end_date,
-        fast_maperiod=fast_maperiod,
-        slow_maperiod=slow_maperiod,
-        stop_loss=stop_loss,
-        take_profit=take_profit,
-        use_take_profit=use_take_profit,
-        use_stop_loss=use_stop_loss,
-        use_sma_crossover=use_sma_crossover,
-        take_profit_size=take_profit_size,
-        stop_loss_size=stop_loss_size,
-        sma_buy_size=sma_buy_size if sma_buy_size is not None else take_profit_size,
-        sma_sell_size=sma_sell_size if sma_sell_size is not None else stop_loss_size
-    )
+    back_test_engine.addstrategy(DailyMA, start_date=start_date, end_date=end_date, **params)
 
     # 设置初始资金和分析器
     back_test_engine.broker.setcash(start_cash)
-    back_test_engine.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-    back_test_engine.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trade')
+    _add_result_analyzers(back_test_engine)
 
     # 执行回测
     results = back_test_engine.run()
-    strat = results[0]
-
-    # 分析回测结果
-    drawdown_analysis = strat.analyzers.drawdown.get_analysis() if hasattr(strat.analyzers, 'drawdown') else {}
-    drawdown_value = drawdown_analysis.get('max', {}).get('drawdown', 0.0) if isinstance(drawdown_analysis, dict) else 0.0
-    port_value = back_test_engine.broker.getvalue()
-    pnl = port_value - start_cash
-
-    # 计算交易次数
-    trade_count = 0
-    if hasattr(strat.analyzers, 'trade'):
-        trade_analysis = strat.analyzers.trade.get_analysis()
-        try:
-            trade_count = trade_analysis['total']['closed']
-        except KeyError:
-            trade_count = 0
-
-    # 生成回测报告
-    report = f"\n{'=' * 30} 回测报告 {'=' * 30}\n"
-    report += f"股票代码: {stock_code}\n"
-    report += f"回测时间: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}\n"
-    report += f"初始资金: {start_cash:,.2f} 元\n"
-    report += f"总资金: {port_value:,.2f} 元\n"
-    report += f"净收益: {pnl:,.2f} 元\n"
-    report += f"收益率: {pnl / start_cash * 100:.2f}%\n"
-
-    # 添加策略参数信息
-    report += f"止盈功能: {'开启' if use_take_profit else '关闭'}\n"
-    if use_take_profit:
-        report += f"止盈比例: {take_profit * 100:.2f}% | 止盈交易笔数: {take_profit_size} 股\n"
-    else:
-        report += "止盈功能已关闭\n"
-
-    report += f"止损功能: {'开启' if use_stop_loss else '关闭'}\n"
-    if use_stop_loss:
-        report += f"止损比例: {stop_loss * 100:.2f}% | 止损交易笔数: {stop_loss_size} 股\n"
-    else:
-        report += "止损功能已关闭\n"
-
-    report += f"均线交易: {'开启' if use_sma_crossover else '关闭'}\n"
-    if use_sma_crossover:
-        report += f"均线周期: 快线={fast_maperiod}日 | 慢线={slow_maperiod}日\n"
-        report += f"均线买入笔数: {sma_buy_size if sma_buy_size is not None else take_profit_size} 股 | "
-        report += f"均线卖出笔数: {sma_sell_size if sma_sell_size is not None else stop_loss_size} 股\n"
-    else:
-        report += "均线功能已关闭\n"
-
-    # 添加绩效统计信息
-    report += f"最大回撤: {float(drawdown_value):.2f}%\n" if drawdown_value and float(drawdown_value) > 0 else "最大回撤: N/A (未触发持仓变动)\n"
-    report += f"交易次数: {trade_count} 次\n"
-    report += '=' * 70
-
-    return report, back_test_engine
+
+    result = _collect_result('daily', stock_code, results[0], back_test_engine, start_date, end_date,
+                             start_cash, params, keep_engine)
+    if cache_key is not None:
+        with phase('cache'):
+            get_result_cache().put(cache_key, result)
+    return result
 
 
+@timed_backtest('ticks')
 def run_ticks_backtest(stock_code,
                        price_period,
                        volume_period,
@@ -188,7 +119,11 @@ def run_ticks_backtest(stock_code,
                        sell_size,
                        start_cash, date,
                        use_price_ma=True,
-                       use_volume_ma=True):
+                       use_volume_ma=True,
+                       keep_engine=False,
+                       use_cache=True,
+                       lean=False,
+                       stock_data=None):
     """
     执行分时数据回测
 
@@ -208,9 +143,13 @@ def run_ticks_backtest(stock_code,
         date: 回测日期
         use_price_ma: 是否使用价格均线
         use_volume_ma: 是否使用交易量均线
+        keep_engine: 是否在结果中保留回测引擎（仅用于绘图），默认不保留
+        use_cache: 是否使用回测结果缓存，相同代码版本、参数和行情数据直接返回缓存结果
+        lean: 是否使用低内存的精简模式，适合长历史和大规模参数扫描，结果不能绘图
+        stock_data: 可选，已获取的行情数据，传入时不再重新获取
 
     返回:
-        tuple: (回测报告字符串, 回测引擎实例)
+        BacktestResult: 回测结果，未找到数据时返回None
     """
     # 设置交易时间范围
     opentime = time(hour=9, minute=30, second=0)
@@ -219,88 +158,245 @@ def run_ticks_backtest(stock_code,
     real_end_date = datetime.combine(date, closetime)
 
     # 获取股票分时数据
-    stock_data = get_single_stock_ticks_data_transfer(stock_code, real_start_date, real_end_date)
+    if stock_data is None:
+        stock_data = get_single_stock_ticks_data_transfer(stock_code, real_start_date, real_end_date)
     if stock_data.empty:
         print("未找到对应股票数据，请检查代码格式（A股6位数字代码）")
-        return None, None
+        return None
 
     # 映射虚拟日期范围
     v_start_date, v_end_date = min2date(real_start_date, real_end_date)
 
+    params = _ticks_params(price_period, volume_period, stop_by_profit, profit_rate, profit_size,
+                           stop_by_loss, loss_rate, loss_size, buy_size, sell_size, use_price_ma, use_volume_ma)
+
+    # 查询结果缓存，需要回测引擎（用于绘图）时必须重新执行
+    cache_key = None
+    if use_cache:
+        with phase('cache'):
+            cache_key = make_result_key('ticks', stock_code,
+                                        dict(params, date=real_start_date, start_cash=start_cash),
+                                        data_fingerprint(stock_data))
+            if not keep_engine:
+                cached = get_result_cache().get(cache_key)
+                if cached is not None:
+                    return cached
+
     # 创建回测引擎
-    back_test_ticks_engine = bt.Cerebro()
+    switch_phase('ingest')
+    back_test_ticks_engine = _create_engine(lean, keep_engine)
     data = bt.feeds.PandasData(dataname=stock_data, fromdate=v_start_date, todate=v_end_date)
     back_test_ticks_engine.adddata(data)
 
     # 添加交易策略
-    back_test_ticks_engine.addstrategy(
-        SuperShortLineTrade,
-        start_date=v_start_date,
-        end_date=v_end_date,
-        price_period=price_period,
-        volume_period=volume_period,
-        profit_rate=profit_rate,
-        profit_size=profit_size,
-        stop_by_profit=stop_by_profit,
-        loss_rate=loss_rate,
-        loss_size=loss_size,
-        stop_by_loss=stop_by_loss,
-        buy_size=buy_size,
-        sell_size=sell_size,
-        use_price_ma=use_price_ma,
-        use_volume_ma=use_volume_ma
-    )
+    back_test_ticks_engine.addstrategy(SuperShortLineTrade, start_date=v_start_date, end_date=v_end_date, **params)
 
     # 设置初始资金和分析器
     back_test_ticks_engine.broker.setcommission(commission=0.005)
     back_test_ticks_engine.broker.setcash(start_cash)
-    back_test_ticks_engine.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-    back_test_ticks_engine.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trade')
+    _add_result_analyzers(back_test_ticks_engine)
 
     # 执行回测
     results = back_test_ticks_engine.run()
-    strat = results[0]
-
-    # 分析回测结果
-    drawdown_analysis = strat.analyzers.drawdown.get_analysis() if hasattr(strat.analyzers, 'drawdown') else {}
-    drawdown_value = drawdown_analysis.get('max', {}).get('drawdown', 0.0) if isinstance(drawdown_analysis, dict) else 0.0
-    port_value = back_test_ticks_engine.broker.getvalue()
-    pnl = port_value - start_cash
-
-    # 计算交易次数
-    trade_count = 0
-    if hasattr(strat.analyzers, 'trade'):
-        trade_analysis = strat.analyzers.trade.get_analysis()
-        try:
-            trade_count = trade_analysis['total']['closed']
-        except KeyError:
-            trade_count = 0
-
-    # 生成回测报告
-    report = f"\n{'=' * 30} 回测报告 {'=' * 30}\n"
-    report += f"股票代码: {stock_code}\n"
-    report += f"回测时间: {real_start_date.strftime('%Y-%m-%d %H:%M:%S')} 至 {real_end_date.strftime('%Y-%m-%d %H:%M:%S')}\n"
-    report += f"初始资金: {start_cash:,.2f} 元\n"
-    report += f"总资金: {port_value:,.2f} 元\n"
-    report += f"净收益: {pnl:,.2f} 元\n"
-    report += f"收益率: {pnl / start_cash * 100:.2f}%\n"
-
-    # 添加策略参数信息
-    report += f"止盈功能: {'开启' if stop_by_profit else '关闭'}\n"
-    if stop_by_profit:
-        report += f"止盈比例: {profit_rate * 100:.2f}% | 止盈交易笔数: {profit_size} 股\n"
-    else:
-        report += "止盈功能已关闭\n"
-
-    report += f"止损功能: {'开启' if stop_by_loss else '关闭'}\n"
-    if stop_by_loss:
-        report += f"止损比例: {loss_rate * 100:.2f}% | 止损交易笔数: {loss_size} 股\n"
-    else:
-        report += "止损功能已关闭\n"
-
-    # 添加绩效统计信息
-    report += f"最大回撤: {float(drawdown_value):.2f}%\n" if drawdown_value and float(drawdown_value) > 0 else "最大回撤: N/A (未触发持仓变动)\n"
-    report += f"交易次数: {trade_count} 次\n"
-    report += '=' * 70
-
-    return report, back_test_ticks_engine
+
+    result = _collect_result('ticks', stock_code, results[0], back_test_ticks_engine, real_start_date,
+                             real_end_date, start_cash, params, keep_engine, trade_date=date)
+    if cache_key is not None:
+        with phase('cache'):
+            get_result_cache().put(cache_key, result)
+    return result
+
+
+def _daily_params(fast_maperiod, slow_maperiod, use_take_profit, take_profit, take_profit_size,
+                  use_stop_loss, stop_loss, stop_loss_size, use_sma_crossover,
+                  sma_buy_size, sma_sell_size):
+    """整理日K线策略参数，未指定的均线买卖笔数分别沿用止盈/止损笔数"""
+    return {
+        'fast_maperiod': fast_maperiod,
+        'slow_maperiod': slow_maperiod,
+        'use_take_profit': use_take_profit,
+        'take_profit': take_profit,
+        'take_profit_size': take_profit_size,
+        'use_stop_loss': use_stop_loss,
+        'stop_loss': stop_loss,
+        'stop_loss_size': stop_loss_size,
+        'use_sma_crossover': use_sma_crossover,
+        'sma_buy_size': sma_buy_size if sma_buy_size is not None else take_profit_size,
+        'sma_sell_size': sma_sell_size if sma_sell_size is not None else stop_loss_size,
+    }
+
+
+def _ticks_params(price_period, volume_period, stop_by_profit, profit_rate, profit_size,
+                  stop_by_loss, loss_rate, loss_size, buy_size, sell_size, use_price_ma=True, use_volume_ma=True):
+    """整理分时策略参数"""
+    return {
+        'price_period': price_period,
+        'volume_period': volume_period,
+        'stop_by_profit': stop_by_profit,
+        'profit_rate': profit_rate,
+        'profit_size': profit_size,
+        'stop_by_loss': stop_by_loss,
+        'loss_rate': loss_rate,
+        'loss_size': loss_size,
+        'buy_size': buy_size,
+        'sell_size': sell_size,
+        'use_price_ma': use_price_ma,
+        'use_volume_ma': use_volume_ma,
+    }
+
+
+def _normalize_date_range(stock_data, start_date, end_date):
+    """
+    设置默认日期范围，并把开始/结束日期修正到行情数据覆盖的范围内
+
+    参数:
+        stock_data: 日K线行情数据
+        start_date: 回测起始日期，可为None
+        end_date: 回测结束日期，可为None
+
+    返回:
+        tuple: 修正后的(开始日期, 结束日期)
+    """
+    # 设置默认日期范围
+    if not start_date:
+        start_date = datetime.combine(stock_data.index.min().date(), datetime.min.time())
+    if not end_date:
+        end_date = datetime.combine(stock_data.index.max().date(), datetime.min.time())
+
+    # 验证并调整日期范围
+    data_start = stock_data.index.min().date()
+    data_end = stock_data.index.max().date()
+
+    # 调整开始日期
+    if start_date.date() < data_start:
+        print(f"警告：开始日期早于数据最早日期 ({data_start})，已自动修正")
+        start_date = datetime.combine(data_start, datetime.min.time())
+    elif start_date.date() > data_end:
+        print(f"警告：开始日期晚于数据最新日期 ({data_end})，已自动修正")
+        start_date = datetime.combine(data_end, datetime.min.time())
+
+    # 调整结束日期
+    if end_date.date() > data_end:
+        print(f"警告：结束日期晚于数据最新日期 ({data_end})，已自动修正")
+        end_date = datetime.combine(data_end, datetime.min.time())
+    elif end_date.date() < data_start:
+        print(f"警告：结束日期早于数据最早日期 ({data_start})，已自动修正")
+        end_date = datetime.combine(data_start, datetime.min.time())
+
+    # 确保开始日期早于结束日期
+    if start_date > end_date:
+        print(f"错误：开始日期 {start_date.date()} 晚于结束日期 {end_date.date()}，已自动交换")
+        start_date, end_date = end_date, start_date
+
+    return start_date, end_date
+
+
+def _validate_sma_params(use_sma_crossover, fast_maperiod, slow_maperiod):
+    """
+    验证均线参数
+
+    异常:
+        ValueError: 均线周期不是整数，或不满足 5 <= 快线 < 慢线 <= 30
+    """
+    if not use_sma_crossover:
+        return
+    try:
+        fast_ma = int(fast_maperiod)
+        slow_ma = int(slow_maperiod)
+    except (TypeError, ValueError):
+        raise ValueError("均线周期必须为整数")
+    if not (5 <= fast_ma < slow_ma <= 30):
+        raise ValueError("快线周期应小于慢线周期，且范围在5-30之间")
+
+
+def _create_engine(lean, keep_engine):
+    """
+    创建回测引擎
+
+    精简模式（lean）面向长历史和大规模参数扫描：关闭标准观察器（stdstats），
+    使用有界行缓冲（exactbars=1，同时关闭预加载、向量化执行和绘图数据），
+    每条指标线只保留计算所需的最少数据，峰值内存不再随K线数量线性增长。
+    精简模式的回测结果与默认模式一致，但回测引擎无法绘图。
+
+    参数:
+        lean: 是否使用精简模式
+        keep_engine: 调用方是否需要保留回测引擎用于绘图
+
+    返回:
+        Cerebro: 回测引擎实例
+    """
+    if not lean:
+        return bt.Cerebro()
+    if keep_engine:
+        raise ValueError("精简模式不保留绘图数据，不能与 keep_engine 同时使用")
+    return bt.Cerebro(stdstats=False, exactbars=1)
+
+
+def _add_result_analyzers(engine):
+    """
+    添加生成回测结果所需的分析器
+
+    回测过程中只记录资金曲线（含持仓和收盘价）和成交记录，
+    最大回撤、交易次数、夏普比率等绩效指标在回测结束后由 analytics.compute_metrics 统一计算；
+    开启阶段计时时添加阶段标记分析器，区分数据载入、策略运行和结果分析；
+    登记了进度回调时（如图形界面的后台任务）添加进度报告分析器
+    """
+    engine.addanalyzer(EquityRecorder, _name='equity')
+    engine.addanalyzer(FillRecorder, _name='fills')
+    if timing_active():
+        engine.addanalyzer(PhaseMarker, _name='phases')
+    if progress_active():
+        engine.addanalyzer(ProgressReporter, _name='progress')
+
+
+def _collect_result(kind, stock_code, strat, engine, start, end, start_cash, params, keep_engine,
+                    trade_date=None):
+    """
+    从回测完成的策略实例中提取数据，构造回测结果对象
+
+    参数:
+        kind: 回测类型，"daily" 或 "ticks"
+        stock_code: 股票代码
+        strat: 回测完成的策略实例
+        engine: 回测引擎实例
+        start: 回测开始时间
+        end: 回测结束时间
+        start_cash: 初始资金
+        params: 策略参数字典
+        keep_engine: 是否在结果中保留回测引擎
+        trade_date: 分时回测的交易日期，用于把虚拟日期还原为实际时间
+
+    返回:
+        BacktestResult: 回测结果
+    """
+    equity = strat.analyzers.equity.get_analysis()
+    fills = strat.analyzers.fills.get_analysis()
+    fill_dates = num2datetime64([fill[0] for fill in fills], trade_date).tolist()
+    trades = [
+        {'datetime': dt, 'side': side, 'price': price, 'size': size, 'commission': comm}
+        for dt, (_, side, price, size, comm) in zip(fill_dates, fills)
+    ]
+
+    equity_dates = num2datetime64(equity['nums'], trade_date)
+    metrics = compute_metrics(kind, start_cash, equity['values'], equity['positions'], equity['closes'],
+                              equity_dates, trades)
+
+    return BacktestResult(
+        kind=kind,
+        stock_code=stock_code,
+        start=start,
+        end=end,
+        start_cash=start_cash,
+        final_value=engine.broker.getvalue(),
+        params=params,
+        metrics=metrics,
+        equity_dates=equity_dates,
+        equity=equity['values'],
+        positions=equity['positions'],
+        opens=equity['opens'],
+        highs=equity['highs'],
+        lows=equity['lows'],
+        closes=equity['closes'],
+        trades=trades,
+        engine=engine if keep_engine else None,
+    )
@@ -0,0 +1,258 @@
+"""
+股票量化交易回测系统 - 批量回测模块
+负责解析任务文件、展开 股票 × 参数组 × 日期区间 的回测任务，并以多进程方式无界面执行
+"""
+
+import contextlib
+import functools
+import itertools
+import json
+import sys
+import time as time_module
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from src.core.backtest import run_daily_backtest, run_ticks_backtest
+from src.core.checkpoint import cell_key
+from src.core.data import get_single_stock_history_data
+from src.core.incremental import run_daily_backtest_incremental
+from src.core.shared_bars import SharedBarsRegistry, attach_bars
+from src.core.tradelog import configure_trade_log, trade_log_settings
+
+DATE_FORMAT = "%Y-%m-%d"
+# 多进程执行时每个工作进程对应的最大排队任务数
+_PENDING_PER_WORKER = 4
+# 批量任务的回测函数默认参数：参数扫描的每个任务一般只执行一次，默认不读写回测结果缓存（磁盘上每个结果一个文件），
+# 需要时在任务参数中加 "use_cache": true
+_SWEEP_DEFAULTS = {"use_cache": False}
+
+
+def load_job_file(path):
+    """
+    读取任务文件
+
+    任务文件为JSON格式，可以是单个任务块，也可以是 {"jobs": [任务块, ...]}。
+    每个任务块包含:
+        kind: "daily"（日K回测）或 "ticks"（分时回测），默认为 "daily"
+        symbols: 股票代码列表
+        param_sets: 参数组列表，每组是传给回测函数的关键字参数
+        date_ranges: 日期区间列表，日K为 {"start": ..., "end": ...}，分时为 {"date": ...}
+        defaults: 可选，所有参数组共用的默认参数
+        incremental: 可选，日K回测是否从上次的快照续跑，只处理新增K线
+
+    参数:
+        path: 任务文件路径
+
+    返回:
+        list: 任务块列表
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if isinstance(spec, dict) and "jobs" in spec:
+        return spec["jobs"]
+    if isinstance(spec, list):
+        return spec
+    return [spec]
+
+
+def expand_jobs(job_blocks):
+    """
+    将任务块展开为单个回测任务（股票 × 参数组 × 日期区间 的笛卡尔积）
+
+    参数:
+        job_blocks: 任务块列表
+
+    返回:
+        list: 任务字典列表，每个任务包含 job_id、kind、symbol、params 和日期信息
+    """
+    jobs = []
+    for block in job_blocks:
+        kind = block.get("kind", "daily")
+        if kind not in ("daily", "ticks"):
+            raise ValueError(f"未知的回测类型: {kind}")
+        incremental = bool(block.get("incremental", False))
+        if incremental and kind != "daily":
+            raise ValueError("只有日K回测支持增量续跑")
+        defaults = block.get("defaults", {})
+        param_sets = block.get("param_sets") or [{}]
+        date_ranges = block.get("date_ranges") or [{}]
+        for symbol, params, date_range in itertools.product(block["symbols"], param_sets, date_ranges):
+            merged = dict(defaults)
+            merged.update(params)
+            jobs.append({
+                "job_id": len(jobs),
+                "kind": kind,
+                "symbol": str(symbol),
+                "params": merged,
+                "date_range": dict(date_range),
+                "incremental": incremental,
+            })
+    return jobs
+
+
+def _parse_date(value):
+    """将 YYYY-MM-DD 字符串转换为 datetime，空值返回 None"""
+    if not value:
+        return None
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def run_job(job, include_series=False, bars=None):
+    """
+    执行单个回测任务（在工作进程中运行，不依赖任何图形界面）
+
+    参数:
+        job: expand_jobs 生成的任务字典
+        include_series: 结果中是否包含资金曲线和成交记录
+        bars: 可选，主进程发布的共享行情句柄（SharedBars），传入时不再获取行情
+
+    返回:
+        dict: 可直接序列化为JSON的结果记录
+    """
+    record = {
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "symbol": job["symbol"],
+        "params": job["params"],
+        "date_range": job["date_range"],
+    }
+    began = time_module.perf_counter()
+    try:
+        # 策略日志写入标准错误，避免污染标准输出上的JSON结果流
+        with contextlib.redirect_stdout(sys.stderr):
+            if job["kind"] == "daily":
+                if job.get("incremental"):
+                    run_daily, params = run_daily_backtest_incremental, job["params"]
+                else:
+                    run_daily, params = run_daily_backtest, dict(_SWEEP_DEFAULTS, **job["params"])
+                extra = {} if bars is None else {"stock_data": attach_bars(bars)}
+                result = run_daily(
+                    stock_code=job["symbol"],
+                    start_date=_parse_date(job["date_range"].get("start")),
+                    end_date=_parse_date(job["date_range"].get("end")),
+                    **params,
+                    **extra
+                )
+            else:
+                result = run_ticks_backtest(
+                    stock_code=job["symbol"],
+                    date=_parse_date(job["date_range"]["date"]),
+                    **dict(_SWEEP_DEFAULTS, **job["params"])
+                )
+        if result is None:
+            record.update(ok=False, error="未找到对应股票数据")
+        else:
+            record.update(ok=True, result=result.to_dict(include_series))
+    except Exception as e:
+        record.update(ok=False, error=f"{type(e).__name__}: {e}")
+    record["elapsed"] = time_module.perf_counter() - began
+    return record
+
+
+def job_keys(jobs, include_series=False):
+    """
+    计算每个任务在断点数据库中的内容键
+
+    返回:
+        dict: 任务编号 -> cell_key
+    """
+    return {job["job_id"]: cell_key(job, include_series) for job in jobs}
+
+
+def run_jobs(jobs, workers=1, include_series=False, checkpoint=None, runner=None):
+    """
+    按给定并行度执行回测任务，每完成一个任务就产出一条结果
+
+    参数:
+        jobs: 任务字典列表
+        workers: 工作进程数，1 表示在当前进程中顺序执行
+        include_series: 结果中是否包含资金曲线和成交记录
+        checkpoint: 可选，SweepCheckpoint 断点数据库；已成功的任务不再执行，
+                    每完成一个任务立即写入，进程中断后重新执行时从断点继续
+        runner: 可选，执行任务的函数 runner(任务列表, include_series)，返回结果记录迭代器，
+                如多节点执行的 run_coordinator；为None时按 workers 在本机执行
+
+    返回:
+        generator: 按完成顺序产出的结果记录（不包括断点中已完成的任务）
+    """
+    if runner is None:
+        runner = functools.partial(_run_jobs, workers=workers)
+    if checkpoint is None:
+        yield from runner(jobs, include_series)
+        return
+
+    completed = checkpoint.completed_keys()
+    keys = job_keys(jobs, include_series)
+    remaining = [job for job in jobs if keys[job["job_id"]] not in completed]
+    by_id = {job["job_id"]: job for job in remaining}
+    for record in runner(remaining, include_series):
+        checkpoint.save(keys[record["job_id"]], by_id[record["job_id"]], record)
+        yield record
+
+
+def _run_jobs(jobs, include_series, workers):
+    if workers <= 1:
+        for job in jobs:
+            yield run_job(job, include_series)
+        return
+
+    # 工作进程沿用当前进程的交易日志设置（级别、输出文件）
+    initializer = functools.partial(configure_trade_log, **trade_log_settings())
+    # 日K行情每只股票只获取一次，写入共享内存后由工作进程按名称映射，不随每个任务序列化。
+    # 同时进行的任务数有上限，共享内存只保留进行中任务用到的股票（同一股票的任务在列表中相邻，
+    # 先提交后续任务再释放已完成的任务，相邻任务不会重复获取）；登记表在进程池关闭后释放剩余的共享内存
+    max_pending = workers * _PENDING_PER_WORKER
+    job_iter = iter(jobs)
+    with SharedBarsRegistry() as registry, \
+            ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        pending = {}
+        finished = []
+        while True:
+            for job in itertools.islice(job_iter, max_pending - len(pending)):
+                key = _shared_bars_key(job)
+                bars = registry.acquire(key, functools.partial(_load_history, job["symbol"])) if key else None
+                pending[executor.submit(run_job, job, include_series, bars)] = key
+            for key in finished:
+                if key is not None:
+                    registry.release(key)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            finished = [pending.pop(future) for future in done]
+            for future in done:
+                yield future.result()
+
+
+def _shared_bars_key(job):
+    """可以共享行情的任务（日K非增量回测）返回股票代码，否则返回None"""
+    if job["kind"] == "daily" and not job.get("incremental"):
+        return job["symbol"]
+    return None
+
+
+def _load_history(symbol):
+    # 获取失败时的提示写入标准错误，标准输出留给结果
+    with contextlib.redirect_stdout(sys.stderr):
+        return get_single_stock_history_data(symbol)
+
+
+def write_results(records, out):
+    """
+    以JSON Lines格式逐条写出结果，每条写完立即刷新，便于下游实时读取
+
+    参数:
+        records: 结果记录迭代器
+        out: 可写的文本文件对象
+
+    返回:
+        tuple: (成功任务数, 失败任务数)
+    """
+    ok_count = failed_count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+        if record["ok"]:
+            ok_count += 1
+        else:
+            failed_count += 1
+    return ok_count, failed_count
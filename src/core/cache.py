@@ -0,0 +1,259 @@
+"""
+股票量化交易回测系统 - 回测结果缓存模块
+按 策略代码版本 + 完整参数 + 输入行情指纹 计算内容哈希，对回测结果做内存和磁盘两级缓存，
+行情数据或策略代码变化后哈希随之变化，旧缓存自然失效；磁盘缓存总大小超过上限时删除最久未使用的结果
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import date, datetime
+
+import backtrader as bt
+import numpy as np
+
+# 参与计算策略代码版本的源文件，任何一个被修改都会使已有缓存失效
+_VERSIONED_MODULES = ('strategy.py', 'indicators.py', 'analyzers.py', 'analytics.py', 'backtest.py', 'result.py')
+
+# 磁盘缓存总大小上限（字节），超过时删除最久未使用的结果
+MAX_DISK_BYTES = 512 * 1024 * 1024
+# 每写入多少个结果检查一次总大小（每个进程第一次写入时也检查）
+_PRUNE_EVERY = 100
+
+_strategy_version = None
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache_dir(*parts):
+    """
+    获取本地缓存目录，不存在时自动创建
+
+    默认位于用户目录下的 .quant_trading 文件夹，可通过环境变量 QUANT_TRADING_CACHE 修改
+
+    参数:
+        parts: 子目录名称
+
+    返回:
+        str: 缓存目录路径
+    """
+    root = os.environ.get('QUANT_TRADING_CACHE') or os.path.join(os.path.expanduser('~'), '.quant_trading')
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def strategy_version():
+    """
+    计算策略代码版本：回测相关源文件内容与backtrader版本的哈希
+
+    返回:
+        str: 十六进制哈希字符串
+    """
+    global _strategy_version
+    if _strategy_version is None:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(bt.__version__.encode())
+        core_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in _VERSIONED_MODULES:
+            with open(os.path.join(core_dir, name), 'rb') as f:
+                digest.update(f.read())
+        _strategy_version = digest.hexdigest()
+    return _strategy_version
+
+
+def data_fingerprint(stock_data):
+    """
+    计算行情数据指纹，覆盖时间索引和全部OHLCV数值
+
+    参数:
+        stock_data: 行情DataFrame
+
+    返回:
+        str: 十六进制哈希字符串
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(stock_data.index.asi8).tobytes())
+    values = stock_data[['open', 'close', 'high', 'low', 'volume']].to_numpy(dtype=np.float64)
+    digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def make_result_key(kind, stock_code, params, fingerprint):
+    """
+    计算回测结果的缓存键
+
+    参数:
+        kind: 回测类型
+        stock_code: 股票代码
+        params: 完整参数字典（包含日期区间和初始资金）
+        fingerprint: 行情数据指纹
+
+    返回:
+        str: 缓存键
+    """
+    payload = json.dumps(
+        {'version': strategy_version(), 'kind': kind, 'stock_code': stock_code,
+         'params': params, 'data': fingerprint},
+        sort_keys=True, default=_json_default
+    )
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def _json_default(value):
+    """参数中的日期等对象按ISO格式参与哈希"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法序列化的参数类型: {type(value).__name__}")
+
+
+class ResultCache:
+    """
+    回测结果两级缓存
+
+    内存层为容量有限的LRU字典，磁盘层每个结果保存为一个pickle文件，
+    程序重启后仍然可以命中；文件修改时间记录最后使用时间，总大小超过上限时从最久未使用的开始删除。
+    读写都是线程安全的。
+
+    参数:
+        cache_dir (str): 磁盘缓存目录，为None时只使用内存缓存
+        memory_size (int): 内存中最多保留的结果数量
+        max_bytes (int): 磁盘缓存总大小上限（字节）
+    """
+
+    def __init__(self, cache_dir=None, memory_size=64, max_bytes=MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pkl')
+
+    def get(self, key):
+        """
+        查询缓存
+
+        参数:
+            key: 缓存键
+
+        返回:
+            BacktestResult: 命中时返回回测结果，否则返回None
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # 损坏或旧格式的缓存文件直接忽略，下次写入时覆盖
+            print(f"读取回测缓存失败: {e}")
+            return None
+        with contextlib.suppress(OSError):
+            # 更新最后使用时间，清理时保留常用的结果
+            os.utime(path)
+
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        """
+        写入缓存，磁盘写入先写临时文件再原子替换，避免并发读到半个文件
+
+        参数:
+            key: 缓存键
+            result: 回测结果
+        """
+        if result.engine is not None:
+            result = replace(result, engine=None)
+        self._remember(key, result)
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入回测缓存失败: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            check = self._writes % _PRUNE_EVERY == 1
+        if check:
+            self.prune()
+
+    def prune(self):
+        """磁盘缓存总大小超过上限时，按最后使用时间从早到晚删除结果文件"""
+        if self.cache_dir is None:
+            return
+        files = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith('.pkl'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            # 其他进程可能已经删除同一个文件
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        """清空内存和磁盘缓存"""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir is None:
+            return
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(dirpath, name))
+
+
+def get_result_cache():
+    """
+    获取进程内共享的默认回测结果缓存
+
+    返回:
+        ResultCache: 默认缓存实例
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(get_cache_dir('results'))
+        return _default_cache
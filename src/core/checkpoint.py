@@ -0,0 +1,142 @@
+"""
+股票量化交易回测系统 - 参数扫描断点模块
+把批量回测每个完成的任务（股票 × 参数组 × 日期区间）逐条写入SQLite数据库，进程被终止后重新执行时跳过已成功的任务。
+数据库使用WAL模式，扫描进行中也可以用 python -m src.cli checkpoint 或任意SQLite工具查询已完成的结果
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    cell_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    params TEXT NOT NULL,
+    date_range TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    finished_at REAL NOT NULL
+)
+"""
+
+
+def cell_key(job, include_series=False):
+    """
+    计算任务的内容键：回测类型、股票、参数、日期区间、是否增量和是否包含序列相同即为同一任务，
+    与任务编号无关，任务文件调整顺序或增加任务后已完成的结果仍然有效
+
+    参数:
+        job: expand_jobs 生成的任务字典
+        include_series: 结果中是否包含资金曲线和成交记录
+
+    返回:
+        str: 十六进制哈希字符串
+    """
+    payload = json.dumps(
+        [job["kind"], job["symbol"], job["params"], job["date_range"], bool(job.get("incremental")), include_series],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SweepCheckpoint:
+    """
+    参数扫描断点数据库
+
+    参数:
+        path: SQLite数据库文件路径，不存在时创建
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        # WAL模式下写入不阻塞其他进程读取；每条结果单独提交，进程被终止时最多丢失正在写入的一条
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def completed_keys(self):
+        """已成功完成的任务内容键集合"""
+        return {row[0] for row in self._conn.execute("SELECT cell_key FROM results WHERE ok = 1")}
+
+    def save(self, key, job, record):
+        """
+        写入一条任务结果（同一任务再次执行时覆盖原结果）
+
+        参数:
+            key: cell_key 计算的内容键
+            job: 任务字典
+            record: run_job 返回的结果记录
+        """
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, job["kind"], job["symbol"], json.dumps(job["params"], sort_keys=True, ensure_ascii=False),
+             json.dumps(job["date_range"], sort_keys=True, ensure_ascii=False), int(bool(record["ok"])),
+             json.dumps(record, ensure_ascii=False, default=str), time.time()),
+        )
+        self._conn.commit()
+
+    def records(self, ok=None):
+        """
+        按完成时间读取已保存的结果记录
+
+        参数:
+            ok: 为True/False时只返回成功/失败的记录，为None时返回全部
+
+        返回:
+            generator: 结果记录字典
+        """
+        query = "SELECT record FROM results"
+        args = ()
+        if ok is not None:
+            query += " WHERE ok = ?"
+            args = (int(ok),)
+        for (record,) in self._conn.execute(query + " ORDER BY finished_at", args):
+            yield json.loads(record)
+
+    def records_for(self, keys, ok=True):
+        """
+        按完成时间读取当前任务集合已保存的结果记录，不包括其他任务文件或任务文件修改前保存的结果
+
+        参数:
+            keys: 任务编号 -> cell_key 的字典（见 batch.job_keys）
+            ok: 为True/False时只返回成功/失败的记录，为None时返回全部
+
+        返回:
+            generator: 结果记录字典，job_id 为当前任务的编号
+        """
+        job_ids = {}
+        for job_id, key in keys.items():
+            job_ids.setdefault(key, []).append(job_id)
+        query = "SELECT cell_key, record FROM results"
+        args = ()
+        if ok is not None:
+            query += " WHERE ok = ?"
+            args = (int(ok),)
+        for key, record in self._conn.execute(query + " ORDER BY finished_at", args):
+            for job_id in job_ids.get(key, ()):
+                yield dict(json.loads(record), job_id=job_id)
+
+    def summary(self):
+        """
+        统计已保存的结果
+
+        返回:
+            dict: total（任务数）、ok（成功数）、failed（失败数）、last_finished（最后完成时间戳）
+        """
+        total, ok_count, last = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(ok), 0), MAX(finished_at) FROM results").fetchone()
+        return {"total": total, "ok": ok_count, "failed": total - ok_count, "last_finished": last}
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
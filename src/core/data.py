@@ -1,62 +1,98 @@
 """
 股票量化交易回测系统 - 数据获取模块
 负责从外部数据源获取股票历史数据和分时数据，并进行格式转换和预处理
+akshare 导入耗时约1秒，只在第一次获取数据时才导入，使用本地缓存或行情库的命令和图形界面启动不受影响。
+日K线和已收盘交易日的完整分钟线读写本地行情库（见 src.core.store），行情库中已是最新的数据不再访问网络；
+调用 akshare 时启用HTTP响应缓存（见 src.core.http_cache），离线模式下只使用缓存
 """
 
+import contextlib
 from datetime import datetime, timedelta
 
-import akshare as ak
 import pandas as pd
 
+from src.core.timing import phase
 
-def get_single_stock_history_data(symbol):
+
+@contextlib.contextmanager
+def akshare_session():
+    """
+    导入 akshare，并在语句块内启用HTTP响应缓存，块内调用的 akshare 接口都经过缓存，
+    缓存只作用于当前线程在块内发出的请求
+
+    返回:
+        module: akshare 模块
+    """
+    from src.core.http_cache import http_cache_enabled
+    import akshare
+    with http_cache_enabled():
+        yield akshare
+
+
+def _is_stock_code(symbol):
+    # 只有6位数字代码才读写行情库（代码用作文件名）
+    return isinstance(symbol, str) and len(symbol) == 6 and symbol.isdigit()
+
+
+def get_single_stock_history_data(symbol, use_cache=True):
     """
     获取单只股票的历史日K线数据
 
     参数:
         symbol: 股票代码，如'600519'
+        use_cache: 是否使用本地行情库：最近一次收盘后已写入的直接读取，否则获取后写入行情库
 
     返回:
         DataFrame: 包含开盘价、收盘价、最高价、最低价和成交量的数据框
     """
+    use_cache = use_cache and _is_stock_code(symbol)
+    if use_cache:
+        # store 模块导入本模块，在函数内导入避免循环导入
+        from src.core.store import load_fresh_bars
+        with phase('fetch'):
+            cached = load_fresh_bars(symbol)
+        if cached is not None:
+            return cached
+
     try:
         # 通过akshare获取后复权数据
-        data = ak.stock_zh_a_hist(symbol=symbol, adjust="hfq")[['日期', '开盘', '收盘', '最高', '最低', '成交量']]
-
-        # 重命名列为英文，便于后续处理
-        data.columns = ['date', 'open', 'close', 'high', 'low', 'volume']
-
-        # 设置日期索引
-        data.index = pd.to_datetime(data['date'])
-
-        # 将价格和成交量列转换为数值类型
-        numeric_columns = ['open', 'close', 'high', 'low', 'volume']
-        for column in numeric_columns:
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-
-        # 填充缺失值
-        data[numeric_columns] = data[numeric_columns].ffill().bfill()
-
-        return data
+        with akshare_session() as ak, phase('fetch'):
+            data = ak.stock_zh_a_hist(symbol=symbol, adjust="hfq")[['日期', '开盘', '收盘', '最高', '最低', '成交量']]
+        with phase('clean'):
+            data = clean_ohlcv_frame(data)
     except Exception as e:
         print(f"数据获取失败: {str(e)}")
         return pd.DataFrame()
 
+    if use_cache and not data.empty:
+        from src.core.store import save_bars
+        try:
+            save_bars(symbol, data)
+        except OSError as e:
+            print(f"写入行情库失败: {e}")
+    return data
 
-def get_single_stock_ticks_data_advanced(stock_code, start, end):
-    """
-    获取单只股票的分钟级历史数据，保留原始时间格式
 
-    参数:
-        stock_code: 股票代码
-        start: 开始日期时间
-        end: 结束日期时间
+def _get_minute_frame(stock_code, start, end, use_cache):
+    """
+    获取清洗后的1分钟K线（原始时间索引）；请求覆盖一个已收盘交易日的完整交易时段时读写本地行情库
 
-    返回:
-        DataFrame: 包含原始时间索引的分钟级数据
+    异常:
+        获取失败时抛出数据源的异常，由调用方处理
     """
-    try:
-        # 获取1分钟K线数据
+    from src.core.store import full_session_date, is_session_settled, load_minute_bars, save_minute_bars
+
+    trade_date = full_session_date(start, end) if use_cache and _is_stock_code(stock_code) else None
+    if trade_date is not None and is_session_settled(trade_date):
+        with phase('fetch'):
+            cached = load_minute_bars(stock_code, trade_date)
+        if cached is not None:
+            return cached
+    else:
+        trade_date = None
+
+    # 获取1分钟K线数据
+    with akshare_session() as ak, phase('fetch'):
         data = ak.stock_zh_a_hist_min_em(
             symbol=stock_code,
             start_date=start,
@@ -64,26 +100,38 @@ def get_single_stock_ticks_data_advanced(stock_code, start, end):
             period="1",
             adjust="hfq"
         )[['时间', '开盘', '收盘', '最高', '最低', '成交量']]
+    with phase('clean'):
+        data = clean_ohlcv_frame(data)
 
-        # 重命名列为英文
-        data.columns = ['date', 'open', 'close', 'high', 'low', 'volume']
+    if trade_date is not None and not data.empty:
+        try:
+            save_minute_bars(stock_code, trade_date, data)
+        except OSError as e:
+            print(f"写入分钟线缓存失败: {e}")
+    return data
 
-        # 设置日期索引
-        data.index = pd.to_datetime(data['date'])
 
-        # 转换为数值类型并处理缺失值
-        numeric_columns = ['open', 'close', 'high', 'low', 'volume']
-        for column in numeric_columns:
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-        data[numeric_columns] = data[numeric_columns].ffill().bfill()
+def get_single_stock_ticks_data_advanced(stock_code, start, end, use_cache=True):
+    """
+    获取单只股票的分钟级历史数据，保留原始时间格式
 
-        return data
+    参数:
+        stock_code: 股票代码
+        start: 开始日期时间
+        end: 结束日期时间
+        use_cache: 是否读写已收盘交易日的分钟线缓存
+
+    返回:
+        DataFrame: 包含原始时间索引的分钟级数据
+    """
+    try:
+        return _get_minute_frame(stock_code, start, end, use_cache)
     except Exception as e:
         print(f"数据获取错误: {e}")
         return pd.DataFrame()
 
 
-def get_single_stock_ticks_data_transfer(stock_code, start, end):
+def get_single_stock_ticks_data_transfer(stock_code, start, end, use_cache=True):
     """
     获取单只股票的分钟级历史数据，并将时间转换为特殊格式以适应backtrader的日期要求
 
@@ -91,62 +139,155 @@ def get_single_stock_ticks_data_transfer(stock_code, start, end):
         stock_code: 股票代码
         start: 开始日期时间
         end: 结束日期时间
+        use_cache: 是否读写已收盘交易日的分钟线缓存
 
     返回:
         DataFrame: 包含转换后时间索引的分钟级数据
     """
     try:
-        # 获取1分钟K线数据
-        data = ak.stock_zh_a_hist_min_em(
-            symbol=stock_code,
-            start_date=start,
-            end_date=end,
-            period="1",
-            adjust="hfq"
-        )[['时间', '开盘', '收盘', '最高', '最低', '成交量']]
+        data = _get_minute_frame(stock_code, start, end, use_cache)
+        with phase('clean'):
+            return transform_ticks_data(data)
+    except Exception as e:
+        print(f"数据获取错误: {e}")
+        return pd.DataFrame()
 
-        # 重命名列为英文
-        data.columns = ['date', 'open', 'close', 'high', 'low', 'volume']
 
-        # 设置日期索引
-        data.index = pd.to_datetime(data['date'])
+def clean_ohlcv_frame(data):
+    """
+    把akshare返回的K线数据整理为统一格式：英文列名、时间索引、数值类型，并填充缺失值
 
-        # 时间映射：将分钟数据映射到从1970年开始的日期，以便backtrader处理
-        # backtrader不直接支持分钟级回测，使用这种方法将分钟转换为天级别数据
-        base_date = datetime(1970, 1, 1)
-        new_dates = []
+    参数:
+        data: 依次包含 时间/日期、开盘、收盘、最高、最低、成交量 六列的数据框
 
-        for dt in data.index:
-            # 计算从9:30开始经过的分钟数
-            minutes_passed = (dt.hour * 60 + dt.minute) - (9 * 60 + 30)
-            # 将分钟数映射为从基准日期开始的天数
-            new_date = base_date + timedelta(days=minutes_passed)
-            new_dates.append(new_date)
+    返回:
+        DataFrame: 包含 date、open、close、high、low、volume 列的数据框
+    """
+    # 重命名列为英文，便于后续处理
+    data.columns = ['date', 'open', 'close', 'high', 'low', 'volume']
 
-        # 更新索引和日期列
-        data.index = pd.DatetimeIndex(new_dates)
-        data['date'] = pd.DatetimeIndex(new_dates)
+    # 设置日期索引
+    data.index = pd.to_datetime(data['date'])
 
-        # 转换为数值类型并处理缺失值
-        numeric_columns = ['open', 'close', 'high', 'low', 'volume']
-        for column in numeric_columns:
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-        data[numeric_columns] = data[numeric_columns].ffill().bfill()
+    # 将价格和成交量列转换为数值类型
+    numeric_columns = ['open', 'close', 'high', 'low', 'volume']
+    for column in numeric_columns:
+        data[column] = pd.to_numeric(data[column], errors='coerce')
 
-        # 修复API返回的开盘价问题（有时为0）
-        data['open'] = data.apply(lambda row: row['close'] if row['open'] == 0 else row['open'], axis=1)
+    # 填充缺失值
+    data[numeric_columns] = data[numeric_columns].ffill().bfill()
+
+    return data
+
+
+def transform_ticks_data(data):
+    """
+    把akshare返回的分钟K线数据整理为统一格式，并将时间转换为特殊格式以适应backtrader的日期要求
+
+    参数:
+        data: 依次包含 时间、开盘、收盘、最高、最低、成交量 六列的数据框
+
+    返回:
+        DataFrame: 包含转换后时间索引的分钟级数据
+    """
+    data = clean_ohlcv_frame(data)
+
+    # 时间映射：将分钟数据映射到从1970年开始的日期，以便backtrader处理
+    # backtrader不直接支持分钟级回测，使用这种方法将分钟转换为天级别数据
+    base_date = datetime(1970, 1, 1)
+    new_dates = []
+
+    for dt in data.index:
+        # 计算从9:30开始经过的分钟数
+        minutes_passed = (dt.hour * 60 + dt.minute) - (9 * 60 + 30)
+        # 将分钟数映射为从基准日期开始的天数
+        new_date = base_date + timedelta(days=minutes_passed)
+        new_dates.append(new_date)
+
+    # 更新索引和日期列
+    data.index = pd.DatetimeIndex(new_dates)
+    data['date'] = pd.DatetimeIndex(new_dates)
+
+    # 修复API返回的开盘价问题（有时为0）
+    data['open'] = data.apply(lambda row: row['close'] if row['open'] == 0 else row['open'], axis=1)
+
+    return data
 
-        return data
-    except Exception as e:
-        print(f"数据获取错误: {e}")
-        return pd.DataFrame()
 
 def get_single_stock_info(stock_code):
     try:
-        info_df = ak.stock_individual_info_em(symbol=stock_code)
+        with akshare_session() as ak:
+            info_df = ak.stock_individual_info_em(symbol=stock_code)
 
         return info_df
 
     except Exception as e:
         print(f"获取股票信息失败: {e}")
 
+
+def get_a_share_symbols():
+    """
+    获取沪深A股全部股票代码
+
+    返回:
+        list: 6位股票代码列表，获取失败时为空列表
+    """
+    try:
+        with akshare_session() as ak, phase('fetch'):
+            info = ak.stock_info_a_code_name()
+        return info['code'].astype(str).str.zfill(6).tolist()
+    except Exception as e:
+        print(f"获取股票列表失败: {e}")
+        return []
+
+
+def _code_dates(frame, code_column, date_column, name_column=None):
+    """从交易所代码表中取出 代码 -> (上市日期, 名称) 对应关系"""
+    codes = frame[code_column].astype(str).str.zfill(6)
+    dates = pd.to_datetime(frame[date_column], errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+    names = frame[name_column].astype(str) if name_column else [''] * len(frame)
+    return {code: (listed, name) for code, listed, name in zip(codes, dates, names)}
+
+
+def get_a_share_symbol_table():
+    """
+    批量获取A股代码表，包括上市日期和已退市股票，用于刷新本地股票代码表
+
+    上市日期和退市列表分别来自各交易所的接口，某个接口获取失败时对应字段留空，不影响其余数据
+
+    返回:
+        DataFrame: code（6位代码）、name（简称）、list_date（YYYY-MM-DD，未知时为空字符串）、
+                   status（"上市" 或 "退市"）列，获取失败时为空
+    """
+    try:
+        with akshare_session() as ak, phase('fetch'):
+            info = ak.stock_info_a_code_name()
+    except Exception as e:
+        print(f"获取股票列表失败: {e}")
+        return pd.DataFrame(columns=['code', 'name', 'list_date', 'status'])
+
+    list_dates = {}
+    delisted = {}
+    sources = [
+        (list_dates, lambda ak: ak.stock_info_sh_name_code(symbol='主板A股'), '证券代码', '上市日期', None),
+        (list_dates, lambda ak: ak.stock_info_sh_name_code(symbol='科创板'), '证券代码', '上市日期', None),
+        (list_dates, lambda ak: ak.stock_info_sz_name_code(symbol='A股列表'), 'A股代码', 'A股上市日期', None),
+        (list_dates, lambda ak: ak.stock_info_bj_name_code(), '证券代码', '上市日期', None),
+        (delisted, lambda ak: ak.stock_info_sh_delist(symbol='全部'), '公司代码', '上市日期', '公司简称'),
+        (delisted, lambda ak: ak.stock_info_sz_delist(symbol='终止上市公司'), '证券代码', '上市日期', '证券简称'),
+    ]
+    for target, fetch, code_column, date_column, name_column in sources:
+        try:
+            with akshare_session() as ak, phase('fetch'):
+                target.update(_code_dates(fetch(ak), code_column, date_column, name_column))
+        except Exception as e:
+            print(f"获取上市信息失败: {e}")
+
+    table = pd.DataFrame({'code': info['code'].astype(str).str.zfill(6), 'name': info['name'].astype(str)})
+    table['list_date'] = [list_dates.get(code, ('', ''))[0] for code in table['code']]
+    table['status'] = '上市'
+    listed_codes = set(table['code'])
+    gone = [(code, name, listed, '退市') for code, (listed, name) in delisted.items() if code not in listed_codes]
+    if gone:
+        table = pd.concat([table, pd.DataFrame(gone, columns=table.columns)], ignore_index=True)
+    return table
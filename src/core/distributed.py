@@ -0,0 +1,302 @@
+"""
+股票量化交易回测系统 - 多节点批量回测模块
+协调节点持有任务队列并通过TCP分发任务，各主机上的工作节点连接后逐个领取任务、执行回测并回传结果。
+消息为每行一个JSON对象；工作节点执行任务期间定时发送心跳，连接断开、超过租约时间没有心跳或执行失败的任务重新排队，
+重试次数用尽的任务记为失败。工作节点自行获取行情数据，只要求各主机能运行本项目
+"""
+
+import itertools
+import json
+import multiprocessing
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+
+from src.core.batch import run_job
+
+# 工作节点执行任务期间发送心跳的间隔（秒）
+HEARTBEAT_INTERVAL = 5.0
+# 超过该时间（秒）没有收到心跳的任务视为工作节点失联，重新排队
+LEASE_TIMEOUT = 30.0
+# 每个任务最多分发的次数（首次执行加重试）
+MAX_ATTEMPTS = 3
+# 任务全部领取后，空闲工作节点的等待间隔（秒），期间失联任务可能重新排队
+_WAIT_SECONDS = 1.0
+
+
+def _send(out, message, lock=None):
+    line = json.dumps(message, ensure_ascii=False, default=str) + '\n'
+    if lock is None:
+        out.write(line)
+        out.flush()
+        return
+    with lock:
+        out.write(line)
+        out.flush()
+
+
+class Coordinator:
+    """
+    协调节点的任务状态：待分发队列、已分发任务的租约和结果队列（线程安全）
+
+    参数:
+        jobs: expand_jobs 生成的任务字典列表
+        include_series: 结果中是否包含资金曲线和成交记录
+        lease_timeout: 租约时间（秒）
+        max_attempts: 每个任务最多分发的次数
+    """
+
+    def __init__(self, jobs, include_series=False, lease_timeout=LEASE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.include_series = include_series
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.results = queue.Queue()
+        self._jobs = {job["job_id"]: job for job in jobs}
+        self._pending = deque(self._jobs)
+        self._attempts = dict.fromkeys(self._jobs, 0)
+        # 任务编号 -> (连接编号, 租约到期时间)
+        self._leases = {}
+        self._done = set()
+        self._lock = threading.Lock()
+        self._connections = itertools.count(1)
+
+    def connect(self):
+        """登记新连接，返回连接编号"""
+        return next(self._connections)
+
+    def lease(self, conn_id):
+        """
+        为连接分发一个任务
+
+        返回:
+            dict: 发给工作节点的消息（task、wait 或 done）
+        """
+        with self._lock:
+            self._expire_locked()
+            if self._pending:
+                job_id = self._pending.popleft()
+                self._attempts[job_id] += 1
+                self._leases[job_id] = (conn_id, time.monotonic() + self.lease_timeout)
+                return {"type": "task", "job": self._jobs[job_id], "attempt": self._attempts[job_id],
+                        "include_series": self.include_series}
+            if len(self._done) == len(self._jobs):
+                return {"type": "done"}
+            return {"type": "wait", "seconds": _WAIT_SECONDS}
+
+    def heartbeat(self, conn_id):
+        """续期该连接持有的全部租约"""
+        deadline = time.monotonic() + self.lease_timeout
+        with self._lock:
+            for job_id, (holder, _) in self._leases.items():
+                if holder == conn_id:
+                    self._leases[job_id] = (holder, deadline)
+
+    def complete(self, job_id, record):
+        """
+        登记任务结果；同一任务只接受第一个结果（失联后又回传的结果被忽略）。
+        执行失败（如行情获取暂时失败）且分发次数未用尽的任务重新排队，用尽后登记最后一次的失败结果
+        """
+        with self._lock:
+            if job_id not in self._jobs or job_id in self._done:
+                return
+            if not record.get("ok") and self._attempts[job_id] < self.max_attempts:
+                # 租约已超时的任务已经重新排队，不重复排队
+                if self._leases.pop(job_id, None) is not None:
+                    # 排到队尾，暂时性的错误过一段时间再重试
+                    self._pending.append(job_id)
+                return
+            self._done.add(job_id)
+            self._leases.pop(job_id, None)
+            if job_id in self._pending:
+                # 超时重新排队后原工作节点又回传了结果
+                self._pending.remove(job_id)
+        self.results.put(record)
+
+    def disconnect(self, conn_id):
+        """连接断开：该连接持有的任务重新排队"""
+        with self._lock:
+            for job_id in [job_id for job_id, (holder, _) in self._leases.items() if holder == conn_id]:
+                self._requeue_locked(job_id, "工作节点连接断开")
+
+    def expire(self):
+        """检查租约，超时的任务重新排队"""
+        with self._lock:
+            self._expire_locked()
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        for job_id in [job_id for job_id, (_, deadline) in self._leases.items() if deadline < now]:
+            self._requeue_locked(job_id, "工作节点心跳超时")
+
+    def _requeue_locked(self, job_id, reason):
+        del self._leases[job_id]
+        if self._attempts[job_id] < self.max_attempts:
+            # 放到队首，优先于尚未分发的任务
+            self._pending.appendleft(job_id)
+            return
+        job = self._jobs[job_id]
+        self._done.add(job_id)
+        self.results.put({
+            "job_id": job_id, "kind": job["kind"], "symbol": job["symbol"], "params": job["params"],
+            "date_range": job["date_range"], "ok": False,
+            "error": f"{reason}，已分发 {self._attempts[job_id]} 次仍未完成",
+        })
+
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    """一个工作节点连接：按行读取请求、结果和心跳消息"""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        conn_id = coordinator.connect()
+        out = self.wfile
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                kind = message.get("type")
+                if kind == "request":
+                    reply = json.dumps(coordinator.lease(conn_id), ensure_ascii=False, default=str) + '\n'
+                    out.write(reply.encode('utf-8'))
+                    out.flush()
+                elif kind == "heartbeat":
+                    coordinator.heartbeat(conn_id)
+                elif kind == "result":
+                    coordinator.complete(message["job_id"], message["record"])
+        except (OSError, ValueError) as e:
+            print(f"工作节点连接异常: {e}", file=sys.stderr)
+        finally:
+            coordinator.disconnect(conn_id)
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def run_coordinator(jobs, include_series=False, host='127.0.0.1', port=9950, lease_timeout=LEASE_TIMEOUT,
+                    max_attempts=MAX_ATTEMPTS, local_workers=0):
+    """
+    启动协调节点分发任务，结果到达一个就产出一个（可作为 run_jobs 的 runner）
+
+    参数:
+        jobs: 任务字典列表
+        include_series: 结果中是否包含资金曲线和成交记录
+        host: 监听地址，默认只接受本机连接；协议没有身份验证，监听其他地址时只应在可信网络中使用
+        port: 监听端口
+        lease_timeout: 租约时间（秒），超过该时间没有心跳的任务重新排队
+        max_attempts: 每个任务最多分发的次数
+        local_workers: 同时在本机启动的工作节点进程数，0 表示只等待外部工作节点连接
+
+    返回:
+        generator: 按完成顺序产出的结果记录
+    """
+    if not jobs:
+        return
+    coordinator = Coordinator(jobs, include_series, lease_timeout, max_attempts)
+    server = _CoordinatorServer((host, port), _CoordinatorHandler)
+    server.coordinator = coordinator
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bound_host, bound_port = server.server_address[:2]
+    print(f"协调节点已启动: {bound_host}:{bound_port}，共 {len(jobs)} 个任务", file=sys.stderr)
+    if host not in ('127.0.0.1', 'localhost', '::1'):
+        print("注意：协调节点没有身份验证，能访问该端口的主机都可以领取任务和回传结果，只应在可信网络中使用",
+              file=sys.stderr)
+
+    connect_host = '127.0.0.1' if host in ('0.0.0.0', '') else host
+    processes = [multiprocessing.Process(target=run_worker, args=(connect_host, bound_port), daemon=True)
+                 for _ in range(local_workers)]
+    for process in processes:
+        process.start()
+    try:
+        for _ in range(len(jobs)):
+            while True:
+                try:
+                    record = coordinator.results.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    coordinator.expire()
+            yield record
+    finally:
+        # 全部结果到达后工作节点再次请求会收到 done；稍等片刻让本机工作节点正常退出
+        for process in processes:
+            process.join(timeout=_WAIT_SECONDS * 2)
+        server.shutdown()
+        server.server_close()
+
+
+def _connect(host, port, timeout):
+    """连接协调节点，协调节点尚未启动时在 timeout 秒内重试"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((host, port), timeout=10.0)
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def run_worker(host, port, heartbeat_interval=HEARTBEAT_INTERVAL, connect_timeout=30.0):
+    """
+    工作节点：连接协调节点，循环领取任务、执行回测、回传结果，直到收到 done 或连接断开
+
+    参数:
+        host: 协调节点地址
+        port: 协调节点端口
+        heartbeat_interval: 执行任务期间的心跳间隔（秒）
+        connect_timeout: 协调节点尚未启动时重试连接的时间（秒）
+
+    返回:
+        int: 完成的任务数
+    """
+    sock = _connect(host, port, connect_timeout)
+    # 连接建立后阻塞等待消息，回测耗时不设上限
+    sock.settimeout(None)
+    write_lock = threading.Lock()
+    completed = 0
+    with sock, sock.makefile('r', encoding='utf-8') as reader, sock.makefile('w', encoding='utf-8') as out:
+        while True:
+            try:
+                _send(out, {"type": "request"}, write_lock)
+                line = reader.readline()
+            except OSError:
+                break
+            if not line:
+                break
+            message = json.loads(line)
+            if message["type"] == "done":
+                break
+            if message["type"] == "wait":
+                time.sleep(message["seconds"])
+                continue
+
+            job = message["job"]
+            stop = threading.Event()
+            beat = threading.Thread(target=_heartbeat, args=(out, write_lock, stop, heartbeat_interval), daemon=True)
+            beat.start()
+            try:
+                record = run_job(job, message.get("include_series", False))
+            finally:
+                stop.set()
+                beat.join()
+            record["attempt"] = message.get("attempt", 1)
+            try:
+                _send(out, {"type": "result", "job_id": job["job_id"], "record": record}, write_lock)
+            except OSError:
+                break
+            completed += 1
+    return completed
+
+
+def _heartbeat(out, lock, stop, interval):
+    while not stop.wait(interval):
+        try:
+            _send(out, {"type": "heartbeat"}, lock)
+        except OSError:
+            return
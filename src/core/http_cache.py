@@ -0,0 +1,327 @@
+"""
+股票量化交易回测系统 - HTTP响应缓存模块
+在 requests 的传输层（HTTPAdapter）缓存数据源的GET响应。缓存只在 http_cache_enabled() 语句块内、对当前线程发出的请求生效，
+数据获取模块在调用 akshare 时启用，akshare 的全部接口（包括尚未封装的接口）都经过缓存，其余 requests 的使用者不受影响。
+每个接口按规则设置过期时间：行情接口在交易时段内只缓存很短时间，收盘后到下一次开盘前一直有效；
+过期后上游提供 ETag / Last-Modified 时发送条件请求，返回304则继续使用缓存内容。
+离线模式（环境变量 QUANT_TRADING_OFFLINE=1 或 set_offline(True)）只读取缓存，未命中时立即失败，不访问网络。
+响应保存在缓存目录下 http/responses.db（SQLite，WAL模式，多进程共享）
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import time as dtime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from src.core.cache import get_cache_dir
+
+# 按URL匹配的过期规则（按顺序取第一条匹配）：秒数，或 'market' 表示按交易时段（见 _market_expiry）
+EXPIRY_RULES = (
+    # 交易日历
+    (re.compile(r'finance\.sina\.com\.cn/realstock/company/klc_td_sh\.txt'), 24 * 3600),
+    # 个股基本信息
+    (re.compile(r'eastmoney\.com/api/qt/stock/get'), 24 * 3600),
+    # 日K线、分钟线
+    (re.compile(r'eastmoney\.com/api/qt/stock/(kline|trends2)/get'), 'market'),
+)
+# 没有匹配规则的接口按交易时段过期
+DEFAULT_EXPIRY = 'market'
+# 交易时段内行情接口响应的有效时间（秒）
+INTRADAY_TTL = 60
+# 集合竞价开始到收盘后行情稳定的时间段内行情不断变化，其余时间不变
+MARKET_OPEN = dtime(hour=9, minute=15)
+MARKET_SETTLED = dtime(hour=15, minute=5)
+# 缓存总大小上限（字节），超过时删除最早获取的响应
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+# 每写入多少条响应检查一次总大小
+_PRUNE_EVERY = 200
+# 作为防缓存参数的查询参数，计算缓存键时忽略
+_IGNORED_PARAMS = frozenset({'_'})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+_offline = None
+# 当前线程启用缓存时使用的 ResponseStore，未启用时为None
+_scope = threading.local()
+# 正在使用缓存的语句块数，大于0时 requests 新建的会话挂载带缓存的适配器
+_active = 0
+_active_lock = threading.Lock()
+_default_store = None
+
+
+class OfflineError(requests.exceptions.ConnectionError):
+    """离线模式下请求的响应不在缓存中"""
+
+
+def set_offline(offline):
+    """
+    开启或关闭离线模式；同时写入环境变量，之后启动的工作进程也处于同一模式
+
+    参数:
+        offline (bool): 是否只读取缓存
+    """
+    global _offline
+    _offline = bool(offline)
+    os.environ['QUANT_TRADING_OFFLINE'] = '1' if offline else '0'
+
+
+def is_offline():
+    """是否处于离线模式（未调用 set_offline 时读取环境变量 QUANT_TRADING_OFFLINE）"""
+    if _offline is not None:
+        return _offline
+    return os.environ.get('QUANT_TRADING_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+
+def _market_expiry(fetched):
+    """交易时段内获取的响应 INTRADAY_TTL 秒后过期，其余时间获取的响应到下一次集合竞价开始时过期"""
+    if fetched.weekday() < 5 and MARKET_OPEN <= fetched.time() < MARKET_SETTLED:
+        return fetched + timedelta(seconds=INTRADAY_TTL)
+    opening = datetime.combine(fetched.date(), MARKET_OPEN)
+    if fetched >= opening:
+        opening += timedelta(days=1)
+    while opening.weekday() >= 5:
+        opening += timedelta(days=1)
+    return opening
+
+
+def expires_at(url, fetched=None):
+    """
+    按过期规则计算一个响应的过期时间
+
+    参数:
+        url: 请求URL
+        fetched: 获取时间，默认为当前时间
+
+    返回:
+        float: 过期时间戳
+    """
+    fetched = fetched or datetime.now()
+    rule = next((expiry for pattern, expiry in EXPIRY_RULES if pattern.search(url)), DEFAULT_EXPIRY)
+    if rule == 'market':
+        return _market_expiry(fetched).timestamp()
+    return fetched.timestamp() + rule
+
+
+def cache_key(method, url):
+    """请求方法和URL（查询参数排序、去掉防缓存参数）的哈希"""
+    parts = urlsplit(url)
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if k not in _IGNORED_PARAMS))
+    normalized = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+    return hashlib.blake2b(f"{method} {normalized}".encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResponseStore:
+    """
+    SQLite保存的HTTP响应（线程安全；每个进程使用自己的连接）
+
+    参数:
+        path: 数据库文件路径，默认为缓存目录下的 http/responses.db
+        max_bytes: 响应总大小上限（字节）
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_CACHE_BYTES):
+        self.path = path or os.path.join(get_cache_dir('http'), 'responses.db')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self):
+        # fork 出的工作进程不能使用父进程的连接
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        """
+        查询缓存的响应
+
+        返回:
+            dict: url、status、headers、body、fetched_at、expires_at；未命中时为None
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT url, status, headers, body, fetched_at, expires_at FROM responses WHERE key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body, fetched_at, expiry = row
+        return {'url': url, 'status': status, 'headers': json.loads(headers), 'body': body,
+                'fetched_at': fetched_at, 'expires_at': expiry}
+
+    def put(self, key, url, status, headers, body, expiry):
+        """写入（覆盖）一个响应"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, url, status, json.dumps(headers, ensure_ascii=False), body, time.time(), expiry))
+            conn.commit()
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._prune_locked()
+
+    def touch(self, key, expiry):
+        """条件请求确认内容未变化：更新获取时间和过期时间"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE responses SET fetched_at = ?, expires_at = ? WHERE key = ?",
+                         (time.time(), expiry, key))
+            conn.commit()
+
+    def prune(self):
+        """总大小超过上限时删除最早获取的响应"""
+        with self._lock:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        conn = self._connection()
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = []
+        for key, size in conn.execute("SELECT key, LENGTH(body) FROM responses ORDER BY fetched_at"):
+            if total <= self.max_bytes:
+                break
+            removed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+        conn.commit()
+
+    def clear(self):
+        """删除全部缓存的响应"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    带缓存的传输适配器：未过期的GET响应直接返回缓存，过期后条件请求重新验证，
+    离线模式下只返回缓存；网络请求失败时使用已过期的缓存（打印提示）。
+    发出请求的线程不在 http_cache_enabled() 语句块内时与 HTTPAdapter 完全相同
+    """
+
+    def send(self, request, **kwargs):
+        store = getattr(_scope, 'store', None)
+        if request.method != 'GET' or store is None:
+            return super().send(request, **kwargs)
+
+        key = cache_key(request.method, request.url)
+        cached = store.get(key)
+        if cached is not None and (is_offline() or cached['expires_at'] > time.time()):
+            return self._cached_response(request, cached)
+        if is_offline():
+            raise OfflineError(f"离线模式下缓存中没有该请求的响应: {request.url}", request=request)
+
+        if cached is not None:
+            validators = CaseInsensitiveDict(cached['headers'])
+            if 'ETag' in validators:
+                request.headers['If-None-Match'] = validators['ETag']
+            if 'Last-Modified' in validators:
+                request.headers['If-Modified-Since'] = validators['Last-Modified']
+
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if cached is None:
+                raise
+            print(f"网络请求失败，使用已过期的缓存: {e}")
+            return self._cached_response(request, cached)
+
+        expiry = expires_at(request.url)
+        if response.status_code == 304 and cached is not None:
+            store.touch(key, expiry)
+            response.close()
+            return self._cached_response(request, cached)
+        if response.status_code == 200:
+            # 读取全部内容后保存；解压后的内容不再带 Content-Encoding，长度也随之变化
+            headers = {name: value for name, value in response.headers.items()
+                       if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+            try:
+                store.put(key, request.url, response.status_code, headers, response.content, expiry)
+            except sqlite3.Error as e:
+                print(f"写入HTTP缓存失败: {e}")
+        return response
+
+    @staticmethod
+    def _cached_response(request, cached):
+        response = requests.Response()
+        response.status_code = cached['status']
+        response.headers = CaseInsensitiveDict(cached['headers'])
+        response._content = cached['body']
+        response._content_consumed = True
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK'
+        response.from_cache = True
+        return response
+
+
+def _get_default_store():
+    global _default_store
+    with _active_lock:
+        if _default_store is None:
+            _default_store = ResponseStore()
+        return _default_store
+
+
+@contextlib.contextmanager
+def http_cache_enabled(store=None):
+    """
+    在语句块内启用HTTP响应缓存：当前线程在块内发出的 requests 请求（包括 requests.get 等模块函数新建的会话）
+    经过缓存，其他线程和块外的请求不受影响；可以嵌套。环境变量 QUANT_TRADING_HTTP_CACHE=0 时不启用
+
+    Session.__init__ 按 requests.sessions 模块中的名称挂载 HTTPAdapter，有语句块在执行时该名称指向 CachingAdapter，
+    最后一个语句块结束后恢复；期间其他线程新建的会话虽然挂载 CachingAdapter，但不在语句块内，请求照常发送
+
+    参数:
+        store: 可选，ResponseStore，默认使用缓存目录下的数据库
+    """
+    global _active
+    if os.environ.get('QUANT_TRADING_HTTP_CACHE', '').lower() in ('0', 'false', 'no'):
+        yield
+        return
+    previous = getattr(_scope, 'store', None)
+    _scope.store = store or previous or _get_default_store()
+    with _active_lock:
+        _active += 1
+        requests.sessions.HTTPAdapter = CachingAdapter
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active -= 1
+            if _active == 0:
+                requests.sessions.HTTPAdapter = HTTPAdapter
+        _scope.store = previous
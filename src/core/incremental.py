@@ -0,0 +1,234 @@
+"""
+股票量化交易回测系统 - 增量回测模块
+在每次日K回测结束时保存策略、账户和指标的快照，之后同一配置的回测从快照继续，
+只处理新追加的K线，结果与从头完整回测逐位一致
+"""
+
+import copy
+import hashlib
+import json
+import math
+import os
+import pickle
+import tempfile
+from dataclasses import replace
+from datetime import datetime
+
+import backtrader as bt
+import numpy as np
+
+from src.core.analytics import compute_metrics
+from src.core.backtest import (_add_result_analyzers, _collect_result, _create_engine, _daily_params,
+                               _normalize_date_range, _validate_sma_params, run_daily_backtest)
+from src.core.cache import _json_default, data_fingerprint, get_cache_dir, strategy_version
+from src.core.data import get_single_stock_history_data
+from src.core.strategy import DailyMA
+from src.core.timing import switch_phase, timed_backtest
+
+
+@timed_backtest('daily')
+def run_daily_backtest_incremental(stock_code, use_take_profit, take_profit, take_profit_size,
+                                   use_stop_loss, stop_loss, stop_loss_size,
+                                   use_sma_crossover, fast_maperiod, slow_maperiod,
+                                   start_cash, sma_buy_size=None, sma_sell_size=None,
+                                   start_date=None, end_date=None, stock_data=None, snapshot_dir=None):
+    """
+    执行可续跑的日K线回测
+
+    参数与 run_daily_backtest 相同。同一配置（股票、策略参数、开始日期、初始资金）的快照存在、
+    且快照之前的行情数据没有变化时，只回测快照之后新增的K线；否则执行完整回测。
+    每次回测结束后都会更新快照。
+
+    参数:
+        snapshot_dir: 快照保存目录，默认为缓存目录下的 snapshots
+
+    返回:
+        BacktestResult: 回测结果，未找到数据时返回None
+    """
+    if stock_data is None:
+        stock_data = get_single_stock_history_data(stock_code)
+    if stock_data.empty:
+        print("未找到对应股票数据，请检查代码格式（A股6位数字代码）")
+        return None
+
+    start_date, end_date = _normalize_date_range(stock_data, start_date, end_date)
+    _validate_sma_params(use_sma_crossover, fast_maperiod, slow_maperiod)
+    params = _daily_params(fast_maperiod, slow_maperiod, use_take_profit, take_profit, take_profit_size,
+                           use_stop_loss, stop_loss, stop_loss_size, use_sma_crossover,
+                           sma_buy_size, sma_sell_size)
+
+    snapshot_path = _snapshot_path(snapshot_dir, stock_code, params, start_date, start_cash)
+    snapshot = _load_snapshot(snapshot_path)
+    warmup_start = _resume_point(snapshot, stock_data, start_date, end_date, params)
+
+    if warmup_start is None:
+        # 没有可用快照，执行完整回测并保存快照
+        result = run_daily_backtest(stock_code, start_date=start_date, end_date=end_date, start_cash=start_cash,
+                                    stock_data=stock_data, use_cache=False, keep_engine=True, **params)
+        strat = result.engine.runstrats[0][0]
+        result.engine = None
+    else:
+        last_date = snapshot['last_date']
+        if end_date <= last_date:
+            # 没有新K线，快照中的结果就是最新结果
+            return snapshot['result']
+        result, strat = _resume(snapshot, stock_code, stock_data, warmup_start, start_date, end_date,
+                                start_cash, params)
+
+    _save_snapshot(snapshot_path, stock_data, strat, result)
+    return result
+
+
+def _resume(snapshot, stock_code, stock_data, warmup_start, start_date, end_date, start_cash, params):
+    """从快照恢复并只回测快照之后的K线，返回合并后的结果和策略实例"""
+    switch_phase('ingest')
+    engine = _create_engine(lean=False, keep_engine=False)
+    # 先截取预热起点之后的行情，backtrader 不必逐行跳过快照之前的全部历史，续跑耗时只与新K线数量相关
+    window = stock_data.loc[warmup_start:end_date]
+    data = bt.feeds.PandasData(dataname=window, fromdate=warmup_start, todate=end_date)
+    engine.adddata(data)
+    engine.addstrategy(DailyMA, start_date=start_date, end_date=end_date,
+                       resume_state=snapshot['state'], **params)
+    engine.broker.setcash(start_cash)
+    # 续跑部分单独的绩效指标没有意义，统一在合并后由完整的资金曲线和成交记录计算
+    _add_result_analyzers(engine)
+    strat = engine.run()[0]
+    tail = _collect_result('daily', stock_code, strat, engine, start_date, end_date, start_cash, params,
+                           keep_engine=False)
+
+    # 去掉预热阶段的资金曲线，与快照中的结果拼接
+    head = snapshot['result']
+    keep = tail.equity_dates > np.datetime64(snapshot['last_date'], 's')
+    equity_dates = np.concatenate([head.equity_dates, tail.equity_dates[keep]])
+    equity = np.concatenate([head.equity, tail.equity[keep]])
+    positions = np.concatenate([head.positions, tail.positions[keep]])
+    series = {name: np.concatenate([getattr(head, name), getattr(tail, name)[keep]])
+              for name in ('opens', 'highs', 'lows', 'closes')}
+    trades = head.trades + tail.trades
+
+    result = replace(
+        tail,
+        equity_dates=equity_dates,
+        equity=equity,
+        positions=positions,
+        trades=trades,
+        metrics=compute_metrics('daily', start_cash, equity, positions, series['closes'], equity_dates, trades),
+        **series,
+    )
+    return result, strat
+
+
+def _resume_point(snapshot, stock_data, start_date, end_date, params):
+    """
+    判断快照能否用于续跑，并计算预热起点
+
+    预热区间需要让均线交叉指标在快照日期处的状态与完整回测一致：
+    均线需要完整的慢线周期窗口，交叉指标的“最近非零差值”需要追溯到最近一次快慢线不相等的K线
+
+    返回:
+        datetime: 预热起始日期；快照不可用时返回None
+    """
+    if snapshot is None:
+        return None
+    last_date = snapshot['last_date']
+    if end_date < last_date:
+        return None
+
+    dates = stock_data.index
+    last_idx = dates.searchsorted(last_date)
+    if last_idx >= len(dates) or dates[last_idx] != last_date:
+        return None
+    # 快照之前的行情被修改（如复权因子变化）时，快照失效
+    if data_fingerprint(stock_data.iloc[:last_idx + 1]) != snapshot['prefix_fingerprint']:
+        return None
+
+    first_idx = dates.searchsorted(start_date)
+    if not params['use_sma_crossover']:
+        return dates[last_idx].to_pydatetime()
+
+    fast, slow = int(params['fast_maperiod']), int(params['slow_maperiod'])
+    # 完整回测中交叉指标第一次取值的位置，快照必须已经越过这里才能续跑
+    seed_idx = first_idx + slow - 1
+    if last_idx <= seed_idx:
+        return None
+
+    # 与backtrader的SimpleMovingAverage相同的算法（math.fsum），保证判断0值时完全一致
+    closes = stock_data['close'].to_numpy(dtype=np.float64)
+    anchor_idx = last_idx
+    while anchor_idx > seed_idx:
+        fast_sma = math.fsum(closes[anchor_idx - fast + 1:anchor_idx + 1]) / fast
+        slow_sma = math.fsum(closes[anchor_idx - slow + 1:anchor_idx + 1]) / slow
+        if fast_sma - slow_sma:
+            break
+        anchor_idx -= 1
+    # 快照日期当天必须执行策略逻辑（用于重新提交挂单），因此交叉指标最晚在前一根K线开始取值
+    anchor_idx = min(anchor_idx, last_idx - 1)
+    return dates[anchor_idx - slow + 1].to_pydatetime()
+
+
+def _snapshot_path(snapshot_dir, stock_code, params, start_date, start_cash):
+    """按策略代码版本和回测配置计算快照文件路径（不含结束日期）"""
+    payload = json.dumps(
+        {'version': strategy_version(), 'stock_code': stock_code, 'params': params,
+         'start': start_date, 'start_cash': start_cash},
+        sort_keys=True, default=_json_default
+    )
+    key = hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+    return os.path.join(snapshot_dir or get_cache_dir('snapshots'), key + '.pkl')
+
+
+def _load_snapshot(path):
+    """读取快照，不存在或损坏时返回None"""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"读取回测快照失败: {e}")
+        return None
+
+
+def _save_snapshot(path, stock_data, strat, result):
+    """
+    保存回测结束时的快照：账户现金与持仓、策略的买入价格与挂单、已处理行情的指纹以及回测结果
+    """
+    last_num = strat.datas[0].datetime[0]
+    last_date = bt.num2date(last_num)
+    last_idx = stock_data.index.searchsorted(last_date)
+
+    # 按提交顺序记录所有未成交的订单，以及策略当前引用的是哪一个
+    pending = [order for order in strat.broker.orders if order.alive()]
+    if strat.order is None or isinstance(strat.order, str):
+        current_order = strat.order
+    elif strat.order.alive():
+        current_order = pending.index(strat.order)
+    else:
+        current_order = 'blocked'
+
+    position = strat.broker.getposition(strat.datas[0])
+    snapshot = {
+        'last_date': datetime.combine(last_date.date(), last_date.time()),
+        'prefix_fingerprint': data_fingerprint(stock_data.iloc[:last_idx + 1]),
+        'state': {
+            'last_num': last_num,
+            'cash': strat.broker.getcash(),
+            'position': copy.copy(position),
+            'buy_price': strat.buy_price,
+            'pending_orders': [
+                {'side': 'buy' if order.isbuy() else 'sell', 'size': abs(order.created.size)}
+                for order in pending
+            ],
+            'current_order': current_order,
+        },
+        'result': result,
+    }
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"保存回测快照失败: {e}")
@@ -0,0 +1,326 @@
+"""
+股票量化交易回测系统 - 流式指标模块
+每根新K线到达时以常数时间更新的指标：简单均线（窗口精确求和）、指数均线、成交量均线、交叉状态和滚动最高/最低价，
+计算结果与backtrader对应指标的完整计算逐位相同（均线按 math.fsum 的舍入规则取值）。
+模块末尾的 StreamingSMA / StreamingCrossOver 把流式指标包装为backtrader指标，
+策略在回测（runonce）和模拟交易（逐根推送）中都只对新K线做一次常数时间的更新
+"""
+
+import math
+import operator
+from collections import deque
+
+import backtrader as bt
+
+
+class ExactWindowSum:
+    """
+    窗口内浮点数的精确和：每个数按二进制展开为整数累加（定点位数随输入自动扩大），
+    取值时只舍入一次，结果与 math.fsum 对同一窗口的计算完全相同；加入和移出都是常数时间
+    """
+
+    def __init__(self):
+        self._total = 0
+        self._shift = 0
+        # 窗口中 NaN/无穷大 的个数，不为0时无法精确表示，由调用方回退到 math.fsum
+        self.nonfinite = 0
+
+    def add(self, value, sign=1):
+        """
+        加入（sign=1）或移出（sign=-1）一个数
+
+        参数:
+            value (float): 数值
+            sign (int): 1 或 -1
+        """
+        if not math.isfinite(value):
+            self.nonfinite += sign
+            return
+        numerator, denominator = float(value).as_integer_ratio()
+        # 分母是2的幂，按最大的指数对齐为整数
+        exponent = denominator.bit_length() - 1
+        if exponent > self._shift:
+            self._total <<= exponent - self._shift
+            self._shift = exponent
+        self._total += sign * (numerator << (self._shift - exponent))
+
+    @property
+    def value(self):
+        """正确舍入的和（整数除法按IEEE就近舍入）"""
+        return self._total / (1 << self._shift)
+
+
+class RollingSMA:
+    """
+    简单移动平均：窗口满后每次更新为常数时间，结果与 bt.indicators.SimpleMovingAverage 相同
+
+    参数:
+        period (int): 均线周期
+    """
+
+    def __init__(self, period):
+        if period < 1:
+            raise ValueError("均线周期必须大于0")
+        self.period = period
+        self.value = None
+        self._window = deque()
+        self._sum = ExactWindowSum()
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, value):
+        """
+        加入一根K线的数值
+
+        参数:
+            value (float): 收盘价、成交量等
+
+        返回:
+            float: 最新的均线值，K线数不足一个周期时为None
+        """
+        value = float(value)
+        self._window.append(value)
+        self._sum.add(value)
+        if len(self._window) > self.period:
+            self._sum.add(self._window.popleft(), -1)
+        if len(self._window) < self.period:
+            return None
+        if self._sum.nonfinite:
+            self.value = math.fsum(self._window) / self.period
+        else:
+            self.value = self._sum.value / self.period
+        return self.value
+
+
+class RollingEMA:
+    """
+    指数移动平均：前 period 根K线的简单平均作为初始值，之后 ema = ema * (1 - alpha) + value * alpha，
+    结果与 bt.indicators.ExponentialMovingAverage 相同
+
+    参数:
+        period (int): 均线周期
+        alpha (float): 平滑系数，默认为 2 / (1 + period)
+    """
+
+    def __init__(self, period, alpha=None):
+        self.period = period
+        self.alpha = 2.0 / (1.0 + period) if alpha is None else alpha
+        self.alpha1 = 1.0 - self.alpha
+        self.value = None
+        self._seed = RollingSMA(period)
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, value):
+        """
+        加入一根K线的数值
+
+        返回:
+            float: 最新的均线值，K线数不足一个周期时为None
+        """
+        if self.value is None:
+            self.value = self._seed.update(value)
+        else:
+            self.value = self.value * self.alpha1 + float(value) * self.alpha
+        return self.value
+
+
+class _RollingExtreme:
+    """
+    滚动窗口最值：单调队列，每次更新均摊常数时间
+
+    子类设置 _dominates（新值严格优于队尾旧值时为真的比较函数）和 _builtin（窗口含NaN时使用的内置函数）
+    """
+
+    _dominates = None
+    _builtin = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls._dominates is None or cls._builtin is None:
+            raise TypeError(f"{cls.__name__} 必须设置 _dominates 和 _builtin")
+
+    def __init__(self, period):
+        if period < 1:
+            raise ValueError("窗口长度必须大于0")
+        self.period = period
+        self.value = None
+        self._count = 0
+        # (序号, 数值)，数值单调，队首为当前最值
+        self._candidates = deque()
+        # 窗口中 NaN 的序号；内置 max/min 遇到 NaN 的结果依赖顺序，此时按窗口重新计算
+        self._nans = deque()
+        self._window = deque(maxlen=period)
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, value):
+        """
+        加入一根K线的数值
+
+        返回:
+            float: 最近 period 根K线的最值，K线数不足时为None
+        """
+        value = float(value)
+        index = self._count
+        self._count += 1
+        self._window.append(value)
+        start = index - self.period + 1
+        if value != value:
+            self._nans.append(index)
+        else:
+            while self._candidates and self._dominates(value, self._candidates[-1][1]):
+                self._candidates.pop()
+            self._candidates.append((index, value))
+        while self._candidates and self._candidates[0][0] < start:
+            self._candidates.popleft()
+        while self._nans and self._nans[0] < start:
+            self._nans.popleft()
+        if self._count < self.period:
+            return None
+        if self._nans:
+            self.value = self._builtin(self._window)
+        else:
+            self.value = self._candidates[0][1]
+        return self.value
+
+
+class RollingMax(_RollingExtreme):
+    """
+    最近 period 根K线的最高值（如跟踪止损的最高价），结果与 bt.indicators.Highest 相同
+
+    参数:
+        period (int): 窗口长度
+    """
+
+    # 严格大于：相等的旧值保留在前面，与内置 max 返回第一个最大值一致
+    _dominates = staticmethod(operator.gt)
+    _builtin = staticmethod(max)
+
+
+class RollingMin(_RollingExtreme):
+    """
+    最近 period 根K线的最低值，结果与 bt.indicators.Lowest 相同
+
+    参数:
+        period (int): 窗口长度
+    """
+
+    _dominates = staticmethod(operator.lt)
+    _builtin = staticmethod(min)
+
+
+class CrossOverState:
+    """
+    两条线的交叉状态：记住最后一个不为0的差值，与 bt.indicators.CrossOver 的判断相同
+
+    第一次更新只记录初始差值（返回None），之后返回 1.0（上穿）、-1.0（下穿）或 0.0
+    """
+
+    def __init__(self):
+        self.value = None
+        self._last_diff = None
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, value, other):
+        """
+        加入一根K线上两条线的值
+
+        参数:
+            value (float): 第一条线，如快速均线或价格
+            other (float): 第二条线，如慢速均线
+
+        返回:
+            float: 交叉信号，初始K线为None
+        """
+        diff = value - other
+        previous = self._last_diff
+        # 差值为0时沿用上一个不为0的差值（NaN视为不为0）
+        self._last_diff = diff if diff or previous is None else previous
+        if previous is None:
+            return None
+        up = previous < 0.0 and value > other
+        down = previous > 0.0 and value < other
+        self.value = float(up) - float(down)
+        return self.value
+
+
+class StreamingSMA(bt.Indicator):
+    """
+    基于 RollingSMA 的backtrader简单均线，数值与 bt.indicators.SimpleMovingAverage 相同；
+    批量回测时按数组逐根更新，实时推送时每根新K线只做一次常数时间的更新
+
+    参数:
+        period (int): 均线周期
+    """
+
+    lines = ('sma',)
+    params = (('period', 30),)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        self._sma = RollingSMA(self.p.period)
+        # 输入是其他指标时，其预热期内的值为NaN，不计入窗口
+        self._first = self.data._minperiod - 1
+
+    def prenext(self):
+        if len(self) - 1 >= self._first:
+            self._sma.update(self.data[0])
+
+    def next(self):
+        self.lines.sma[0] = self._sma.update(self.data[0])
+
+    def preonce(self, start, end):
+        src = self.data.array
+        for i in range(max(start, self._first), end):
+            self._sma.update(src[i])
+
+    def once(self, start, end):
+        src = self.data.array
+        dst = self.lines.sma.array
+        update = self._sma.update
+        for i in range(start, end):
+            dst[i] = update(src[i])
+
+
+class StreamingCrossOver(bt.Indicator):
+    """
+    基于 CrossOverState 的backtrader交叉指标，数值与 bt.indicators.CrossOver 相同：
+    1.0 表示第一条线上穿第二条线，-1.0 表示下穿
+    """
+
+    lines = ('crossover',)
+
+    def __init__(self):
+        # 两条线都有值的第一根K线只记录初始差值
+        self.addminperiod(2)
+        self._state = CrossOverState()
+        self._first = self._minperiod - 2
+
+    def prenext(self):
+        if len(self) - 1 >= self._first:
+            self._state.update(self.data0[0], self.data1[0])
+
+    def next(self):
+        self.lines.crossover[0] = self._state.update(self.data0[0], self.data1[0])
+
+    def preonce(self, start, end):
+        src0, src1 = self.data0.array, self.data1.array
+        for i in range(max(start, self._first), end):
+            self._state.update(src0[i], src1[i])
+
+    def once(self, start, end):
+        src0, src1 = self.data0.array, self.data1.array
+        dst = self.lines.crossover.array
+        update = self._state.update
+        for i in range(start, end):
+            dst[i] = update(src0[i], src1[i])
@@ -0,0 +1,238 @@
+"""
+股票量化交易回测系统 - 后台任务模块
+图形界面的回测任务提交到常驻的进程池执行（工作进程启动时已导入backtrader和回测模块），
+界面线程定时调用 poll 获取实际进度（已处理K线数/总K线数）和结果，任务可以在排队或运行中取消。
+回测模块（backtrader、akshare）只在工作进程中导入，界面进程导入本模块不增加启动时间
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+# 回测类型 -> src.core.backtest 中的回测函数名
+_JOB_FUNCTIONS = {'daily': 'run_daily_backtest', 'ticks': 'run_ticks_backtest'}
+# 取消标志槽位数，任务按编号循环使用
+_CANCEL_SLOTS = 1024
+
+# 工作进程中的进度队列和取消标志，由进程池初始化函数设置
+_progress_queue = None
+_cancel_flags = None
+
+
+def _init_worker(progress_queue, cancel_flags, log_settings):
+    # 在工作进程启动时导入回测模块，第一次回测不必等待导入
+    import src.core.backtest  # noqa: F401
+    from src.core.timing import set_timing_log
+    from src.core.tradelog import configure_trade_log
+
+    global _progress_queue, _cancel_flags
+    _progress_queue = progress_queue
+    _cancel_flags = cancel_flags
+    configure_trade_log(**log_settings)
+    # 阶段耗时随结果返回，由界面合并报告展示和绘图的耗时后统一写日志
+    set_timing_log(None)
+
+
+def _mp_context():
+    """
+    工作进程的启动方式：支持时使用 forkserver。界面进程中有加载代码表、预热自选股等后台线程，
+    直接 fork 会把其他线程正持有的锁（导入锁、logging、pandas 内部的锁）复制到工作进程中；
+    forkserver 从一个单独启动、没有其他线程的服务进程 fork 工作进程
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context()
+    return multiprocessing.get_context('forkserver')
+
+
+def _warm_up():
+    """空任务，用于提前启动工作进程"""
+    return os.getpid()
+
+
+def _run_job(job_id, kind, kwargs):
+    """在工作进程中执行一个回测任务"""
+    from src.core import backtest
+    from src.core.progress import JobCancelled, report_progress
+
+    slot = job_id % _CANCEL_SLOTS
+    if _cancel_flags[slot]:
+        raise JobCancelled()
+
+    def callback(done, total):
+        _progress_queue.put((job_id, done, total))
+
+    with report_progress(callback, cancelled=lambda: _cancel_flags[slot]):
+        return getattr(backtest, _JOB_FUNCTIONS[kind])(**kwargs)
+
+
+@dataclass
+class Job:
+    """
+    后台回测任务
+
+    属性:
+        job_id (int): 任务编号
+        kind (str): 回测类型，"daily" 或 "ticks"
+        state (str): queued（排队）、running（运行）、done（完成）、cancelled（已取消）、error（出错）
+        done (int): 已处理的K线数
+        total (int): 总K线数，未知时为None
+        result: 完成后的 BacktestResult，没有数据时为None
+        error (str): 出错时的错误信息
+    """
+
+    job_id: int
+    kind: str
+    future: object = field(repr=False)
+    on_progress: object = field(default=None, repr=False)
+    on_done: object = field(default=None, repr=False)
+    state: str = 'queued'
+    done: int = 0
+    total: int = None
+    result: object = field(default=None, repr=False)
+    error: str = None
+
+    @property
+    def fraction(self):
+        """完成比例（0~1），总K线数未知时为None"""
+        if not self.total:
+            return None
+        return min(self.done / self.total, 1.0)
+
+
+class JobManager:
+    """
+    后台回测任务管理器
+
+    回调（on_progress、on_done）只在调用 poll 的线程中执行，界面可以直接在回调中更新组件
+
+    参数:
+        max_workers (int): 工作进程数，默认为CPU核数
+    """
+
+    def __init__(self, max_workers=None):
+        from src.core.tradelog import trade_log_settings
+
+        self.max_workers = max_workers or os.cpu_count() or 1
+        context = _mp_context()
+        self._progress_queue = context.Queue()
+        self._cancel_flags = context.Array('b', _CANCEL_SLOTS, lock=False)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._progress_queue, self._cancel_flags, trade_log_settings()),
+        )
+        self._ids = itertools.count()
+        self._jobs = {}
+        # 提前启动全部工作进程，第一次回测不必等待进程启动和模块导入
+        for _ in range(self.max_workers):
+            self._executor.submit(_warm_up)
+
+    def submit(self, kind, kwargs, on_progress=None, on_done=None):
+        """
+        提交回测任务
+
+        参数:
+            kind: 回测类型，"daily" 或 "ticks"
+            kwargs: 传给 run_daily_backtest / run_ticks_backtest 的关键字参数
+            on_progress: 可选，进度回调 on_progress(job)
+            on_done: 可选，结束回调 on_done(job)，完成、取消和出错时都会调用
+
+        返回:
+            int: 任务编号
+        """
+        if kind not in _JOB_FUNCTIONS:
+            raise ValueError(f"未知的回测类型: {kind}")
+        job_id = next(self._ids)
+        self._cancel_flags[job_id % _CANCEL_SLOTS] = 0
+        future = self._executor.submit(_run_job, job_id, kind, dict(kwargs))
+        self._jobs[job_id] = Job(job_id, kind, future, on_progress, on_done)
+        return job_id
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务直接移出队列，运行中的任务在下一个进度报告点结束
+
+        返回:
+            bool: 任务是否仍在进行（已结束的任务无法取消）
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        self._cancel_flags[job_id % _CANCEL_SLOTS] = 1
+        job.future.cancel()
+        return True
+
+    def active_jobs(self):
+        """尚未结束的任务列表，按提交顺序排列"""
+        return list(self._jobs.values())
+
+    def poll(self):
+        """
+        处理工作进程发来的进度和已结束的任务，调用对应回调
+
+        返回:
+            int: 尚未结束的任务数
+        """
+        # 工作进程抛出的 JobCancelled 在取结果时反序列化，此时进度模块已被导入
+        from src.core.progress import JobCancelled
+
+        updated = {}
+        while True:
+            try:
+                job_id, done, total = self._progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.state, job.done, job.total = 'running', done, total
+                updated[job_id] = job
+        # 同一任务在一次轮询中只回调一次最新进度
+        for job in updated.values():
+            if job.on_progress is not None:
+                job.on_progress(job)
+
+        for job_id, job in list(self._jobs.items()):
+            if job.state == 'queued' and job.future.running():
+                job.state = 'running'
+            if not job.future.done():
+                continue
+            del self._jobs[job_id]
+            try:
+                job.result = job.future.result()
+                job.state = 'done'
+                if job.result is not None and job.total:
+                    job.done = job.total
+            except (CancelledError, JobCancelled):
+                job.state = 'cancelled'
+            except Exception as e:
+                job.state = 'error'
+                job.error = str(e)
+            if job.on_done is not None:
+                job.on_done(job)
+        return len(self._jobs)
+
+    def shutdown(self):
+        """取消全部任务并关闭进程池"""
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_manager = None
+
+
+def get_job_manager(create=True):
+    """
+    获取进程内共享的任务管理器，第一次调用时创建并预热进程池
+
+    参数:
+        create: 尚未创建时是否创建，为False时返回None
+    """
+    global _manager
+    if _manager is None and create:
+        _manager = JobManager()
+    return _manager
@@ -0,0 +1,402 @@
+"""
+股票量化交易回测系统 - 模拟交易模块
+以事件驱动方式把行情源实时推送的K线逐根送入策略，由backtrader的模拟券商维护资金和持仓，
+并记录每根K线从到达到策略完成下单决策的延迟分布，用于评估策略在实时分钟行情上的单根K线开销
+"""
+
+import csv
+import json
+import queue
+import signal
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from datetime import datetime
+
+import backtrader as bt
+import numpy as np
+
+from src.core.backtest import (_add_result_analyzers, _collect_result, _create_engine, _daily_params,
+                               _ticks_params, _validate_sma_params)
+from src.core.strategy import DailyMA, SuperShortLineTrade
+
+# 延迟直方图的分桶上界（微秒），每个数量级分为 1/2/5 三档
+LATENCY_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+                      10000, 20000, 50000, 100000, 200000, 500000, 1000000)
+
+# 策略参数中由模拟交易模块控制、不对外暴露的参数
+_INTERNAL_PARAMS = ('start_date', 'end_date', 'resume_state')
+
+
+def parse_bar(record):
+    """
+    把行情源中的一条记录转换为K线字典
+
+    参数:
+        record: 包含 date（或 datetime）、open、high、low、close、volume 字段的字典，
+                时间为ISO格式字符串或datetime
+
+    返回:
+        dict: K线字典，时间字段统一为 datetime，价格和成交量为浮点数
+    """
+    dt = record.get('datetime', record.get('date'))
+    if not isinstance(dt, datetime):
+        dt = datetime.fromisoformat(str(dt))
+    return {
+        'datetime': dt,
+        'open': float(record['open']),
+        'high': float(record['high']),
+        'low': float(record['low']),
+        'close': float(record['close']),
+        'volume': float(record['volume']),
+    }
+
+
+class BarSource(ABC):
+    """
+    行情源基类
+
+    子类必须实现 bars()，按时间顺序逐根产出K线字典（见 parse_bar），行情结束时返回；
+    bars() 在独立线程中迭代，阻塞等待新行情不会影响策略线程
+    """
+
+    @abstractmethod
+    def bars(self):
+        """按时间顺序产出K线字典的迭代器"""
+
+    def close(self):
+        """释放行情源占用的资源（连接、文件等）"""
+
+
+class ReplayFileSource(BarSource):
+    """
+    本地回放文件行情源
+
+    支持CSV（表头包含 date/datetime、open、high、low、close、volume）和每行一个JSON对象的
+    JSON Lines 文件（扩展名 .jsonl 或 .json）
+
+    参数:
+        path (str): 回放文件路径
+        interval (float): 相邻两根K线的推送间隔（秒），为0时尽快推送
+    """
+
+    def __init__(self, path, interval=0.0):
+        self.path = path
+        self.interval = interval
+
+    def bars(self):
+        with open(self.path, encoding='utf-8', newline='') as f:
+            if self.path.endswith(('.jsonl', '.json')):
+                records = (json.loads(line) for line in f if line.strip())
+            else:
+                records = csv.DictReader(f)
+            for index, record in enumerate(records):
+                if index and self.interval > 0:
+                    time.sleep(self.interval)
+                yield parse_bar(record)
+
+
+class SocketSource(BarSource):
+    """
+    TCP行情源
+
+    连接行情服务后按行读取JSON格式的K线，服务端关闭连接时行情结束
+
+    参数:
+        host (str): 行情服务地址
+        port (int): 行情服务端口
+        timeout (float): 连接超时（秒）
+    """
+
+    def __init__(self, host, port, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+
+    def bars(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        # 连接建立后阻塞等待行情，不设读超时
+        self._sock.settimeout(None)
+        with self._sock.makefile('r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield parse_bar(json.loads(line))
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def serve_replay_file(path, host='127.0.0.1', port=9900, interval=1.0):
+    """
+    本地TCP行情服务，作为真实行情接口的替身：接受一个连接，按固定间隔推送回放文件中的K线，
+    每行一个JSON对象，推送完毕后关闭连接
+
+    参数:
+        path: 回放文件路径
+        host: 监听地址
+        port: 监听端口
+        interval: 推送间隔（秒）
+    """
+    with socket.create_server((host, port)) as server:
+        print(f"行情服务已启动: {host}:{port}，等待连接")
+        conn, address = server.accept()
+        print(f"客户端已连接: {address[0]}:{address[1]}")
+        with conn, conn.makefile('w', encoding='utf-8') as out:
+            for bar in ReplayFileSource(path, interval).bars():
+                out.write(json.dumps(dict(bar, datetime=bar['datetime'].isoformat())) + '\n')
+                out.flush()
+
+
+class QueueFeed(bt.feed.DataBase):
+    """
+    实时行情数据源
+
+    后台线程迭代行情源，把每根K线连同到达时间放入队列；backtrader在主线程中从队列取出K线
+    并驱动策略。暂时没有新K线时返回None，backtrader会继续轮询，行情源结束后回测正常结束
+
+    参数:
+        source (BarSource): 行情源
+        poll_interval (float): 等待新K线的最长时间（秒），超时后让引擎处理通知和停止请求
+    """
+
+    params = (
+        ('source', None),
+        ('poll_interval', 0.5),
+    )
+
+    def islive(self):
+        return True
+
+    def start(self):
+        super().start()
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._last_dt = None
+        self.error = None
+        # 当前K线到达和被引擎取出时的 perf_counter 时间
+        self.arrival = 0.0
+        self.loaded = 0.0
+        self._thread = threading.Thread(target=self._pump, name='paper-feed', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.p.source.close()
+        super().stop()
+
+    def request_stop(self):
+        """请求提前结束行情（可在任意线程调用）"""
+        self._stop_event.set()
+
+    def _pump(self):
+        try:
+            for bar in self.p.source.bars():
+                self._queue.put((time.perf_counter(), bar))
+                if self._stop_event.is_set():
+                    break
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.error = e
+        finally:
+            self._queue.put(None)
+
+    def haslivedata(self):
+        return not self._queue.empty()
+
+    def _load(self):
+        if self._stop_event.is_set():
+            return False
+        try:
+            item = self._queue.get(timeout=self.p.poll_interval)
+        except queue.Empty:
+            return None
+        if item is None:
+            return False
+
+        arrival, bar = item
+        dt = bar['datetime']
+        if self._last_dt is not None and dt <= self._last_dt:
+            # 重复或乱序的K线直接丢弃，策略只看到时间严格递增的行情
+            return None
+        self._last_dt = dt
+
+        self.arrival = arrival
+        self.lines.datetime[0] = bt.date2num(dt)
+        self.lines.open[0] = bar['open']
+        self.lines.high[0] = bar['high']
+        self.lines.low[0] = bar['low']
+        self.lines.close[0] = bar['close']
+        self.lines.volume[0] = bar['volume']
+        self.lines.openinterest[0] = 0.0
+        self.loaded = time.perf_counter()
+        return True
+
+
+class LatencyRecorder(bt.Analyzer):
+    """
+    决策延迟记录器
+
+    分析器在策略 next() 返回（本根K线的下单决策已经提交给券商）之后执行，
+    记录每根K线从到达到决策完成的总延迟，以及其中在队列中等待引擎取出的时间（微秒）
+    """
+
+    def start(self):
+        self.total = array('d')
+        self.queued = array('d')
+
+    def next(self):
+        now = time.perf_counter()
+        feed = self.strategy.datas[0]
+        self.total.append((now - feed.arrival) * 1e6)
+        self.queued.append((feed.loaded - feed.arrival) * 1e6)
+
+    def get_analysis(self):
+        return {
+            'total': latency_summary(self.total),
+            'queued': latency_summary(self.queued),
+        }
+
+
+def latency_summary(samples_us):
+    """
+    统计延迟分布
+
+    参数:
+        samples_us: 延迟样本（微秒）
+
+    返回:
+        dict: 样本数、均值、p50/p90/p99、最大值，以及按 LATENCY_BUCKETS_US 分桶的直方图
+              （键为桶上界，最后一个桶 "inf" 统计超过1秒的样本）
+    """
+    values = np.frombuffer(samples_us, dtype=np.float64) if isinstance(samples_us, array) \
+        else np.asarray(samples_us, dtype=np.float64)
+    if values.size == 0:
+        return {'count': 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    counts = np.bincount(np.searchsorted(LATENCY_BUCKETS_US, values), minlength=len(LATENCY_BUCKETS_US) + 1)
+    labels = [str(edge) for edge in LATENCY_BUCKETS_US] + ['inf']
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'p50': float(p50),
+        'p90': float(p90),
+        'p99': float(p99),
+        'max': float(values.max()),
+        'histogram': {label: int(count) for label, count in zip(labels, counts)},
+    }
+
+
+def format_histogram(summary, width=40):
+    """
+    把延迟统计格式化为文本直方图
+
+    参数:
+        summary: latency_summary 的返回值
+        width: 最长条形的字符数
+
+    返回:
+        str: 多行文本
+    """
+    if not summary.get('count'):
+        return "无延迟样本"
+    lines = [f"样本数: {summary['count']}  均值: {summary['mean']:.1f}us  p50: {summary['p50']:.1f}us  "
+             f"p90: {summary['p90']:.1f}us  p99: {summary['p99']:.1f}us  最大: {summary['max']:.1f}us"]
+    peak = max(summary['histogram'].values())
+    for label, count in summary['histogram'].items():
+        if count:
+            bar = '#' * max(1, round(count / peak * width))
+            lines.append(f"<= {label:>7}us {count:>8} {bar}")
+    return '\n'.join(lines)
+
+
+def _strategy_params(kind, strategy, params):
+    """
+    用与 run_daily_backtest / run_ticks_backtest 相同的规则整理策略参数，未给出的参数使用策略默认值；
+    日K线策略未给出均线买卖笔数时分别沿用止盈/止损笔数
+
+    异常:
+        ValueError: 包含策略不支持的参数，或均线参数不合法
+    """
+    merged = {name: value for name, value in strategy.params._getitems() if name not in _INTERNAL_PARAMS}
+    if kind == 'daily':
+        merged.update(sma_buy_size=None, sma_sell_size=None)
+    unknown = set(params or {}) - set(merged)
+    if unknown:
+        raise ValueError(f"不支持的策略参数: {', '.join(sorted(unknown))}")
+    merged.update(params or {})
+    if kind == 'daily':
+        _validate_sma_params(merged['use_sma_crossover'], merged['fast_maperiod'], merged['slow_maperiod'])
+        return _daily_params(**merged)
+    return _ticks_params(**merged)
+
+
+def run_paper_trading(kind, source, params=None, start_cash=100000, stock_code='', poll_interval=0.5):
+    """
+    执行模拟交易
+
+    行情源逐根推送K线，策略按到达顺序实时决策，订单由模拟券商在下一根K线撮合成交，
+    行情源结束（或在主线程中按 Ctrl+C）时结束并返回结果。引擎使用有界行缓冲，
+    长时间运行时内存不随K线数量增长
+
+    参数:
+        kind: "daily"（DailyMA）或 "ticks"（SuperShortLineTrade，K线为实际分钟时间）
+        source: 行情源（BarSource）
+        params: 策略参数，未给出的参数使用策略默认值
+        start_cash: 初始资金
+        stock_code: 股票代码，仅用于结果展示
+        poll_interval: 等待新K线的最长时间（秒）
+
+    返回:
+        tuple: (BacktestResult 模拟交易结果，没有收到任何K线时为None, dict 决策延迟统计)
+
+    异常:
+        ValueError: 回测类型或策略参数不支持
+        Exception: 行情源读取失败时重新抛出该异常
+    """
+    if kind == 'daily':
+        strategy, timeframe = DailyMA, bt.TimeFrame.Days
+    elif kind == 'ticks':
+        strategy, timeframe = SuperShortLineTrade, bt.TimeFrame.Minutes
+    else:
+        raise ValueError(f"不支持的回测类型: {kind}")
+
+    full_params = _strategy_params(kind, strategy, params)
+
+    engine = _create_engine(lean=True, keep_engine=False)
+    feed = QueueFeed(source=source, poll_interval=poll_interval, timeframe=timeframe)
+    engine.adddata(feed)
+    engine.addstrategy(strategy, **full_params)
+    if kind == 'ticks':
+        engine.broker.setcommission(commission=0.005)
+    engine.broker.setcash(start_cash)
+    _add_result_analyzers(engine)
+    engine.addanalyzer(LatencyRecorder, _name='latency')
+
+    # 在主线程中运行时，Ctrl+C 只请求结束行情，已有的模拟交易结果照常返回
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: feed.request_stop())
+    try:
+        strat = engine.run()[0]
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+
+    if feed.error is not None:
+        raise feed.error
+
+    latency = strat.analyzers.latency.get_analysis()
+    equity = strat.analyzers.equity.get_analysis()
+    if equity['nums'].size == 0:
+        return None, latency
+
+    start = bt.num2date(equity['nums'][0])
+    end = bt.num2date(equity['nums'][-1])
+    result = _collect_result(kind, stock_code, strat, engine, start, end, start_cash, full_params,
+                             keep_engine=False)
+    return result, latency
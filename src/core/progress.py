@@ -0,0 +1,69 @@
+"""
+股票量化交易回测系统 - 回测进度模块
+在回测引擎内部按已处理的K线数量报告进度，并在报告点检查取消请求；
+没有登记进度回调时不添加任何分析器，回测没有额外开销
+"""
+
+import contextlib
+import contextvars
+
+import backtrader as bt
+
+# 当前上下文登记的 (进度回调, 取消检查函数, 报告次数)
+_current_reporter = contextvars.ContextVar('progress_reporter', default=None)
+# 总K线数未知（未预加载）时的报告间隔
+_UNKNOWN_TOTAL_EVERY = 50
+
+
+class JobCancelled(Exception):
+    """回测被取消"""
+
+
+@contextlib.contextmanager
+def report_progress(callback, cancelled=None, steps=100):
+    """
+    在语句块内执行的回测按进度调用回调
+
+    参数:
+        callback: 进度回调 callback(已处理K线数, 总K线数)，总数未知时为None
+        cancelled: 可选，无参数函数，返回True时在下一个报告点抛出 JobCancelled 结束回测
+        steps: 整个回测期间大约报告的次数
+    """
+    token = _current_reporter.set((callback, cancelled, steps))
+    try:
+        yield
+    finally:
+        _current_reporter.reset(token)
+
+
+def progress_active():
+    """当前上下文是否登记了进度回调"""
+    return _current_reporter.get() is not None
+
+
+class ProgressReporter(bt.Analyzer):
+    """
+    进度报告分析器
+
+    每处理约 1/steps 的K线调用一次进度回调；预加载行情时总K线数在开始运行前已知
+    """
+
+    def start(self):
+        self._callback, self._cancelled, steps = _current_reporter.get()
+        data = self.strategy.datas[0]
+        self.total = data.buflen() if self.strategy.env._dopreload else None
+        self.every = max(1, self.total // steps) if self.total else _UNKNOWN_TOTAL_EVERY
+        self.done = 0
+
+    def next(self):
+        self.done += 1
+        if self.done % self.every == 0:
+            self._report()
+
+    def stop(self):
+        self._report()
+
+    def _report(self):
+        if self._cancelled is not None and self._cancelled():
+            raise JobCancelled()
+        self._callback(self.done, self.total)
@@ -0,0 +1,177 @@
+"""
+股票量化交易回测系统 - 回测结果模块
+定义紧凑、可序列化（pickle）的回测结果对象，回测报告文本只在需要时由结果对象生成
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+
+@dataclass
+class BacktestResult:
+    """
+    回测结果
+
+    只保存数值指标、策略参数、资金曲线和成交记录，不持有回测引擎，
+    可以低成本地在进程间传递或大量缓存
+
+    属性:
+        kind (str): 回测类型，"daily"（日K）或 "ticks"（分时）
+        stock_code (str): 股票代码
+        start (datetime): 回测开始时间
+        end (datetime): 回测结束时间
+        start_cash (float): 初始资金
+        final_value (float): 回测结束时的总资产
+        params (dict): 策略参数
+        metrics (dict): 绩效指标，如最大回撤、交易次数、夏普比率，由 analytics.compute_metrics 计算
+        equity_dates (ndarray): 资金曲线时间（datetime64）
+        equity (ndarray): 每个周期的账户总资产
+        positions (ndarray): 每个周期的持仓数量
+        opens (ndarray): 每个周期的开盘价
+        highs (ndarray): 每个周期的最高价
+        lows (ndarray): 每个周期的最低价
+        closes (ndarray): 每个周期的收盘价，用于计算买入持有收益
+        trades (list): 成交记录，每条为包含时间、方向、价格、数量和手续费的字典
+        timings (dict): 本次调用各阶段的耗时（秒），如行情获取、数据载入、策略运行
+        engine: 可选的回测引擎实例，仅在调用方明确要求时保留，不参与序列化
+    """
+
+    kind: str
+    stock_code: str
+    start: datetime
+    end: datetime
+    start_cash: float
+    final_value: float
+    params: dict
+    metrics: dict = field(default_factory=dict)
+    equity_dates: np.ndarray = field(default_factory=lambda: np.empty(0, dtype='datetime64[s]'), repr=False)
+    equity: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    positions: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    opens: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    highs: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    lows: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    closes: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    trades: list = field(default_factory=list, repr=False)
+    timings: dict = field(default_factory=dict, repr=False, compare=False)
+    engine: object = field(default=None, repr=False, compare=False)
+
+    def __getstate__(self):
+        # 回测引擎体积大且无法跨进程使用，序列化时丢弃
+        state = self.__dict__.copy()
+        state['engine'] = None
+        return state
+
+    @property
+    def pnl(self):
+        """净收益"""
+        return self.final_value - self.start_cash
+
+    @property
+    def return_pct(self):
+        """收益率（百分比）"""
+        return self.pnl / self.start_cash * 100
+
+    def to_dict(self, include_series=False):
+        """
+        转换为可直接序列化为JSON的字典
+
+        参数:
+            include_series (bool): 是否包含资金曲线和成交记录
+
+        返回:
+            dict: 结果字典
+        """
+        data = {
+            'kind': self.kind,
+            'stock_code': self.stock_code,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'start_cash': self.start_cash,
+            'final_value': self.final_value,
+            'pnl': self.pnl,
+            'return_pct': self.return_pct,
+            'params': self.params,
+            'metrics': self.metrics,
+            'timings': self.timings,
+        }
+        if include_series:
+            data['equity'] = {
+                'dates': np.datetime_as_string(self.equity_dates).tolist(),
+                'values': self.equity.tolist(),
+                'positions': self.positions.tolist(),
+                'opens': self.opens.tolist(),
+                'highs': self.highs.tolist(),
+                'lows': self.lows.tolist(),
+                'closes': self.closes.tolist(),
+            }
+            data['trades'] = [dict(trade, datetime=trade['datetime'].isoformat()) for trade in self.trades]
+        return data
+
+    def render_report(self):
+        """
+        生成中文回测报告文本
+
+        返回:
+            str: 回测报告
+        """
+        p = self.params
+        time_format = '%Y-%m-%d' if self.kind == 'daily' else '%Y-%m-%d %H:%M:%S'
+        lines = [
+            f"\n{'=' * 30} 回测报告 {'=' * 30}",
+            f"股票代码: {self.stock_code}",
+            f"回测时间: {self.start.strftime(time_format)} 至 {self.end.strftime(time_format)}",
+            f"初始资金: {self.start_cash:,.2f} 元",
+            f"总资金: {self.final_value:,.2f} 元",
+            f"净收益: {self.pnl:,.2f} 元",
+            f"收益率: {self.return_pct:.2f}%",
+        ]
+
+        # 添加策略参数信息
+        if self.kind == 'daily':
+            lines += _switch_lines('止盈', p['use_take_profit'], p['take_profit'], p['take_profit_size'])
+            lines += _switch_lines('止损', p['use_stop_loss'], p['stop_loss'], p['stop_loss_size'])
+            lines.append(f"均线交易: {'开启' if p['use_sma_crossover'] else '关闭'}")
+            if p['use_sma_crossover']:
+                lines.append(f"均线周期: 快线={p['fast_maperiod']}日 | 慢线={p['slow_maperiod']}日")
+                lines.append(f"均线买入笔数: {p['sma_buy_size']} 股 | 均线卖出笔数: {p['sma_sell_size']} 股")
+            else:
+                lines.append("均线功能已关闭")
+        else:
+            lines += _switch_lines('止盈', p['stop_by_profit'], p['profit_rate'], p['profit_size'])
+            lines += _switch_lines('止损', p['stop_by_loss'], p['loss_rate'], p['loss_size'])
+
+        # 添加绩效统计信息
+        drawdown_value = self.metrics.get('max_drawdown', 0.0)
+        if drawdown_value and float(drawdown_value) > 0:
+            lines.append(f"最大回撤: {float(drawdown_value):.2f}%")
+        else:
+            lines.append("最大回撤: N/A (未触发持仓变动)")
+        lines.append(f"交易次数: {self.metrics.get('trade_count', 0)} 次")
+        m = self.metrics
+        lines.append(f"胜率: {_format_metric(m.get('win_rate'), '.2f', '%')}")
+        lines.append(f"夏普比率: {_format_metric(m.get('sharpe'), '.2f')} | "
+                     f"索提诺比率: {_format_metric(m.get('sortino'), '.2f')}")
+        if self.kind == 'daily':
+            lines.append(f"年化收益率: {_format_metric(m.get('cagr'), '.2f', '%')}")
+        lines.append(f"持仓时间占比: {_format_metric(m.get('exposure'), '.2f', '%')}")
+        lines.append(f"买入持有收益率: {_format_metric(m.get('buy_hold_return'), '.2f', '%')} | "
+                     f"超额收益: {_format_metric(m.get('excess_return'), '+.2f', '%')}")
+        lines.append('=' * 70)
+        return '\n'.join(lines)
+
+
+def _switch_lines(name, enabled, rate, size):
+    """生成止盈/止损开关及参数的报告行"""
+    lines = [f"{name}功能: {'开启' if enabled else '关闭'}"]
+    if enabled:
+        lines.append(f"{name}比例: {rate * 100:.2f}% | {name}交易笔数: {size} 股")
+    else:
+        lines.append(f"{name}功能已关闭")
+    return lines
+
+
+def _format_metric(value, spec, suffix=''):
+    """格式化可能无法计算（为None）的绩效指标"""
+    return 'N/A' if value is None else f"{value:{spec}}{suffix}"
@@ -0,0 +1,241 @@
+"""
+股票量化交易回测系统 - 稳健性检验模块
+对一组策略参数做蒙特卡洛/自助法（bootstrap）检验：基于历史行情生成大量重采样价格路径，
+并随机推迟入场时间，在进程池中逐条回测，统计收益率、最大回撤和交易次数的分布
+"""
+
+import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time
+
+import numpy as np
+import pandas as pd
+
+from src.core.backtest import run_daily_backtest, run_ticks_backtest
+from src.core.data import get_single_stock_history_data, get_single_stock_ticks_data_transfer
+from src.core.shared_bars import SharedBarsRegistry, attach_bars
+from src.core.tradelog import SILENT, configure_trade_log
+
+# 工作进程内共享的基础行情与检验配置，由进程池初始化函数设置一次，避免每个任务重复传输
+_worker_state = {}
+
+
+def block_bootstrap_bars(stock_data, rng, block_size=20):
+    """
+    用移动块自助法（moving block bootstrap）生成一条重采样行情路径
+
+    对收盘价对数收益率按长度为 block_size 的连续块有放回抽样，保留块内的自相关结构；
+    开盘价、最高价、最低价按被抽中K线相对收盘价的比例还原，成交量取被抽中K线的成交量，
+    时间索引保持不变
+
+    参数:
+        stock_data: 原始行情数据
+        rng: numpy随机数生成器
+        block_size: 块长度（K线数）
+
+    返回:
+        DataFrame: 与原始数据格式一致的重采样行情
+    """
+    close = stock_data['close'].to_numpy(dtype=np.float64)
+    n_bars = len(close)
+    if n_bars < 3:
+        return stock_data.copy()
+
+    log_returns = np.diff(np.log(close))
+    n_returns = n_bars - 1
+    block_size = max(1, min(block_size, n_returns))
+
+    # 抽取块起点并拼接出与原序列等长的收益率下标序列
+    n_blocks = -(-n_returns // block_size)
+    starts = rng.integers(0, n_returns - block_size + 1, n_blocks)
+    source = (starts[:, None] + np.arange(block_size)[None, :]).ravel()[:n_returns]
+
+    new_close = np.empty(n_bars)
+    new_close[0] = close[0]
+    new_close[1:] = close[0] * np.exp(np.cumsum(log_returns[source]))
+
+    # 第 i 个收益率对应第 i+1 根K线，按该K线的形态还原其余价格
+    source_bars = np.r_[0, source + 1]
+    ratios = {
+        column: stock_data[column].to_numpy(dtype=np.float64)[source_bars] / close[source_bars]
+        for column in ('open', 'high', 'low')
+    }
+
+    path = pd.DataFrame({
+        'date': stock_data.index,
+        'open': new_close * ratios['open'],
+        'close': new_close,
+        'high': new_close * ratios['high'],
+        'low': new_close * ratios['low'],
+        'volume': stock_data['volume'].to_numpy(dtype=np.float64)[source_bars],
+    }, index=stock_data.index)
+    return path
+
+
+def _init_worker(state):
+    """进程池初始化：映射共享内存中的基础行情，保存检验配置，关闭策略日志"""
+    _worker_state.update(state)
+    _worker_state['stock_data'] = attach_bars(_worker_state.pop('bars'))
+    configure_trade_log(level=SILENT)
+
+
+def _run_path(path_index):
+    """
+    在工作进程中生成并回测一条路径
+
+    返回:
+        tuple: (收益率%, 最大回撤%, 交易次数, 入场延迟K线数)，回测没有结果时前三项为NaN
+    """
+    state = _worker_state
+    rng = np.random.default_rng([state['seed'], path_index])
+    path = block_bootstrap_bars(state['stock_data'], rng, state['block_size'])
+
+    # 随机推迟入场：丢弃路径开头的若干根K线，剩余K线数不少于均线参数的要求
+    max_delay = min(state['max_delay'], len(path) - state['required_bars'])
+    delay = int(rng.integers(0, max_delay + 1)) if max_delay > 0 else 0
+    path = path.iloc[delay:]
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = _run_once(state, path)
+    if result is None:
+        return np.nan, np.nan, np.nan, delay
+    return result.return_pct, result.metrics['max_drawdown'], result.metrics['trade_count'], delay
+
+
+def _run_once(state, stock_data):
+    """
+    不经过结果缓存、以精简模式回测一次：路径各不相同，缓存不会命中，只会增加哈希和写盘开销；
+    检验只读取收益率和统计指标，不需要绘图缓冲
+    """
+    if state['kind'] == 'daily':
+        return run_daily_backtest(
+            stock_code=state['stock_code'], stock_data=stock_data, start_cash=state['start_cash'],
+            use_cache=False, lean=True, **state['params']
+        )
+    return run_ticks_backtest(
+        stock_code=state['stock_code'], stock_data=stock_data, date=state['trade_date'],
+        start_cash=state['start_cash'], use_cache=False, lean=True, **state['params']
+    )
+
+
+def _required_bars(kind, params):
+    """回测至少需要的K线数：最长的均线周期，加上交叉指标记录初始差值的一根；不使用均线时为1"""
+    if kind == 'daily':
+        if not params.get('use_sma_crossover'):
+            return 1
+        return max(params['fast_maperiod'], params['slow_maperiod']) + 1
+    return max(params['price_period'], params['volume_period']) + 1
+
+
+def summarize(values):
+    """
+    统计分布，忽略NaN（回测失败的路径）
+
+    参数:
+        values: 数值数组
+
+    返回:
+        dict: 均值、标准差、最小值、最大值及常用分位数，没有有效数值时各项为None
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return dict.fromkeys(('mean', 'std', 'min', 'p5', 'p25', 'p50', 'p75', 'p95', 'max'))
+    percentiles = np.percentile(values, [5, 25, 50, 75, 95])
+    return {
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'min': float(values.min()),
+        'p5': float(percentiles[0]),
+        'p25': float(percentiles[1]),
+        'p50': float(percentiles[2]),
+        'p75': float(percentiles[3]),
+        'p95': float(percentiles[4]),
+        'max': float(values.max()),
+    }
+
+
+def run_robustness(kind, stock_code, params, start_cash, n_paths=1000, block_size=20, max_delay=10,
+                   workers=None, seed=0, start_date=None, end_date=None, trade_date=None, stock_data=None):
+    """
+    执行稳健性检验
+
+    行情只获取一次：日K回测截取 [start_date, end_date] 区间，分时回测使用 trade_date 当天的分钟数据；
+    基础行情写入共享内存，工作进程初始化时按名称映射，之后每个任务只传递路径编号
+
+    参数:
+        kind: "daily"（DailyMA）或 "ticks"（SuperShortLineTrade）
+        stock_code: 股票代码
+        params: 策略参数（不含日期、初始资金）
+        start_cash: 初始资金
+        n_paths: 路径数量
+        block_size: 自助法块长度（K线数）
+        max_delay: 最大入场延迟（K线数），每条路径在 [0, max_delay] 中随机取值，延迟后剩余的K线数不少于均线参数的要求
+        workers: 工作进程数，默认为CPU核数
+        seed: 随机种子，相同种子得到相同的路径
+        start_date: 日K回测的开始日期
+        end_date: 日K回测的结束日期
+        trade_date: 分时回测的交易日期
+        stock_data: 可选，已获取的行情数据
+
+    返回:
+        dict: 原始行情的回测结果摘要，收益率、最大回撤、交易次数和入场延迟的分布统计（不含回测失败的路径），
+              以及失败的路径数
+
+    异常:
+        ValueError: 未找到行情数据，或回测区间内的K线数少于均线参数的要求
+    """
+    if stock_data is None:
+        if kind == 'daily':
+            stock_data = get_single_stock_history_data(stock_code)
+        else:
+            stock_data = get_single_stock_ticks_data_transfer(
+                stock_code, datetime.combine(trade_date, time(hour=9, minute=30)),
+                datetime.combine(trade_date, time(hour=15, minute=0)))
+    if stock_data.empty:
+        raise ValueError("未找到对应股票数据，请检查代码格式（A股6位数字代码）")
+    if kind == 'daily':
+        stock_data = stock_data.loc[start_date:end_date]
+        if stock_data.empty:
+            raise ValueError("所选日期范围内没有行情数据，请检查开始和结束日期")
+    required = _required_bars(kind, params)
+    if len(stock_data) < required:
+        raise ValueError(f"回测区间内只有 {len(stock_data)} 根K线，当前均线参数至少需要 {required} 根，"
+                         f"请扩大日期范围或减小均线周期")
+
+    state = dict(kind=kind, stock_code=stock_code, stock_data=stock_data, params=params, start_cash=start_cash,
+                 trade_date=trade_date, block_size=block_size, max_delay=max_delay, seed=seed,
+                 required_bars=required)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        baseline = _run_once(state, stock_data)
+    if baseline is None:
+        raise ValueError("原始行情回测没有结果，请检查行情数据和策略参数")
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, n_paths // (workers * 8))
+    # 基础行情写入共享内存，工作进程初始化时只传递句柄
+    worker_state = {key: value for key, value in state.items() if key != 'stock_data'}
+    with SharedBarsRegistry() as registry:
+        worker_state['bars'] = registry.acquire(stock_code, lambda: stock_data)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(worker_state,)) as executor:
+            outcomes = np.array(list(executor.map(_run_path, range(n_paths), chunksize=chunksize)))
+    returns = outcomes[:, 0][~np.isnan(outcomes[:, 0])]
+
+    return {
+        'kind': kind,
+        'stock_code': stock_code,
+        'params': params,
+        'n_paths': n_paths,
+        'block_size': block_size,
+        'max_delay': max_delay,
+        'seed': seed,
+        'baseline': baseline.to_dict(),
+        'return_pct': summarize(outcomes[:, 0]),
+        'max_drawdown': summarize(outcomes[:, 1]),
+        'trade_count': summarize(outcomes[:, 2]),
+        'delay': summarize(outcomes[:, 3]),
+        'failed_paths': int(np.isnan(outcomes[:, 0]).sum()),
+        'prob_loss': float(np.mean(returns < 0)) if returns.size else None,
+    }
@@ -0,0 +1,171 @@
+"""
+股票量化交易回测系统 - 全市场选股模块
+基于本地行情库，按 DailyMA 的信号条件（当日快慢均线金叉/死叉、距止损/止盈价的距离、成交量均线交叉）
+对全部股票做一次横截面扫描：每只股票只读取最近的一小段K线，多进程并行，每完成一批股票就输出匹配结果
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from src.core.store import get_store_dir, list_symbols, open_bars
+
+SIGNALS = ('golden_cross', 'death_cross', 'volume_cross')
+
+# 每个任务处理的股票数量，兼顾进程间通信开销和结果输出的及时性
+_CHUNK_SIZE = 64
+
+
+def _sma(values, period):
+    """简单移动平均，结果第 i 个值对应 values[i + period - 1]"""
+    return np.lib.stride_tricks.sliding_window_view(values, period).mean(axis=1)
+
+
+def _crossovers(diff):
+    """
+    与backtrader的CrossOver指标一致的交叉判断：
+    当前差值为正（负）且上一个非零差值为负（正）时记为上穿（下穿）
+
+    参数:
+        diff: 快线减慢线的差值序列
+
+    返回:
+        tuple: (上穿布尔数组, 下穿布尔数组)，第 i 个值对应 diff[i + 1]
+    """
+    sign = np.sign(diff)
+    # 把0值替换为之前最近一个非零值
+    index = np.where(sign != 0, np.arange(sign.size), 0)
+    np.maximum.accumulate(index, out=index)
+    last_nonzero = sign[index]
+    up = (last_nonzero[:-1] < 0) & (diff[1:] > 0)
+    down = (last_nonzero[:-1] > 0) & (diff[1:] < 0)
+    return up, down
+
+
+def evaluate_bars(bars, fast_maperiod=5, slow_maperiod=30, volume_period=5, stop_loss=0.95, take_profit=1.1):
+    """
+    计算一只股票在最后一根K线上的信号
+
+    买入价按 DailyMA 的成交方式估算：最近一次金叉的下一根K线开盘价；
+    金叉发生在最后一根K线上时尚未成交，用当日收盘价估算
+
+    参数:
+        bars: BAR_DTYPE 结构化数组（按时间排列的最近若干根K线）
+        fast_maperiod: 快速均线周期
+        slow_maperiod: 慢速均线周期
+        volume_period: 成交量均线周期
+        stop_loss: 止损比例
+        take_profit: 止盈比例
+
+    返回:
+        dict: 信号与指标，K线数量不足时返回None
+    """
+    if len(bars) < max(slow_maperiod, volume_period) + 1:
+        return None
+    close = np.asarray(bars['close'], dtype=np.float64)
+    volume = np.asarray(bars['volume'], dtype=np.float64)
+
+    fast_sma = _sma(close, fast_maperiod)[-(close.size - slow_maperiod + 1):]
+    slow_sma = _sma(close, slow_maperiod)
+    up, down = _crossovers(fast_sma - slow_sma)
+    volume_up, _ = _crossovers(volume[volume_period - 1:] - _sma(volume, volume_period))
+
+    # 最近一次金叉之后没有死叉，视为持仓中
+    entry_price = stop_distance = target_distance = None
+    up_at = np.flatnonzero(up)
+    down_at = np.flatnonzero(down)
+    if up_at.size and (not down_at.size or up_at[-1] > down_at[-1]):
+        # up 的第 i 个值对应 close 的第 i + slow_maperiod 根K线
+        fill_at = up_at[-1] + slow_maperiod + 1
+        entry_price = float(bars['open'][fill_at]) if fill_at < close.size else float(close[-1])
+        stop_distance = (close[-1] / (entry_price * stop_loss) - 1) * 100
+        target_distance = (entry_price * take_profit / close[-1] - 1) * 100
+
+    return {
+        'date': str(np.datetime64(bars['date'][-1], 'D')),
+        'close': float(close[-1]),
+        'fast_sma': float(fast_sma[-1]),
+        'slow_sma': float(slow_sma[-1]),
+        'golden_cross': bool(up[-1]),
+        'death_cross': bool(down[-1]),
+        'volume_cross': bool(volume_up[-1]),
+        'entry_price': entry_price,
+        'stop_distance_pct': stop_distance,
+        'target_distance_pct': target_distance,
+    }
+
+
+def _matches(row, criteria):
+    if not all(row[signal] for signal in criteria['signals']):
+        return False
+    for key, limit in (('stop_distance_pct', criteria['near_stop']), ('target_distance_pct', criteria['near_target'])):
+        if limit is not None and (row[key] is None or not 0 <= row[key] <= limit):
+            return False
+    if criteria['as_of'] is not None and row['date'] < criteria['as_of']:
+        return False
+    return True
+
+
+def _screen_chunk(symbols, criteria):
+    """在工作进程中扫描一批股票，返回匹配的结果行"""
+    tail = criteria['lookback'] + max(criteria['slow_maperiod'], criteria['volume_period']) + 1
+    rows = []
+    for symbol in symbols:
+        bars = open_bars(symbol, criteria['store_dir'])
+        if bars is None:
+            continue
+        # 内存映射只读取最后 tail 根K线
+        row = evaluate_bars(np.array(bars[-tail:]), criteria['fast_maperiod'], criteria['slow_maperiod'],
+                            criteria['volume_period'], criteria['stop_loss'], criteria['take_profit'])
+        if row is not None and _matches(row, criteria):
+            rows.append(dict(symbol=symbol, **row))
+    return rows
+
+
+def screen_universe(signals=('golden_cross',), fast_maperiod=5, slow_maperiod=30, volume_period=5,
+                    stop_loss=0.95, take_profit=1.1, near_stop=None, near_target=None, as_of=None,
+                    lookback=250, symbols=None, workers=None, store_dir=None):
+    """
+    扫描本地行情库中的股票，产出满足全部条件的结果行
+
+    参数:
+        signals: 最后一根K线上必须出现的信号，可选 golden_cross、death_cross、volume_cross
+        fast_maperiod: 快速均线周期
+        slow_maperiod: 慢速均线周期
+        volume_period: 成交量均线周期
+        stop_loss: 止损比例
+        take_profit: 止盈比例
+        near_stop: 可选，持仓股票距止损价不超过该百分比
+        near_target: 可选，持仓股票距止盈价不超过该百分比
+        as_of: 可选，最后一根K线早于该日期（YYYY-MM-DD）的股票（如停牌）不参与匹配
+        lookback: 用于查找最近一次金叉（估算买入价）的K线数量
+        symbols: 可选，只扫描这些股票，默认为行情库中的全部股票
+        workers: 工作进程数，默认为CPU核数，为1时在当前进程中执行
+        store_dir: 可选，行情库目录
+
+    返回:
+        generator: 按完成顺序产出的结果行字典（含股票代码、日期、收盘价、均线、信号、买入价和止损/止盈距离）
+    """
+    unknown = [signal for signal in signals if signal not in SIGNALS]
+    if unknown:
+        raise ValueError(f"未知的信号: {', '.join(unknown)}")
+    store_dir = get_store_dir(store_dir)
+    if symbols is None:
+        symbols = list_symbols(store_dir)
+    criteria = dict(signals=tuple(signals), fast_maperiod=fast_maperiod, slow_maperiod=slow_maperiod,
+                    volume_period=volume_period, stop_loss=stop_loss, take_profit=take_profit,
+                    near_stop=near_stop, near_target=near_target, as_of=as_of, lookback=lookback,
+                    store_dir=store_dir)
+    chunks = [symbols[i:i + _CHUNK_SIZE] for i in range(0, len(symbols), _CHUNK_SIZE)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _screen_chunk(chunk, criteria)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_screen_chunk, chunk, criteria) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -0,0 +1,180 @@
+"""
+股票量化交易回测系统 - 共享内存行情模块
+多进程回测时由主进程把每只股票的K线数组写入一次共享内存，任务只传递共享内存名称和K线数，
+工作进程按名称映射同一块内存并直接在其上构造行情数据框（价格和成交量不复制），
+每个任务的启动开销与历史长度无关；共享内存按引用计数在最后一个任务结束后释放
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# 与 get_single_stock_history_data 一致的数值列顺序
+BAR_COLUMNS = ('open', 'close', 'high', 'low', 'volume')
+# 每个工作进程保留映射的共享内存段数量，同一股票的后续任务直接复用
+_ATTACH_CACHE_SIZE = 8
+
+# 工作进程中已映射的共享内存：名称 -> (SharedMemory, 行情数据框)
+_attached = OrderedDict()
+
+
+@dataclass(frozen=True)
+class SharedBars:
+    """
+    共享内存中一只股票的K线（传给工作进程的句柄，序列化后只有几十字节）
+
+    内存布局：K线时间（int64纳秒，n个）之后是 n×5 的float64数组（开、收、高、低、量）
+
+    属性:
+        name (str): 共享内存段名称
+        n_bars (int): K线数量
+        index_name (str): 时间索引名称
+    """
+
+    name: str
+    n_bars: int
+    index_name: str = None
+
+
+def _views(buf, n_bars):
+    dates = np.ndarray((n_bars,), dtype='M8[ns]', buffer=buf)
+    values = np.ndarray((n_bars, len(BAR_COLUMNS)), dtype=np.float64, buffer=buf, offset=n_bars * 8)
+    return dates, values
+
+
+def publish_bars(stock_data):
+    """
+    把行情数据写入新的共享内存段
+
+    参数:
+        stock_data: 以时间为索引、包含 open/close/high/low/volume 列的行情数据
+
+    返回:
+        tuple: (SharedMemory, SharedBars)，调用方负责在不再需要时 close 和 unlink
+    """
+    n_bars = len(stock_data)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n_bars * 8 * (1 + len(BAR_COLUMNS))))
+    dates, values = _views(shm.buf, n_bars)
+    dates[:] = stock_data.index.values.astype('M8[ns]')
+    values[:] = stock_data[list(BAR_COLUMNS)].to_numpy(dtype=np.float64)
+    # 释放对共享内存缓冲区的引用，否则 close 时报错
+    del dates, values
+    return shm, SharedBars(shm.name, n_bars, stock_data.index.name)
+
+
+def attach_bars(handle):
+    """
+    在工作进程中按句柄映射共享内存，返回与 get_single_stock_history_data 格式相同的行情数据框
+
+    数值列直接引用共享内存且为只读；同一进程中最近使用的若干段保持映射，重复的股票不再重新映射
+
+    参数:
+        handle: SharedBars 句柄
+
+    返回:
+        DataFrame: 包含 date、open、close、high、low、volume 列、以时间为索引的数据框
+    """
+    cached = _attached.get(handle.name)
+    if cached is not None:
+        _attached.move_to_end(handle.name)
+        return cached[1]
+
+    shm = shared_memory.SharedMemory(name=handle.name)
+    dates, values = _views(shm.buf, handle.n_bars)
+    dates.flags.writeable = False
+    values.flags.writeable = False
+    index = pd.DatetimeIndex(dates, name=handle.index_name)
+    frame = pd.DataFrame(values, index=index, columns=list(BAR_COLUMNS), copy=False)
+    frame.insert(0, 'date', index)
+
+    _attached[handle.name] = (shm, frame)
+    while len(_attached) > _ATTACH_CACHE_SIZE:
+        old_shm, _ = _attached.popitem(last=False)[1]
+        try:
+            old_shm.close()
+        except BufferError:
+            # 仍有任务引用该段的数据框，映射随对象回收时关闭
+            pass
+    return frame
+
+
+class SharedBarsRegistry:
+    """
+    主进程中的共享行情登记表：同一个键只获取和写入一次行情，按引用计数释放
+
+    用法:
+        with SharedBarsRegistry() as registry:
+            handle = registry.acquire(symbol, load)  # 每个任务提交前调用
+            ...
+            registry.release(symbol)                  # 任务结束后调用
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 键 -> [SharedMemory, SharedBars, 引用计数]；行情为空时前两项为None
+        self._entries = {}
+
+    def acquire(self, key, load):
+        """
+        增加引用；键第一次出现时调用 load() 获取行情并写入共享内存
+
+        参数:
+            key: 行情的键，如股票代码
+            load: 无参数函数，返回行情数据框
+
+        返回:
+            SharedBars: 共享行情句柄，行情为空时为None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] += 1
+                return entry[1]
+
+        stock_data = load()
+        shm, handle = publish_bars(stock_data) if stock_data is not None and not stock_data.empty else (None, None)
+        with self._lock:
+            self._entries[key] = [shm, handle, 1]
+        return handle
+
+    def release(self, key):
+        """减少引用，引用计数归零时释放共享内存"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[2] -= 1
+            if entry[2] > 0:
+                return
+            del self._entries[key]
+        self._free(entry[0])
+
+    @staticmethod
+    def _free(shm):
+        if shm is None:
+            return
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """释放全部共享内存（包括仍有引用的段），用于结束或出错时清理"""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for shm, _, _ in entries.values():
+            self._free(shm)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
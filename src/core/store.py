@@ -0,0 +1,287 @@
+"""
+股票量化交易回测系统 - 本地行情库模块
+把日K线行情按股票保存在本地缓存目录，每只股票一个numpy结构化数组文件（.npy），
+读取时使用内存映射，只访问需要的K线（如全市场选股只读最近几十根），不必载入完整历史。
+行情库同时作为数据缓存：最近一次收盘后写入的日K线视为最新（交易时段内写入的只短时间有效），已收盘交易日的分钟线按天保存，内容不再变化
+"""
+
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.core.cache import get_cache_dir
+from src.core.data import get_a_share_symbols, get_single_stock_history_data
+from src.utils.fast_use_util import validate_stock_code
+
+BAR_DTYPE = np.dtype([
+    ('date', 'M8[s]'),
+    ('open', 'f8'),
+    ('close', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('volume', 'f8'),
+])
+
+
+# 集合竞价开始的时间，此后到收盘后行情稳定之前获取的当日K线尚未收盘，会继续变化
+MARKET_OPEN = time(hour=9, minute=15)
+# 收盘后行情稳定的时间（留出数据源更新收盘数据的时间），此后获取的当日行情不再变化
+MARKET_SETTLED = time(hour=15, minute=5)
+# 完整交易时段，覆盖该时段的分钟线请求可以使用按天保存的缓存
+SESSION_OPEN = time(hour=9, minute=30)
+SESSION_CLOSE = time(hour=15, minute=0)
+# 交易时段内日K线（含未收盘的当日K线）缓存的有效时间（秒）
+INTRADAY_TTL = 60
+
+
+def last_market_close(now=None):
+    """
+    最近一次收盘（且行情已稳定）的时间，按工作日计算，不考虑节假日
+
+    参数:
+        now: 当前时间，默认为 datetime.now()
+
+    返回:
+        datetime: 收盘时间
+    """
+    now = now or datetime.now()
+    close = datetime.combine(now.date(), MARKET_SETTLED)
+    if now < close:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
+
+
+def get_store_dir(store_dir=None):
+    """
+    获取本地行情库目录
+
+    参数:
+        store_dir: 指定目录，为None时使用缓存目录下的 bars/daily
+
+    返回:
+        str: 目录路径
+    """
+    if store_dir is None:
+        return get_cache_dir('bars', 'daily')
+    os.makedirs(store_dir, exist_ok=True)
+    return store_dir
+
+
+def _bar_path(symbol, store_dir=None):
+    return os.path.join(get_store_dir(store_dir), f"{symbol}.npy")
+
+
+def save_bars(symbol, stock_data, store_dir=None):
+    """
+    保存一只股票的日K线行情（整体覆盖，先写临时文件再原子替换，读取方不会读到半个文件）
+
+    参数:
+        symbol: 股票代码
+        stock_data: get_single_stock_history_data 格式的行情数据
+        store_dir: 可选，行情库目录
+    """
+    _write_bars(_bar_path(symbol, store_dir), stock_data)
+
+
+def _write_bars(path, stock_data):
+    bars = np.empty(len(stock_data), dtype=BAR_DTYPE)
+    bars['date'] = stock_data.index.values.astype('M8[s]')
+    for column in ('open', 'close', 'high', 'low', 'volume'):
+        bars[column] = stock_data[column].to_numpy(dtype=np.float64)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, bars)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+
+
+def open_bars(symbol, store_dir=None):
+    """
+    以内存映射方式打开一只股票的K线数组，切片时才从磁盘读取对应部分
+
+    参数:
+        symbol: 股票代码
+        store_dir: 可选，行情库目录
+
+    返回:
+        ndarray: BAR_DTYPE 结构化数组（只读），行情库中没有该股票时返回None
+    """
+    try:
+        return np.load(_bar_path(symbol, store_dir), mmap_mode='r')
+    except FileNotFoundError:
+        return None
+
+
+def load_bars(symbol, store_dir=None):
+    """
+    读取一只股票的日K线行情
+
+    参数:
+        symbol: 股票代码
+        store_dir: 可选，行情库目录
+
+    返回:
+        DataFrame: 与 get_single_stock_history_data 格式一致的数据，没有数据时为空DataFrame
+    """
+    return _bars_frame(open_bars(symbol, store_dir))
+
+
+def _bars_frame(bars):
+    if bars is None:
+        return pd.DataFrame()
+    index = pd.DatetimeIndex(np.asarray(bars['date']).astype('M8[ns]'), name='date')
+    data = pd.DataFrame({column: np.array(bars[column]) for column in ('open', 'close', 'high', 'low', 'volume')},
+                        index=index)
+    data.insert(0, 'date', index)
+    return data
+
+
+def bars_updated(symbol, store_dir=None):
+    """
+    日K线最后写入行情库的时间
+
+    返回:
+        datetime: 写入时间，行情库中没有该股票时为None
+    """
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(_bar_path(symbol, store_dir)))
+    except FileNotFoundError:
+        return None
+
+
+def is_fresh(updated, now=None):
+    """
+    日K线是否已是最新：非交易时段内，最近一次收盘之后写入的日K线视为最新；
+    交易时段内当日K线不断变化，只有 INTRADAY_TTL 秒内写入的才视为最新。
+    盘中写入的日K线在收盘后早于最近一次收盘，随之过期
+
+    参数:
+        updated: 日K线写入时间，为None表示没有缓存
+        now: 当前时间，默认为 datetime.now()
+    """
+    if updated is None:
+        return False
+    now = now or datetime.now()
+    if now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_SETTLED:
+        return now - updated < timedelta(seconds=INTRADAY_TTL)
+    return updated >= last_market_close(now)
+
+
+def load_fresh_bars(symbol, store_dir=None):
+    """
+    读取行情库中已是最新的日K线
+
+    返回:
+        DataFrame: 最近一次收盘后写入过时返回行情数据，否则返回None
+    """
+    if not is_fresh(bars_updated(symbol, store_dir)):
+        return None
+    data = load_bars(symbol, store_dir)
+    return None if data.empty else data
+
+
+def _minute_path(symbol, trade_date, store_dir=None):
+    root = get_cache_dir('bars', 'minute') if store_dir is None else store_dir
+    os.makedirs(root, exist_ok=True)
+    return os.path.join(root, f"{symbol}_{trade_date:%Y%m%d}.npy")
+
+
+def full_session_date(start, end):
+    """
+    分钟线请求是否覆盖某个交易日的完整交易时段
+
+    参数:
+        start: 开始时间
+        end: 结束时间
+
+    返回:
+        date: 覆盖完整交易时段时为该交易日，否则为None
+    """
+    try:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+    except (TypeError, ValueError):
+        return None
+    if start.date() != end.date() or start.time() > SESSION_OPEN or end.time() < SESSION_CLOSE:
+        return None
+    return start.date()
+
+
+def is_session_settled(trade_date, now=None):
+    """该交易日是否已经收盘，收盘后的分钟线不再变化"""
+    return (now or datetime.now()) >= datetime.combine(trade_date, MARKET_SETTLED)
+
+
+def save_minute_bars(symbol, trade_date, stock_data, store_dir=None):
+    """
+    保存一只股票一个已收盘交易日的分钟线（真实时间索引）
+
+    参数:
+        symbol: 股票代码
+        trade_date: 交易日期
+        stock_data: get_single_stock_ticks_data_advanced 格式的分钟线
+        store_dir: 可选，分钟线目录，默认为缓存目录下的 bars/minute
+    """
+    _write_bars(_minute_path(symbol, trade_date, store_dir), stock_data)
+
+
+def has_minute_bars(symbol, trade_date, store_dir=None):
+    """本地是否已保存该交易日的分钟线（只检查文件是否存在）"""
+    return os.path.exists(_minute_path(symbol, trade_date, store_dir))
+
+
+def load_minute_bars(symbol, trade_date, store_dir=None):
+    """
+    读取本地保存的一个交易日的分钟线
+
+    返回:
+        DataFrame: 与 get_single_stock_ticks_data_advanced 格式一致的数据，没有保存过时返回None
+    """
+    try:
+        bars = np.load(_minute_path(symbol, trade_date, store_dir))
+    except FileNotFoundError:
+        return None
+    return _bars_frame(bars)
+
+
+def list_symbols(store_dir=None):
+    """
+    列出行情库中已保存的股票代码
+
+    返回:
+        list: 股票代码列表（已排序）
+    """
+    return sorted(name[:-4] for name in os.listdir(get_store_dir(store_dir)) if name.endswith('.npy'))
+
+
+def update_store(symbols=None, store_dir=None):
+    """
+    从数据源获取最新日K线并写入行情库，适合收盘后定时执行
+
+    参数:
+        symbols: 股票代码列表，为None时更新全部A股
+        store_dir: 可选，行情库目录
+
+    返回:
+        generator: 每处理一只股票产出 (股票代码, 是否成功)
+    """
+    if symbols is None:
+        symbols = get_a_share_symbols()
+    for symbol in symbols:
+        if not validate_stock_code(symbol):
+            yield symbol, False
+            continue
+        stock_data = get_single_stock_history_data(symbol, use_cache=False)
+        if stock_data.empty:
+            yield symbol, False
+            continue
+        save_bars(symbol, stock_data, store_dir)
+        yield symbol, True
@@ -1,10 +1,17 @@
 """
 股票量化交易回测系统 - 交易策略模块
 该模块定义了系统中使用的各种交易策略类
+均线和交叉指标使用 src.core.indicators 中的流式实现（数值与backtrader内置指标相同），
+模拟交易逐根推送K线时每根新K线只做常数时间的更新
 """
 
+import copy
+
 import backtrader as bt
 
+from src.core.indicators import StreamingCrossOver, StreamingSMA
+from src.core.tradelog import INFO, trade_log
+
 
 class DailyMA(bt.Strategy):
     """
@@ -26,6 +33,8 @@ class DailyMA(bt.Strategy):
         stop_loss_size (int): 止损交易笔数
         sma_buy_size (int): 均线买入交易笔数
         sma_sell_size (int): 均线卖出交易笔数
+        resume_state (dict): 增量回测的快照状态，为None时从头回测。
+            恢复时快照日期（含）之前的K线只用于预热指标，不做交易决策
     """
 
     params = (
@@ -41,7 +50,8 @@ class DailyMA(bt.Strategy):
         ("take_profit_size", 1000),
         ("stop_loss_size", 1000),
         ("sma_buy_size", 1000),
-        ("sma_sell_size", 1000)
+        ("sma_sell_size", 1000),
+        ("resume_state", None)
     )
 
     def __init__(self):
@@ -55,27 +65,65 @@ class DailyMA(bt.Strategy):
         # 如果启用均线交叉策略，则创建相应的均线指标
         if self.p.use_sma_crossover:
             # 计算快速均线
-            self.fast_sma = bt.indicators.SimpleMovingAverage(
+            self.fast_sma = StreamingSMA(
                 self.datas[0].close,
                 period=self.p.fast_maperiod
             )
             # 计算慢速均线
-            self.slow_sma = bt.indicators.SimpleMovingAverage(
+            self.slow_sma = StreamingSMA(
                 self.datas[0].close,
                 period=self.p.slow_maperiod
             )
             # 创建均线交叉指标
-            self.crossover = bt.indicators.CrossOver(self.fast_sma, self.slow_sma)
+            self.crossover = StreamingCrossOver(self.fast_sma, self.slow_sma)
+
+    def start(self):
+        """回测开始时调用，增量回测时从快照恢复账户持仓和策略状态"""
+        state = self.p.resume_state
+        if state is None:
+            return
+        self.broker.set_cash(state['cash'])
+        self.broker.positions[self.datas[0]] = copy.copy(state['position'])
+        self.buy_price = state['buy_price']
+
+    def _replay_warmup(self):
+        """
+        增量回测的预热阶段处理
 
-    def log(self, txt):
+        快照日期之前的K线只用于计算指标；在快照日期当天按原顺序重新提交快照时尚未成交的订单，
+        使其与完整回测一样在下一根K线成交
+
+        返回:
+            bool: 当前K线是否仍处于预热阶段
+        """
+        state = self.p.resume_state
+        current = self.datas[0].datetime[0]
+        if current > state['last_num']:
+            return False
+        if current == state['last_num']:
+            submitted = []
+            for pending in state['pending_orders']:
+                submit = self.buy if pending['side'] == 'buy' else self.sell
+                submitted.append(submit(size=pending['size']))
+            current_order = state['current_order']
+            if current_order is None or current_order == 'blocked':
+                # 'blocked' 表示快照时订单已失效但未被重置（如资金不足被拒），保持策略的阻塞状态
+                self.order = current_order
+            else:
+                self.order = submitted[current_order]
+        return True
+
+    def log(self, txt, *args, level=INFO):
         """
-        记录策略日志
+        记录策略日志，写入交易日志缓冲区；日志级别关闭时不做任何格式化
 
         参数:
-            txt (str): 日志内容
+            txt (str): 日志内容模板（str.format 格式）
+            args: 模板参数
+            level (int): 日志级别
         """
-        dt = self.datas[0].datetime.date(0)
-        print(f"{dt.isoformat()} - {txt}")
+        if trade_log.enabled(level):
+            trade_log.record(level, self.datas[0].datetime[0], 'DailyMA', txt, args)
 
     def notify_order(self, order):
         """
@@ -87,10 +135,10 @@ class DailyMA(bt.Strategy):
         # 判断订单是否完成
         if order.status in [order.Completed]:
             if order.isbuy():
-                self.log(f"已买入，价格: {order.executed.price:.2f}, 数量: {order.executed.size}")
+                self.log("已买入，价格: {:.2f}, 数量: {}", order.executed.price, order.executed.size)
                 self.buy_price = order.executed.price
             else:
-                self.log(f"已卖出，价格: {order.executed.price:.2f}, 数量: {order.executed.size}")
+                self.log("已卖出，价格: {:.2f}, 数量: {}", order.executed.price, order.executed.size)
             # 重置订单状态
             self.order = None
 
@@ -100,6 +148,10 @@ class DailyMA(bt.Strategy):
 
         根据均线交叉和止盈止损条件进行交易决策
         """
+        # 增量回测时，快照日期及之前的K线只用于预热
+        if self.p.resume_state is not None and self._replay_warmup():
+            return
+
         # 如果有未完成的订单，跳过循环0
         if self.order:
             return
@@ -177,32 +229,34 @@ class SuperShortLineTrade(bt.Strategy):
         # 初始化变量
         self.order = None        # 当前订单
         self.buy_price = None    # 买入价格
-        self.trades = []         # 交易记录
+        self.trades = []         # 交易记录（时间为backtrader日期数值，可用 bt.num2date 转换）
 
         # 创建价格均线和交叉指标
-        self.price_sma = bt.indicators.SimpleMovingAverage(
+        self.price_sma = StreamingSMA(
             self.data_price,
             period=self.p.price_period,
             plotname="price_sma"
         )
-        self.price_crossover = bt.indicators.CrossOver(self.data_price, self.price_sma)
+        self.price_crossover = StreamingCrossOver(self.data_price, self.price_sma)
 
         # 创建成交量均线和交叉指标
-        self.volume_sma = bt.indicators.SimpleMovingAverage(
+        self.volume_sma = StreamingSMA(
             self.data_volume,
             period=self.p.volume_period,
         )
-        self.volume_crossover = bt.indicators.CrossOver(self.data_volume, self.volume_sma)
+        self.volume_crossover = StreamingCrossOver(self.data_volume, self.volume_sma)
 
-    def log(self, txt):
+    def log(self, txt, *args, level=INFO):
         """
-        记录策略日志
+        记录策略日志，写入交易日志缓冲区；日志级别关闭时不做任何格式化
 
         参数:
-            txt (str): 日志内容
+            txt (str): 日志内容模板（str.format 格式）
+            args: 模板参数
+            level (int): 日志级别
         """
-        dt = self.datas[0].datetime.date(0)
-        print(f"{dt.isoformat()} - {txt}")
+        if trade_log.enabled(level):
+            trade_log.record(level, self.datas[0].datetime[0], 'SuperShortLineTrade', txt, args)
 
     def notify_order(self, order):
         """
@@ -217,25 +271,26 @@ class SuperShortLineTrade(bt.Strategy):
 
         # 判断订单是否完成
         if order.status in [order.Completed]:
-            dt = self.datas[0].datetime.datetime(0)
+            # 保存backtrader日期数值，不在每次成交时做日期转换和格式化
+            dt = self.datas[0].datetime[0]
 
             # 买入订单完成
             if order.isbuy():
                 self.buy_price = order.executed.price
-                self.log(f"买入: 价格={order.executed.price:.2f}, 数量={order.executed.size:.2f}")
+                self.log("买入: 价格={:.2f}, 数量={:.2f}", order.executed.price, order.executed.size)
                 # 记录交易
                 self.trades.append({
-                    'datetime': dt.strftime('%Y-%m-%d %H:%M:%S'),
+                    'datetime': dt,
                     'type': '买入',
                     'price': order.executed.price,
                     'size': order.executed.size
                 })
             # 卖出订单完成
             else:
-                self.log(f"卖出: 价格={order.executed.price:.2f}, 数量={order.executed.size:.2f}")
+                self.log("卖出: 价格={:.2f}, 数量={:.2f}", order.executed.price, order.executed.size)
                 # 记录交易
                 self.trades.append({
-                    'datetime': dt.strftime('%Y-%m-%d %H:%M:%S'),
+                    'datetime': dt,
                     'type': '卖出',
                     'price': order.executed.price,
                     'size': order.executed.size
@@ -276,11 +331,11 @@ class SuperShortLineTrade(bt.Strategy):
             # 止损逻辑
             if self.p.stop_by_loss and self.buy_price and current_price <= self.buy_price * self.p.loss_rate:
                 self.order = self.sell(size=self.p.loss_size)
-                self.log(f"卖出：止损 卖出股数：{self.p.loss_size} 当前价格：{current_price}")
+                self.log("卖出：止损 卖出股数：{} 当前价格：{}", self.p.loss_size, current_price)
             # 止盈逻辑
             elif self.p.stop_by_profit and self.buy_price and current_price >= self.buy_price * self.p.profit_rate:
                 self.order = self.sell(size=self.p.profit_size)
-                self.log(f"卖出：止盈 卖出股数：{self.p.profit_size} 当前价格：{current_price}")
+                self.log("卖出：止盈 卖出股数：{} 当前价格：{}", self.p.profit_size, current_price)
             # 价格均线卖出逻辑
             elif self.p.use_price_ma and self.price_crossover > 0:
                 self.order = self.sell(size=self.p.sell_size)
@@ -0,0 +1,263 @@
+"""
+股票量化交易回测系统 - 股票代码表模块
+全部A股的代码、名称、板块、上市日期和状态批量获取后保存在本地缓存目录，
+加载后按代码建立字典（校验和查询为O(1)），按代码、名称和拼音首字母建立有序索引（前缀查找为二分查找），
+界面输入代码时的自动补全和市场提示只查本地代码表，不访问网络
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import astuple, dataclass
+
+from src.core.cache import get_cache_dir
+from src.core.data import get_a_share_symbol_table
+
+# 代码前缀 -> (交易所, 板块)，先按3位前缀再按2位前缀查找
+BOARD_PREFIXES = {
+    '688': ('上海交易所', '科创板'),
+    '60': ('上海交易所', '上海主板'),
+    '000': ('深圳交易所', '深圳主板'),
+    '001': ('深圳交易所', '深圳主板'),
+    '003': ('深圳交易所', '深圳主板'),
+    '002': ('深圳交易所', '中小板'),
+    '300': ('深圳交易所', '创业板'),
+    '301': ('深圳交易所', '创业板'),
+}
+# 代码表超过该时间（秒）视为过期，由 ensure_symbol_master 重新获取
+MAX_AGE = 24 * 3600
+
+_master = None
+_master_lock = threading.Lock()
+
+
+def code_board(code):
+    """
+    按代码前缀判断交易所和板块
+
+    参数:
+        code: 6位股票代码
+
+    返回:
+        tuple: (交易所, 板块)，不是支持的A股代码时为None
+    """
+    if not code or len(code) != 6 or not code.isdigit():
+        return None
+    return BOARD_PREFIXES.get(code[:3]) or BOARD_PREFIXES.get(code[:2])
+
+
+def _pinyin_initials():
+    """返回 名称 -> 拼音首字母 的转换函数，未安装 pypinyin 时返回None"""
+    try:
+        from pypinyin import Style, lazy_pinyin
+    except ImportError:
+        print("未安装 pypinyin，股票代码表不支持拼音首字母搜索")
+        return None
+
+    def initials(name):
+        letters = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER))
+        return ''.join(c for c in letters if c.isalnum()).lower()
+
+    return initials
+
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    """
+    股票代码表中的一只股票
+
+    属性:
+        code (str): 6位股票代码
+        name (str): 股票简称
+        exchange (str): 交易所，未知时为空字符串
+        board (str): 板块，未知时为空字符串
+        list_date (str): 上市日期（YYYY-MM-DD），未知时为空字符串
+        status (str): "上市" 或 "退市"
+        pinyin (str): 简称的拼音首字母（小写），未安装 pypinyin 时为空字符串
+    """
+
+    code: str
+    name: str
+    exchange: str
+    board: str
+    list_date: str
+    status: str
+    pinyin: str
+
+
+class SymbolMaster:
+    """
+    已加载到内存的股票代码表
+
+    参数:
+        symbols: SymbolInfo 列表
+        updated (float): 获取时间（时间戳），未知时为None
+    """
+
+    def __init__(self, symbols=(), updated=None):
+        self.updated = updated
+        self._by_code = {info.code: info for info in symbols}
+        # 有序索引：(键, 代码)，二分查找定位前缀区间
+        self._codes = sorted(self._by_code)
+        self._names = sorted((info.name, info.code) for info in self._by_code.values())
+        self._pinyin = sorted((info.pinyin, info.code) for info in self._by_code.values() if info.pinyin)
+
+    def __len__(self):
+        return len(self._by_code)
+
+    def __contains__(self, code):
+        return code in self._by_code
+
+    def get(self, code):
+        """按代码查询，不存在时返回None"""
+        return self._by_code.get(code)
+
+    def is_valid(self, code, listed_only=False):
+        """
+        代码是否在代码表中
+
+        参数:
+            code: 6位股票代码
+            listed_only: 为True时已退市的股票视为无效
+        """
+        info = self._by_code.get(code)
+        return info is not None and (not listed_only or info.status == '上市')
+
+    def is_stale(self, max_age=MAX_AGE):
+        """代码表为空或获取时间超过 max_age 秒"""
+        return not self._by_code or self.updated is None or time.time() - self.updated > max_age
+
+    @staticmethod
+    def _prefix_range(keys, prefix, limit):
+        start = bisect.bisect_left(keys, (prefix,))
+        found = []
+        for key, code in keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            found.append(code)
+        return found
+
+    def search(self, text, limit=10):
+        """
+        按代码前缀、名称前缀或拼音首字母前缀查找股票，上市股票排在退市股票之前
+
+        参数:
+            text: 输入文本，如 "0000"、"平安"、"payh"
+            limit: 最多返回的数量
+
+        返回:
+            list: SymbolInfo 列表
+        """
+        text = text.strip()
+        if not text or limit <= 0:
+            return []
+        if text.isdigit():
+            start = bisect.bisect_left(self._codes, text)
+            codes = [code for code in self._codes[start:start + limit] if code.startswith(text)]
+        else:
+            codes = self._prefix_range(self._names, text, limit)
+            if text.isascii():
+                codes += self._prefix_range(self._pinyin, text.lower(), limit)
+        found = [self._by_code[code] for code in dict.fromkeys(codes)]
+        found.sort(key=lambda info: info.status != '上市')
+        return found[:limit]
+
+    def save(self, path):
+        """写入JSON文件，先写临时文件再原子替换"""
+        payload = {
+            'updated': self.updated,
+            'fields': list(SymbolInfo.__dataclass_fields__),
+            'symbols': [astuple(self._by_code[code]) for code in self._codes],
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        从JSON文件加载代码表
+
+        返回:
+            SymbolMaster: 文件不存在或格式不符时返回空代码表
+        """
+        try:
+            with open(path, encoding='utf-8') as f:
+                payload = json.load(f)
+            if payload.get('fields') != list(SymbolInfo.__dataclass_fields__):
+                return cls()
+            return cls([SymbolInfo(*row) for row in payload['symbols']], payload.get('updated'))
+        except FileNotFoundError:
+            return cls()
+        except Exception as e:
+            print(f"读取股票代码表失败: {e}")
+            return cls()
+
+
+def get_symbol_master_path():
+    """本地股票代码表文件路径（缓存目录下的 symbols/symbols.json）"""
+    return os.path.join(get_cache_dir('symbols'), 'symbols.json')
+
+
+def get_symbol_master():
+    """
+    获取进程内共享的股票代码表，第一次调用时从本地文件加载，不访问网络
+
+    返回:
+        SymbolMaster: 尚未获取过代码表时为空代码表
+    """
+    global _master
+    if _master is None:
+        with _master_lock:
+            if _master is None:
+                _master = SymbolMaster.load(get_symbol_master_path())
+    return _master
+
+
+def refresh_symbol_master():
+    """
+    从数据源批量获取全部A股代码表，保存到本地并替换进程内的代码表
+
+    返回:
+        SymbolMaster: 新代码表；获取失败时返回原有代码表
+    """
+    global _master
+    table = get_a_share_symbol_table()
+    if table.empty:
+        return get_symbol_master()
+
+    initials = _pinyin_initials()
+    symbols = []
+    for code, name, list_date, status in table[['code', 'name', 'list_date', 'status']].itertuples(index=False):
+        exchange, board = code_board(code) or ('', '')
+        symbols.append(SymbolInfo(code, name, exchange, board, list_date, status,
+                                  initials(name) if initials else ''))
+    master = SymbolMaster(symbols, updated=time.time())
+    try:
+        master.save(get_symbol_master_path())
+    except OSError as e:
+        print(f"保存股票代码表失败: {e}")
+    with _master_lock:
+        _master = master
+    return master
+
+
+def ensure_symbol_master(max_age=MAX_AGE):
+    """
+    本地代码表不存在或已过期时重新获取（访问网络，应在后台线程或命令行中调用）
+
+    返回:
+        SymbolMaster: 可用的代码表
+    """
+    master = get_symbol_master()
+    if master.is_stale(max_age):
+        master = refresh_symbol_master()
+    return master
@@ -0,0 +1,185 @@
+"""
+股票量化交易回测系统 - 阶段计时模块
+记录每次回测各阶段（结果缓存查询、行情获取、数据清洗、数据载入、策略运行、结果分析、报告展示、绘图数据生成、绘图）的耗时，
+计时可以在运行时开关；关闭时每个计时点只多一次变量判断
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime
+
+# 默认开启，可通过环境变量 QUANT_TRADING_TIMING=0 关闭，或在运行时调用 set_timing_enabled
+_enabled = os.environ.get('QUANT_TRADING_TIMING', '1') != '0'
+# 计时日志文件（JSON Lines），为None时不写日志
+_log_path = os.environ.get('QUANT_TRADING_TIMING_LOG') or None
+_log_lock = threading.Lock()
+
+# 当前线程（上下文）正在使用的计时器，各回测线程互不干扰
+_current_timer = contextvars.ContextVar('phase_timer', default=None)
+_null_phase = contextlib.nullcontext()
+
+
+def set_timing_enabled(enabled):
+    """开启或关闭阶段计时，对之后开始的回测生效"""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def timing_enabled():
+    """阶段计时是否开启"""
+    return _enabled
+
+
+def set_timing_log(path):
+    """
+    设置计时日志文件，每次回测追加一行JSON
+
+    参数:
+        path: 日志文件路径，为None时不写日志
+    """
+    global _log_path
+    _log_path = path
+
+
+class PhaseTimer:
+    """
+    阶段计时器
+
+    同一时刻只有一个阶段在计时，各阶段耗时互不重叠、按名称累计（秒）。
+    switch(name) 结束当前阶段并开始新阶段；phase(name) 在语句块内切换到另一个阶段，结束后回到原阶段
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._phase = None
+        self._began = 0.0
+
+    def switch(self, name):
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.timings[self._phase] = self.timings.get(self._phase, 0.0) + now - self._began
+        self._phase = name
+        self._began = now
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        previous = self._phase
+        self.switch(name)
+        try:
+            yield self
+        finally:
+            self.switch(previous)
+
+    def stop(self):
+        """结束当前阶段，返回各阶段耗时"""
+        self.switch(None)
+        return self.timings
+
+
+@contextlib.contextmanager
+def phase_timer():
+    """
+    开启当前上下文的阶段计时器；已有计时器时直接复用，嵌套调用的耗时计入外层
+
+    返回:
+        PhaseTimer: 计时器，计时关闭时为None
+    """
+    if not _enabled:
+        yield None
+        return
+    timer = _current_timer.get()
+    if timer is not None:
+        yield timer
+        return
+    timer = PhaseTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        timer.stop()
+        _current_timer.reset(token)
+
+
+def phase(name):
+    """
+    在当前计时器上记录一个阶段，用于 with 语句；没有计时器时返回空上下文
+
+    参数:
+        name: 阶段名称
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        return _null_phase
+    return timer.phase(name)
+
+
+def switch_phase(name):
+    """把当前计时器切换到新阶段，没有计时器时不做任何事"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.switch(name)
+
+
+def timing_active():
+    """当前上下文是否有正在运行的计时器"""
+    return _current_timer.get() is not None
+
+
+def log_timings(kind, stock_code, timings):
+    """
+    把一次回测的阶段耗时追加写入计时日志（未设置日志文件时不写）
+
+    参数:
+        kind: 回测类型
+        stock_code: 股票代码
+        timings: 各阶段耗时（秒）
+    """
+    if _log_path is None or not timings:
+        return
+    line = json.dumps({
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'kind': kind,
+        'stock_code': stock_code,
+        'total': sum(timings.values()),
+        'timings': timings,
+    }, ensure_ascii=False)
+    try:
+        with _log_lock, open(_log_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        print(f"写入计时日志失败: {e}")
+
+
+def timed_backtest(kind):
+    """
+    回测函数装饰器：为一次回测记录阶段耗时，附加到返回结果的 timings 属性上
+
+    被装饰函数内部通过 phase/switch_phase 标记阶段，未标记的部分计入 prepare 阶段。
+    在外层计时器（如页面线程）内调用时，耗时计入外层计时器，由外层负责写日志
+
+    参数:
+        kind: 回测类型，用于计时日志
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            nested = timing_active()
+            with phase_timer() as timer, timer.phase('prepare'):
+                result = func(*args, **kwargs)
+            if result is None:
+                return None
+            # 缓存命中时返回的是缓存中的共享对象，复制后再附加本次耗时
+            result = replace(result, timings=dict(timer.timings))
+            if not nested:
+                log_timings(kind, result.stock_code, result.timings)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,210 @@
+"""
+股票量化交易回测系统 - 交易日志模块
+策略回调中的成交和信号日志统一写入预分配的环形缓冲区，按级别过滤：
+级别关闭时策略只做一次整数比较，不做任何字符串格式化；开启日志文件时由后台线程异步批量写入
+"""
+
+import atexit
+import json
+import os
+import threading
+
+import backtrader as bt
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+SILENT = 100
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR', SILENT: 'SILENT'}
+_LEVELS_BY_NAME = {name.lower(): level for level, name in LEVEL_NAMES.items()}
+
+
+def parse_level(value):
+    """
+    解析日志级别
+
+    参数:
+        value: 级别数值，或 "debug"/"info"/"warning"/"error"/"silent"（不区分大小写，"off" 等同 silent）
+
+    返回:
+        int: 日志级别
+    """
+    if isinstance(value, int):
+        return value
+    name = str(value).strip().lower()
+    if name == 'off':
+        return SILENT
+    if name not in _LEVELS_BY_NAME:
+        raise ValueError(f"未知的日志级别: {value}")
+    return _LEVELS_BY_NAME[name]
+
+
+class TradeLog:
+    """
+    交易日志
+
+    每条记录保存为 (级别, backtrader日期数值, 来源, 消息模板, 模板参数) 元组，
+    放入容量固定的环形缓冲区，只在输出到控制台或写入文件时才格式化。
+    缓冲区写满时覆盖最旧的记录；写文件时后台线程来不及写出而被覆盖的记录计入 dropped
+
+    参数:
+        capacity (int): 环形缓冲区容量（记录条数）
+        level (int): 日志级别，低于该级别的记录直接丢弃
+        echo (bool): 是否同时立即打印到标准输出（与原来的 print 输出格式一致）
+        path (str): 日志文件路径（JSON Lines），为None时不写文件
+        flush_interval (float): 后台线程的最长写出间隔（秒）
+    """
+
+    def __init__(self, capacity=8192, level=INFO, echo=True, path=None, flush_interval=1.0):
+        self.capacity = capacity
+        self.level = level
+        self.echo = echo
+        self.path = None
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer = [None] * capacity
+        self._head = 0        # 已写入缓冲区的记录总数
+        self._flushed = 0     # 已写出（或被覆盖）的记录总数
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+        self.set_path(path)
+
+    def enabled(self, level):
+        """该级别的日志是否需要记录，策略应在格式化任何内容之前先调用"""
+        return level >= self.level
+
+    def record(self, level, dt_num, source, template, args=()):
+        """
+        写入一条记录
+
+        参数:
+            level: 日志级别
+            dt_num: 行情时间（backtrader日期数值）
+            source: 日志来源，如策略名称
+            template: 消息模板（str.format 格式）
+            args: 模板参数
+        """
+        if level < self.level:
+            return
+        if self.echo:
+            print(f"{bt.num2date(dt_num).date().isoformat()} - {template.format(*args)}")
+
+        with self._lock:
+            self._buffer[self._head % self.capacity] = (level, dt_num, source, template, args)
+            self._head += 1
+            pending = self._head - self._flushed
+            if pending > self.capacity:
+                # 只有写文件时被覆盖的记录才算丢失
+                if self.path is not None:
+                    self.dropped += pending - self.capacity
+                self._flushed = self._head - self.capacity
+                pending = self.capacity
+        if self.path is not None and pending >= self.capacity // 2:
+            self._wakeup.set()
+
+    def recent(self, count=100):
+        """
+        获取缓冲区中最近的记录（已格式化）
+
+        参数:
+            count: 最多返回的条数
+
+        返回:
+            list: 日志行列表，按时间先后排列
+        """
+        with self._lock:
+            count = min(count, self._head, self.capacity)
+            records = [self._buffer[i % self.capacity] for i in range(self._head - count, self._head)]
+        return [format_record(record) for record in records]
+
+    def set_path(self, path):
+        """设置日志文件，为None时停止写文件；切换前先写出已缓冲的记录"""
+        if self.path is not None:
+            self.flush()
+        with self._lock:
+            # 新文件只接收之后的记录
+            self._flushed = self._head
+        self.path = path
+        if path is not None and self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='trade-log-writer', daemon=True)
+            self._writer.start()
+
+    def flush(self):
+        """把缓冲区中尚未写出的记录同步写入日志文件"""
+        path = self.path
+        if path is None:
+            return
+        with self._lock:
+            records = [self._buffer[i % self.capacity] for i in range(self._flushed, self._head)]
+            self._flushed = self._head
+        if not records:
+            return
+        lines = ''.join(json.dumps(_record_dict(record), ensure_ascii=False) + '\n' for record in records)
+        try:
+            with self._file_lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        except OSError as e:
+            print(f"写入交易日志失败: {e}")
+
+    def _write_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def _record_dict(record):
+    level, dt_num, source, template, args = record
+    return {
+        'level': LEVEL_NAMES.get(level, str(level)),
+        'time': bt.num2date(dt_num).isoformat(),
+        'source': source,
+        'message': template.format(*args),
+    }
+
+
+def format_record(record):
+    """把一条记录格式化为 “日期 - 消息” 文本"""
+    level, dt_num, source, template, args = record
+    return f"{bt.num2date(dt_num).date().isoformat()} - {template.format(*args)}"
+
+
+# 进程内共享的交易日志，可通过环境变量 QUANT_TRADING_LOG_LEVEL / QUANT_TRADING_LOG_FILE 设置默认值
+trade_log = TradeLog(
+    level=parse_level(os.environ.get('QUANT_TRADING_LOG_LEVEL', 'info')),
+    path=os.environ.get('QUANT_TRADING_LOG_FILE') or None,
+)
+atexit.register(trade_log.flush)
+
+
+def configure_trade_log(level=None, echo=None, path=False):
+    """
+    修改交易日志设置，未传入的设置保持不变
+
+    批量回测、参数扫描时可设为 SILENT，策略日志几乎没有开销
+
+    参数:
+        level: 日志级别（数值或名称）
+        echo: 是否同时打印到标准输出
+        path: 日志文件路径，传入None关闭文件输出
+    """
+    if level is not None:
+        trade_log.level = parse_level(level)
+    if echo is not None:
+        trade_log.echo = echo
+    if path is not False:
+        trade_log.set_path(path)
+
+
+def trade_log_settings():
+    """
+    获取当前交易日志设置，用于在工作进程中还原（见 configure_trade_log）
+
+    返回:
+        dict: level、echo、path
+    """
+    return {'level': trade_log.level, 'echo': trade_log.echo, 'path': trade_log.path}
@@ -0,0 +1,139 @@
+"""
+股票量化交易回测系统 - 自选股模块
+保存常用股票列表（自选股），程序启动后在后台按限速逐只预热本地行情库：
+日K线更新到最近一次收盘，并保存最近一个已收盘交易日的完整分钟线，第一次回测直接读取本地数据
+"""
+
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from src.core.cache import get_cache_dir
+from src.core.data import get_single_stock_history_data, get_single_stock_ticks_data_advanced
+from src.core.store import (SESSION_CLOSE, SESSION_OPEN, bars_updated, has_minute_bars, is_fresh,
+                            last_market_close)
+
+# 相邻两次网络请求的最小间隔（秒），避免触发数据源的访问频率限制
+MIN_REQUEST_INTERVAL = 1.0
+# 自选股数量上限，预热在限速下几分钟内完成
+MAX_SYMBOLS = 50
+
+
+def get_watchlist_path():
+    """自选股文件路径（缓存目录下的 watchlist.json）"""
+    return os.path.join(get_cache_dir(), 'watchlist.json')
+
+
+def load_watchlist():
+    """
+    读取自选股
+
+    返回:
+        list: 股票代码列表，没有保存过时为空列表
+    """
+    try:
+        with open(get_watchlist_path(), encoding='utf-8') as f:
+            return [str(code) for code in json.load(f).get('symbols', [])]
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        print(f"读取自选股失败: {e}")
+        return []
+
+
+def save_watchlist(symbols):
+    """
+    保存自选股（去重并保持顺序，先写临时文件再原子替换）
+
+    参数:
+        symbols: 股票代码列表
+
+    返回:
+        list: 实际保存的股票代码列表
+
+    异常:
+        ValueError: 包含不是6位数字的代码或超过数量上限
+    """
+    codes = list(dict.fromkeys(code.strip() for code in symbols if code.strip()))
+    invalid = [code for code in codes if len(code) != 6 or not code.isdigit()]
+    if invalid:
+        raise ValueError(f"股票代码格式错误: {', '.join(invalid)}")
+    if len(codes) > MAX_SYMBOLS:
+        raise ValueError(f"自选股最多 {MAX_SYMBOLS} 只，当前 {len(codes)} 只")
+
+    path = get_watchlist_path()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'symbols': codes}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+    return codes
+
+
+def cache_status(symbol, now=None):
+    """
+    一只股票的本地缓存新鲜度（只检查本地文件，不访问网络）
+
+    参数:
+        symbol: 股票代码
+        now: 当前时间，默认为 datetime.now()
+
+    返回:
+        dict: symbol、daily_updated（日K线写入时间或None）、daily_fresh（日K线是否已到最近一次收盘）、
+              session（最近一个已收盘交易日）、minute_cached（该交易日分钟线是否已缓存）
+    """
+    session = last_market_close(now).date()
+    updated = bars_updated(symbol)
+    return {
+        'symbol': symbol,
+        'daily_updated': updated,
+        'daily_fresh': is_fresh(updated, now),
+        'session': session,
+        'minute_cached': has_minute_bars(symbol, session),
+    }
+
+
+def prewarm_watchlist(symbols=None, min_interval=MIN_REQUEST_INTERVAL, stop=None):
+    """
+    逐只预热自选股的本地行情库，已是最新的数据跳过，只在实际访问网络时限速
+
+    参数:
+        symbols: 股票代码列表，默认为已保存的自选股
+        min_interval: 相邻两次网络请求的最小间隔（秒）
+        stop: 可选，threading.Event，设置后在下一只股票之前停止
+
+    返回:
+        generator: 每只股票预热后产出 cache_status 的结果
+    """
+    symbols = load_watchlist() if symbols is None else symbols
+    last_request = None
+
+    def throttle():
+        nonlocal last_request
+        if last_request is not None:
+            wait = last_request + min_interval - time.monotonic()
+            if wait > 0:
+                if stop is not None:
+                    stop.wait(wait)
+                else:
+                    time.sleep(wait)
+        last_request = time.monotonic()
+
+    for symbol in symbols:
+        if stop is not None and stop.is_set():
+            return
+        status = cache_status(symbol)
+        if not status['daily_fresh']:
+            throttle()
+            get_single_stock_history_data(symbol)
+        if not status['minute_cached'] and not (stop is not None and stop.is_set()):
+            throttle()
+            session = status['session']
+            get_single_stock_ticks_data_advanced(symbol, datetime.combine(session, SESSION_OPEN),
+                                                 datetime.combine(session, SESSION_CLOSE))
+        yield cache_status(symbol)
@@ -1,7 +1,18 @@
+import os
+import time
+
+# 启动计时起点，必须在导入界面和回测模块之前
+_startup_began = time.perf_counter()
+
 import customtkinter
 import customtkinter as ctk
 from PIL import Image
 from src.NewGUI.MainPage import MainPage
+from src.core.jobs import get_job_manager
+from src.core.timing import log_timings
+
+# 启动预算（秒）：从进程启动到首页可交互的时间，超过时在控制台提示，可通过环境变量修改
+STARTUP_BUDGET = float(os.environ.get('QUANT_TRADING_STARTUP_BUDGET', '2.0'))
 
 
 class App(customtkinter.CTk):
@@ -16,6 +27,14 @@ class App(customtkinter.CTk):
         self.grid_columnconfigure(1, weight=11)
         self.grid_rowconfigure(0, weight=1)
         ctk.set_appearance_mode('dark')
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+
+    def on_close(self):
+        # 关闭窗口时取消未完成的后台回测
+        manager = get_job_manager(create=False)
+        if manager is not None:
+            manager.shutdown()
+        self.destroy()
 
     def change_appearance_mode(self):
         if ctk.get_appearance_mode() == 'Dark':
@@ -61,14 +80,42 @@ class MenuBar(ctk.CTkFrame):
                                      command=lambda:main_page.show_page('TickPage'),corner_radius=0)
         self.tick_button.grid(row=3, column=0,padx = 0, pady = 5, sticky='nsew')
 
+        self.watchlist_button = ctk.CTkButton(self, image=self.home_icon,text='自选股', fg_color='transparent',hover_color='grey',text_color=('black','#FCFAFA'),font=('微软雅黑', 15, 'bold'),
+                                     command=lambda:main_page.show_page('WatchlistPage'),corner_radius=0)
+        self.watchlist_button.grid(row=4, column=0,padx = 0, pady = 5, sticky='new')
+
 
         self.setting_button = ctk.CTkButton(self, image=self.setting_icon, text='深浅切换', text_color=('black', '#FCFAFA'), font=('微软雅黑', 15, 'bold'),
                                             command=master.change_appearance_mode)
         self.setting_button.grid(row=5, column=0, padx = 25, pady = (0, 25), sticky='nsew')
 
 
-app = App()
-main_page = MainPage(app)
-menu_bar = MenuBar(app)
-
-app.mainloop()
\ No newline at end of file
+def report_startup(startup_timings, began):
+    """
+    首页绘制完成、主循环第一次空闲时记录启动耗时（模块导入、界面创建、首帧绘制），
+    写入计时日志（kind 为 startup），超过启动预算时在控制台提示
+    """
+    startup_timings['first_frame'] = time.perf_counter() - began
+    total = sum(startup_timings.values())
+    log_timings('startup', '', startup_timings)
+    if total > STARTUP_BUDGET:
+        details = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in startup_timings.items())
+        print(f"启动耗时 {total:.2f} 秒，超过预算 {STARTUP_BUDGET:.2f} 秒（{details}）")
+
+
+# 回测进程池的工作进程（spawn/forkserver方式启动时）会重新导入本模块，界面只在主进程中创建
+if __name__ == '__main__':
+    imported = time.perf_counter()
+    app = App()
+    main_page = MainPage(app)
+    menu_bar = MenuBar(app)
+    built = time.perf_counter()
+    startup_timings = {'imports': imported - _startup_began, 'build_ui': built - imported}
+
+    def on_first_frame():
+        report_startup(startup_timings, built)
+        # 首页可交互后再在空闲时间预热进程池和其余页面
+        main_page.prewarm()
+
+    app.after_idle(on_first_frame)
+    app.mainloop()
@@ -0,0 +1,198 @@
+"""
+股票量化交易回测系统 - 回测结果图表工具
+根据回测结果对象绘制K线、均线、买卖点和资金曲线。绘图前按画布宽度降采样：
+K线按像素列合并为一根（首开、最高、最低、尾收），折线每列只保留最小值和最大值，
+绘制的图元数量只取决于画布宽度，与K线数量无关
+"""
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+# 中文字体；只修改 rcParams，不导入 pyplot
+matplotlib.rcParams['font.family'] = 'SimHei'
+matplotlib.rcParams['axes.unicode_minus'] = False
+
+# A股配色：上涨红、下跌绿
+UP_COLOR = 'red'
+DOWN_COLOR = 'green'
+MA_COLORS = ('blue', 'orange', 'purple')
+# 每根合并后K线至少占用的像素宽度
+PIXELS_PER_CANDLE = 3
+
+
+def minmax_downsample(values, n_buckets):
+    """
+    折线降采样：把序列均分为 n_buckets 段，每段只保留最小值和最大值（以及首尾两点），
+    画到每段约一个像素宽的画布上时与完整序列的视觉效果相同
+
+    参数:
+        values: 数值序列
+        n_buckets: 分段数，一般取画布宽度（像素）
+
+    返回:
+        tuple: (保留点的下标数组, 对应的数值数组)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    if n <= 2 * n_buckets:
+        return np.arange(n), values
+    size = -(-n // n_buckets)
+    rows = -(-n // size)
+    # 末段不足时用最后一个值补齐，argmin/argmax 取首次出现的位置，不会落在补齐部分
+    padded = np.concatenate([values, np.full(rows * size - n, values[-1])]).reshape(rows, size)
+    base = np.arange(rows) * size
+    index = np.unique(np.concatenate([padded.argmin(axis=1) + base, padded.argmax(axis=1) + base, [0, n - 1]]))
+    return index, values[index]
+
+
+def aggregate_ohlc(opens, highs, lows, closes, n_buckets):
+    """
+    K线降采样：每连续若干根K线合并为一根
+
+    参数:
+        opens, highs, lows, closes: 开高低收价格序列
+        n_buckets: 合并后的最大K线数量
+
+    返回:
+        tuple: (中心位置数组, 每根宽度, 开盘, 最高, 最低, 收盘)，位置以原始K线序号为单位
+    """
+    n = len(closes)
+    size = max(1, -(-n // max(1, n_buckets)))
+    starts = np.arange(0, n, size)
+    if size == 1:
+        return starts.astype(np.float64), 1, opens, highs, lows, closes
+    ends = np.minimum(starts + size, n)
+    return ((starts + ends - 1) / 2, size, opens[starts], np.maximum.reduceat(highs, starts),
+            np.minimum.reduceat(lows, starts), closes[ends - 1])
+
+
+def _sma(values, period):
+    """简单移动平均，返回 (起始下标, 均线数组)"""
+    if period < 1 or values.size < period:
+        return 0, np.empty(0)
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    return period - 1, (cumsum[period:] - cumsum[:-period]) / period
+
+
+def _ma_periods(result):
+    """与策略一致的均线周期"""
+    p = result.params
+    if result.kind == 'daily':
+        return [p['fast_maperiod'], p['slow_maperiod']] if p.get('use_sma_crossover', True) else []
+    return [p['price_period']] if p.get('use_price_ma', True) else []
+
+
+def prepare_chart(result, width_px=1000):
+    """
+    从回测结果生成降采样后的绘图数据，可以在后台线程中调用
+
+    参数:
+        result: BacktestResult 回测结果
+        width_px: 画布宽度（像素）
+
+    返回:
+        dict: 绘图数据，供 draw_chart 使用；结果中没有行情序列时返回None
+    """
+    n = len(result.closes)
+    if n == 0 or len(result.opens) != n:
+        return None
+    width_px = max(int(width_px), 100)
+
+    x, width, o, h, l, c = aggregate_ohlc(result.opens, result.highs, result.lows, result.closes,
+                                          width_px // PIXELS_PER_CANDLE)
+
+    mas = []
+    for period in _ma_periods(result):
+        offset, ma = _sma(result.closes, int(period))
+        index, values = minmax_downsample(ma, width_px)
+        mas.append((f"MA{period}", index + offset, values))
+
+    equity_x, equity = minmax_downsample(result.equity, width_px)
+
+    # 成交点定位到所在K线的序号，同一像素列内同方向的成交只画一个标记
+    trade_dates = pd.DatetimeIndex([trade['datetime'] for trade in result.trades]).values.astype('datetime64[s]')
+    trade_x = np.searchsorted(result.equity_dates, trade_dates).clip(0, n - 1)
+    trade_price = np.fromiter((trade['price'] for trade in result.trades), dtype=np.float64, count=len(trade_x))
+    is_buy = np.fromiter((trade['side'] == 'buy' for trade in result.trades), dtype=bool, count=len(trade_x))
+    column = trade_x // max(1, -(-n // width_px))
+    markers = {}
+    for side, mask in (('buys', is_buy), ('sells', ~is_buy)):
+        _, first = np.unique(column[mask], return_index=True)
+        markers[side] = (trade_x[mask][first], trade_price[mask][first])
+
+    time_format = '%Y-%m-%d' if result.kind == 'daily' else '%H:%M'
+    return {
+        'title': f"{result.stock_code} 回测结果",
+        'n_bars': n,
+        'dates': result.equity_dates,
+        'time_format': time_format,
+        'candles': (x, width, o, h, l, c),
+        'mas': mas,
+        'buys': markers['buys'],
+        'sells': markers['sells'],
+        'equity': (equity_x, equity),
+    }
+
+
+def _draw_candles(ax, x, width, o, h, l, c):
+    """用两个图元集合（影线、实体）绘制全部K线"""
+    up = c >= o
+    colors = np.where(up, UP_COLOR, DOWN_COLOR)
+    wicks = np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1)
+    ax.add_collection(LineCollection(wicks, colors=colors, linewidths=0.8))
+
+    half = width * 0.4
+    bottom = np.minimum(o, c)
+    top = np.maximum(o, c)
+    bodies = np.stack([np.column_stack([x - half, bottom]), np.column_stack([x - half, top]),
+                       np.column_stack([x + half, top]), np.column_stack([x + half, bottom])], axis=1)
+    ax.add_collection(PolyCollection(bodies, facecolors=colors, edgecolors=colors, linewidths=0.5))
+    ax.set_ylim(float(l.min()) * 0.98, float(h.max()) * 1.02)
+
+
+def draw_chart(figure, data):
+    """
+    在 matplotlib Figure 上绘制回测结果图（上：K线、均线和买卖点；下：资金曲线），横轴为K线序号
+
+    参数:
+        figure: matplotlib.figure.Figure，绘制前会清空
+        data: prepare_chart 返回的绘图数据
+    """
+    figure.clear()
+    price_ax, equity_ax = figure.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+
+    _draw_candles(price_ax, *data['candles'])
+    for (name, x, values), color in zip(data['mas'], MA_COLORS):
+        price_ax.plot(x, values, color=color, linewidth=1, label=name)
+    buy_x, buy_price = data['buys']
+    sell_x, sell_price = data['sells']
+    price_ax.scatter(buy_x, buy_price, marker='^', color=UP_COLOR, edgecolors='black', s=24, zorder=3, label='买入')
+    price_ax.scatter(sell_x, sell_price, marker='v', color=DOWN_COLOR, edgecolors='black', s=24, zorder=3,
+                     label='卖出')
+    price_ax.set_title(data['title'])
+    price_ax.set_ylabel('价格 (元)')
+    price_ax.legend(loc='upper left', fontsize=8)
+    price_ax.grid(True, alpha=0.3)
+
+    equity_x, equity = data['equity']
+    equity_ax.plot(equity_x, equity, color='steelblue', linewidth=1)
+    equity_ax.set_ylabel('总资产 (元)')
+    equity_ax.grid(True, alpha=0.3)
+
+    # 横轴刻度显示为日期（按K线序号取对应时间，停牌和休市不留空白）
+    dates = data['dates']
+    time_format = data['time_format']
+
+    def format_tick(value, position):
+        index = int(round(value))
+        if 0 <= index < len(dates):
+            return dates[index].astype('datetime64[s]').item().strftime(time_format)
+        return ''
+
+    equity_ax.xaxis.set_major_locator(MaxNLocator(8, integer=True))
+    equity_ax.xaxis.set_major_formatter(FuncFormatter(format_tick))
+    equity_ax.set_xlim(-1, data['n_bars'])
+    figure.tight_layout()
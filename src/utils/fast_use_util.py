@@ -4,9 +4,12 @@
 直接用了
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+
+import numpy as np
 
 from ..core.data import get_single_stock_history_data
+from ..core.symbols import code_board, get_symbol_master
 
 
 def update_date_range(stock_code, date_range_label):
@@ -25,17 +28,44 @@ def update_date_range(stock_code, date_range_label):
 
 def update_date_range_ctk(stock_code, date_range_label):
 
+    date_range_label.configure(text=get_date_range_text(stock_code))
+
+
+def get_date_range_text(stock_code):
+    """
+    获取股票行情数据时间范围的提示文本（需要获取行情数据，耗时较长，界面中应在后台线程调用）
+
+    参数:
+        stock_code: 股票代码
+
+    返回:
+        str: 提示文本
+    """
     stock_code = stock_code.strip()
     if validate_stock_code(stock_code):
         stock_df = get_single_stock_history_data(stock_code)
         if not stock_df.empty:
             data_start = stock_df.index.min().date()
             data_end = stock_df.index.max().date()
-            date_range_label.configure(text=f"数据时间范围：{data_start} 至 {data_end}")
-        else:
-            date_range_label.configure(text="数据时间范围：未获取")
-    else:
-        date_range_label.configure(text="数据时间范围：未获取")
+            return f"数据时间范围：{data_start} 至 {data_end}"
+    return "数据时间范围：未获取"
+
+
+def get_market_text(stock_code):
+    """
+    获取股票代码的市场提示文本：交易所、板块和名称，只查本地股票代码表，不访问网络
+
+    参数:
+        stock_code: 6位股票代码
+
+    返回:
+        str: 提示文本
+    """
+    info = get_symbol_master().get(stock_code)
+    parts = list(code_board(stock_code) or ("未知市场",))
+    if info is not None:
+        parts.append(info.name + ("（已退市）" if info.status == "退市" else ""))
+    return "市场：" + " ".join(parts)
 
 
 def validate_stock_code(code: str) -> bool:
@@ -48,38 +78,10 @@ def validate_stock_code(code: str) -> bool:
     返回:
         bool: 股票代码是否有效
     """
-    # 有效的A股前缀列表及对应市场
-    valid_prefix = {
-        '60': '上海主板',
-        '688': '科创板',
-        '000': '深圳主板',
-        '002': '中小板',
-        '300': '创业板',
-        '001': '深圳主板',
-        '003': '深圳主板新股',
-        '301': '创业板新股',
-        '605': '上海主板新股',
-        '603': '上海主板'
-    }
-
-    # 基本格式检查
+    # 按3位、2位前缀查表（见 BOARD_PREFIXES），不逐个比较前缀
     if not code:
         return False
-
-    code = code.strip()
-
-    if not code.isdigit():
-        return False
-
-    if len(code) != 6:
-        return False
-
-    # 前缀检查
-    for prefix in valid_prefix:
-        if code.startswith(prefix):
-            return True
-
-    return False
+    return code_board(code.strip()) is not None
 
 
 def get_date_input(prompt: str, default_date: datetime = None) -> datetime:
@@ -129,6 +131,32 @@ def min2date(start_time: datetime, end_time: datetime) -> tuple:
     return v_start_date, v_end_date
 
 
+def num2datetime64(nums, trade_date=None):
+    """
+    将backtrader内部的浮点日期批量转换为numpy datetime64数组
+
+    参数:
+        nums: backtrader日期数值数组（自公元1年起的天数）
+        trade_date: 分时回测的实际交易日期；传入时按 min2date 的映射规则
+                    把虚拟日期（每分钟一天）还原为当天的实际时间
+
+    返回:
+        ndarray: datetime64[s] 数组
+    """
+    # 1970年1月1日在backtrader中的日期数值
+    epoch_num = 719163.0
+    days = np.asarray(nums, dtype=np.float64) - epoch_num
+
+    if trade_date is None:
+        seconds = np.round(days * 86400).astype(np.int64)
+        return seconds.astype('datetime64[s]')
+
+    # 虚拟日期的天数即为距9:30开盘的分钟数
+    open_time = np.datetime64(datetime.combine(trade_date, time(hour=9, minute=30)), 's')
+    minutes = np.round(days).astype(np.int64)
+    return open_time + minutes.astype('timedelta64[m]')
+
+
 def data_min2date_rename(df):
     """
     暂时作废的函数，传入的类型应当是一个dataframe，里面的index是datetime类型
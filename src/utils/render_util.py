@@ -1,16 +1,98 @@
+"""
+股票量化交易回测系统 - K线图渲染工具
+使用plotly绘制带均线的交互式K线图。K线数量较多时使用大数据量模式：
+按可见区间的K线数和图表宽度确定合并粒度（每根合并后的K线约占 PIXELS_PER_CANDLE 像素），
+只绘制可见区间及两侧各一屏的K线，均线用WebGL折线并按像素列的最小/最大值降采样，
+图中的图元数量只取决于图表宽度，与K线总数无关，十万根以上的K线仍可流畅缩放和拖动
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 
+from src.utils.chart_util import PIXELS_PER_CANDLE, aggregate_ohlc, minmax_downsample
+
+# 均线周期、颜色和线宽
+MA_STYLES = ((5, 'blue', 1), (20, 'orange', 1.5), (60, 'purple', 2))
+# 超过该K线数量时默认使用大数据量模式
+FAST_MODE_THRESHOLD = 5000
+# 导出文件格式
+EXPORT_FORMATS = ('html', 'png')
+
+
 class RenderUtil:
     def __init__(self):
         super(RenderUtil, self).__init__()
 
-    def draw_k_line(self, df):
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        df['MA60'] = df['close'].rolling(window=60).mean()
+    def draw_k_line(self, df, show=True, fast=None, width=1200, height=600, x_range=None):
+        """
+        绘制K线图和MA5/MA20/MA60均线，不修改传入的数据框
+
+        参数:
+            df: 包含 date、open、high、low、close 列的行情数据，按日期升序
+            show: 是否打开浏览器显示
+            fast: 是否使用大数据量模式，为None时K线数超过 FAST_MODE_THRESHOLD 自动启用
+            width: 图表宽度（像素），大数据量模式按宽度确定K线合并粒度
+            height: 图表高度（像素）
+            x_range: 可选，(开始日期, 结束日期) 初始显示的区间，为None时显示全部K线
+
+        返回:
+            go.Figure: 绘制好的图表
+        """
+        if fast is None:
+            fast = len(df) > FAST_MODE_THRESHOLD
+        closes = df['close'].to_numpy(dtype=np.float64)
+        mas = [(period, color, line_width, df['close'].rolling(window=period).mean().to_numpy())
+               for period, color, line_width in MA_STYLES]
+        start, stop = self._visible_slice(df, x_range)
 
         fig = go.Figure()
+        if fast:
+            self._add_fast_traces(fig, df, closes, mas, start, stop, width)
+        else:
+            self._add_full_traces(fig, df, mas)
 
+        fig.update_layout(
+            title='k线图',
+            yaxis_title='价格 (元)',
+            xaxis_title='日期',
+            width=width,
+            height=height,
+            xaxis_rangeslider_visible=False,
+            legend=dict(
+                x=0.01,
+                y=0.99,
+                bgcolor='rgba(255,255,255,0.8)',
+                bordercolor='rgba(0,0,0,0.2)',
+                borderwidth=1
+            )
+        )
+        if x_range is not None and stop > start:
+            dates = df['date'].to_numpy()
+            fig.update_xaxes(range=[dates[start], dates[stop - 1]])
+
+        if show:
+            fig.show()
+
+        return fig
+
+    @staticmethod
+    def _visible_slice(df, x_range):
+        """可见区间对应的K线序号范围 [start, stop)"""
+        if x_range is None:
+            return 0, len(df)
+        dates = pd.DatetimeIndex(df['date'])
+        begin, end = x_range
+        start = dates.searchsorted(pd.Timestamp(begin), side='left') if begin is not None else 0
+        stop = dates.searchsorted(pd.Timestamp(end), side='right') if end is not None else len(df)
+        return int(start), int(stop)
+
+    def _add_full_traces(self, fig, df, mas):
+        """逐根绘制K线和均线"""
         fig.add_trace(go.Candlestick(
             x=df['date'],
             open=df['open'],
@@ -24,51 +106,114 @@ class RenderUtil:
             decreasing_fillcolor='green'
         ))
 
-        # 🔥 添加移动平均线
-        fig.add_trace(go.Scatter(
-            x=df['date'],
-            y=df['MA5'],
-            mode='lines',
-            name='MA5',
-            line=dict(color='blue', width=1),
-            hovertemplate='MA5: ¥%{y:.2f}<extra></extra>'
-        ))
+        for period, color, width, values in mas:
+            fig.add_trace(go.Scatter(
+                x=df['date'],
+                y=values,
+                mode='lines',
+                name=f'MA{period}',
+                line=dict(color=color, width=width),
+                hovertemplate=f'MA{period}: ¥%{{y:.2f}}<extra></extra>'
+            ))
 
-        fig.add_trace(go.Scatter(
-            x=df['date'],
-            y=df['MA20'],
-            mode='lines',
-            name='MA20',
-            line=dict(color='orange', width=1.5),
-            hovertemplate='MA20: ¥%{y:.2f}<extra></extra>'
-        ))
+    def _add_fast_traces(self, fig, df, closes, mas, start, stop, width):
+        """
+        合并K线后绘制，均线使用WebGL折线
 
-        fig.add_trace(go.Scatter(
-            x=df['date'],
-            y=df['MA60'],
-            mode='lines',
-            name='MA60',
-            line=dict(color='purple', width=2),
-            hovertemplate='MA60: ¥%{y:.2f}<extra></extra>'
+        合并粒度按可见区间 [start, stop) 的K线数和图表宽度计算；只绘制可见区间及两侧各一屏的K线，
+        拖动一屏以内不会出现空白，放大后的区间重新绘制时合并粒度随之变细
+        """
+        visible = max(stop - start, 1)
+        columns = max(int(width) // PIXELS_PER_CANDLE, 1)
+        size = -(-visible // columns)
+        lo = max(start - visible, 0)
+        hi = min(stop + visible, len(df))
+        drawn = hi - lo
+
+        dates = df['date'].to_numpy()[lo:hi]
+        _, size, opens, highs, lows, agg_closes = aggregate_ohlc(
+            df['open'].to_numpy(dtype=np.float64)[lo:hi], df['high'].to_numpy(dtype=np.float64)[lo:hi],
+            df['low'].to_numpy(dtype=np.float64)[lo:hi], closes[lo:hi], -(-drawn // size))
+        name = '股价' if size == 1 else f'股价（每根合并{size}根）'
+        fig.add_trace(go.Candlestick(
+            x=dates[::size],
+            open=opens,
+            high=highs,
+            low=lows,
+            close=agg_closes,
+            name=name,
+            increasing_line_color='red',
+            decreasing_line_color='green',
+            increasing_fillcolor='red',
+            decreasing_fillcolor='green'
         ))
 
-        fig.update_layout(
-            title='k线图',
-            yaxis_title='价格 (元)',
-            xaxis_title='日期',
-            width=1200,
-            height=600,
-            xaxis_rangeslider_visible=False,
-            legend=dict(
-                x=0.01,
-                y=0.99,
-                bgcolor='rgba(255,255,255,0.8)',
-                bordercolor='rgba(0,0,0,0.2)',
-                borderwidth=1
-            )
-        )
+        # 均线按像素列降采样：绘制范围占可见区间的倍数乘以图表宽度
+        pixels = max(int(width) * drawn // visible, 1)
+        for period, color, line_width, values in mas:
+            values = values[lo:hi]
+            # 跳过均线开头不足一个周期的空值
+            offset = min(max(period - 1 - lo, 0), len(values))
+            index, ys = minmax_downsample(values[offset:], pixels)
+            fig.add_trace(go.Scattergl(
+                x=dates[offset:][index],
+                y=ys,
+                mode='lines',
+                name=f'MA{period}',
+                line=dict(color=color, width=line_width),
+                hovertemplate=f'MA{period}: ¥%{{y:.2f}}<extra></extra>'
+            ))
 
-        fig.show()
+    def export_k_line(self, df, path=None, fmt='html', fast=None, width=1200, height=600, x_range=None):
+        """
+        把K线图写入独立的HTML（内嵌plotly.js，离线可用）或PNG文件，不打开浏览器
 
+        未指定路径时按 行情内容 + 绘图参数 的哈希写入缓存目录下的 charts 文件夹，
+        相同数据再次导出时直接返回已有文件，不重新绘图
 
-        return fig
+        参数:
+            df: 行情数据，同 draw_k_line
+            path: 输出文件路径，为None时使用缓存目录
+            fmt: 文件格式，"html" 或 "png"（PNG需要安装 kaleido）
+            fast, width, height, x_range: 同 draw_k_line
+
+        返回:
+            str: 输出文件路径，导出失败时为None
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        if path is None:
+            from src.core.cache import get_cache_dir
+            key = self._chart_key(df, fmt, fast, (width, height, x_range))
+            path = os.path.join(get_cache_dir('charts'), f'kline_{key}.{fmt}')
+            if os.path.exists(path):
+                return path
+
+        fig = self.draw_k_line(df, show=False, fast=fast, width=width, height=height, x_range=x_range)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再原子替换，避免并发读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=f'.{fmt}')
+        os.close(fd)
+        try:
+            if fmt == 'html':
+                fig.write_html(tmp_path, include_plotlyjs=True, full_html=True)
+            else:
+                fig.write_image(tmp_path, format='png')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"导出K线图失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        return path
+
+    @staticmethod
+    def _chart_key(df, fmt, fast, layout):
+        """行情内容和绘图参数的哈希"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((fmt, fast, layout, MA_STYLES, len(df))).encode())
+        digest.update(np.ascontiguousarray(df['date'].to_numpy().astype('datetime64[ns]')).tobytes())
+        values = df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+        digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()
@@ -0,0 +1,73 @@
+"""
+股票量化交易回测系统 - 界面更新消息总线
+后台线程不直接操作界面组件，而是把更新投递到总线；界面主循环按固定间隔（约一帧）统一执行。
+同一个键的多次更新只执行最后一次，连续的进度、状态更新每帧最多触发一次重绘
+"""
+
+import itertools
+import threading
+
+
+class UIBus:
+    """
+    界面更新消息总线
+
+    post 可以在任意线程中调用；drain 只在界面线程中执行（attach 后由 Tk 主循环定时调用）
+
+    参数:
+        interval_ms (int): 执行间隔（毫秒），默认约一帧
+    """
+
+    def __init__(self, interval_ms=16):
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        # 键 -> (函数, 位置参数, 关键字参数)，按最后一次投递的先后执行
+        self._pending = {}
+        self._sequence = itertools.count()
+        self._widget = None
+
+    def post(self, func, *args, key=None, **kwargs):
+        """
+        投递一个界面更新
+
+        参数:
+            func: 在界面线程中执行的函数，如 label.configure
+            args/kwargs: 函数参数
+            key: 合并键，同一个键尚未执行的旧更新会被丢弃；为None时不合并
+        """
+        if key is None:
+            key = ('_unique', next(self._sequence))
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = (func, args, kwargs)
+
+    def drain(self):
+        """
+        执行全部待处理的更新，必须在界面线程中调用
+
+        返回:
+            int: 执行的更新数
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for func, args, kwargs in pending.values():
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"界面更新失败: {e}")
+        return len(pending)
+
+    def attach(self, widget):
+        """由 widget 所在的 Tk 主循环定时执行更新"""
+        if self._widget is not None:
+            return
+        self._widget = widget
+        widget.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self.drain()
+        self._widget.after(self.interval_ms, self._tick)
+
+
+# 进程内共享的界面更新总线，由 MainPage 挂到主循环上
+ui_bus = UIBus()